@@ -1,8 +1,6 @@
 """This module contain registration and login feature."""
-import re
-
 import webargs
-from flask import jsonify, request
+from flask import current_app, jsonify, request
 from flask_jwt_extended import create_access_token
 from flask_jwt_extended.exceptions import (InvalidHeaderError,
                                            NoAuthorizationError)
@@ -12,7 +10,9 @@ from webargs.flaskparser import parser
 from werkzeug.exceptions import InternalServerError
 
 from app.base import autheticate_manager
+from app.hashing import HashingUnavailable, hash_pool
 from app.models import profile, user
+from app.validation import is_username, user_schema
 
 app = Namespace(
     "Auth", description='Operations related to Authentication', path='/v1.0')
@@ -66,6 +66,17 @@ def handle_unexpected(e):
     return jsonify(error)
 
 
+def service_busy(status):
+    """Utility function, response for when password hashing is saturated.
+
+    The hash pool counters of the worker are logged for the operators.
+    """
+    current_app.logger.warning("Password hashing saturated: %s",
+                               hash_pool().stats())
+    data = {"message": "Server is busy, try again shortly.", "status": status}
+    return data, 503, {"Retry-After": "1"}
+
+
 @app.route("/register", endpoint='register')
 class Register(Resource):
     """Resource for registration."""
@@ -90,41 +101,60 @@ class Register(Resource):
 
     @app.doc(body=register_args_model, responses={400: "Bad data"})
     @app.response(401, "Registration Failed", register_response_model)
+    @app.response(503, "Server busy", register_response_model)
     @app.marshal_with(register_response_model, code=201)
     def post(self):
         """Register a user."""
         self.args = parser.parse(Register.registration_args, request)
-        errors = user.UserSchema().validate(self.args)
+        errors = user_schema().validate(self.args)
 
         if errors:
             errors = {key: "".join(errors[key]) for key in errors}
             data = {"message": errors, "status": "Registration Failed"}
             return data, 401
 
-        password = self.args['password']
         email = self.args['email']
         username = self.args['username']
-        verified_email = Login.verify_credentials(email, password)
-        verified_username = Login.verify_credentials(username, password)
+        conflict = Register.find_conflict(username, email)
+        if conflict:
+            return conflict
+
+        try:
+            new_user, errors = user_schema().load(self.args)
+        except HashingUnavailable:
+            return service_busy("Registration Failed")
+        new_profile = profile.Profile("@" + username, new_user)
+
+        if (not errors and new_user.save(commit=False) and
+                new_profile.save()):
+            msg = "You registerded succesfully."
+            data = {"message": msg, "status": "Registered"}
+            return data, 201
+
+        # a concurrent sign up was inserted first, the unique constraints
+        # rejected this one
+        conflict = Register.find_conflict(username, email)
+        if conflict:
+            return conflict
+        raise InternalServerError
 
-        if verified_email is not None:
+    @staticmethod
+    def find_conflict(username, email):
+        """Utility method, check if username or email are taken.
+
+        Returns:
+            failed registration response if taken, else None
+        """
+        taken = user.User.get_taken(name=username, email=email)
+        if any(existing.email == email for existing in taken):
             msg = "Email exists sign in  or Use another email to sign up"
             data = {"message": msg, "status": "Registration Failed"}
             return data, 400
-        if verified_username is not None:
+        if taken:
             msg = "Username exists, sign in or Use another username to sign up"
             data = {"message": msg, "status": "Registration Failed"}
             return data, 400
-        else:
-            new_user, errors = user.UserSchema().load(self.args)
-            new_profile = profile.Profile("@" + username, new_user)
-
-            if not errors and new_user.save() and new_profile.save():
-                msg = "You registerded succesfully."
-                data = {"message": msg, "status": "Registered"}
-                return data, 201
-            else:
-                raise InternalServerError
+        return None
 
 
 @app.route("/login", endpoint='login')
@@ -150,16 +180,17 @@ class Login(Resource):
         })
 
     @app.response(401, "Login Failed", login_response_model)
+    @app.response(503, "Server busy", login_response_model)
     @app.doc(body=login_args_model, responses={400: "Bad data"})
     @app.marshal_with(login_response_model, code=200)
     def post(self):
         """Log a user in."""
         self.args = parser.parse(Login.login_args, request)
         self.args['user_login_credential'] = self.args['email']
-        if re.match("^[A-Za-z0-9]+\s?[A-Za-z0-9]+$", self.args['email']):
+        if is_username(self.args['email']):
             self.args["username"] = self.args['email']
             self.args.pop('email')
-        errors = user.UserSchema().validate(self.args, partial=True)
+        errors = user_schema().validate(self.args, partial=True)
 
         if errors:
             errors = {key: "".join(errors[key]) for key in errors}
@@ -168,11 +199,19 @@ class Login(Resource):
 
         password = self.args['password']
         user_login_credential = self.args['user_login_credential']
-        verified = Login.verify_credentials(user_login_credential, password)
+        account = Login.find_user(user_login_credential)
+        try:
+            verified = account and account.authenticate_password(password)
+        except HashingUnavailable:
+            return service_busy("Login Failed")
 
         if verified:
             msg = "You have been logged in succesfully."
-            token = create_access_token(user_login_credential)
+            token = create_access_token({
+                'user_credential': user_login_credential,
+                'user_id': account.id,
+                'profile_id': account.profile_id
+            })
             data = {"message": msg, "status": "authunticated", "token": token}
             return data, 200
         elif verified is False:
@@ -188,14 +227,28 @@ class Login(Resource):
     @autheticate_manager.user_claims_loader
     def add_claims_to_access_token(user):
         """Utility method, allow user information to be Embeded in token."""
-        return {'user_credential': user}
+        return user
+
+    @staticmethod
+    @autheticate_manager.user_identity_loader
+    def add_identity_to_access_token(user):
+        """Utility method, use the login credential as token identity."""
+        return user['user_credential']
 
     @staticmethod
     def verify_credentials(user_credential="", password=""):
         """Utility method, autheticate user information."""
+        query = Login.find_user(user_credential)
+        if query:
+            return query.authenticate_password(password)
+        return query
+
+    @staticmethod
+    def find_user(user_credential=""):
+        """Utility method, get user by email or username credential."""
         email = None
         username = None
-        if re.match("^[A-Za-z0-9]+\s?[A-Za-z0-9]+$", user_credential):
+        if is_username(user_credential):
             email = False
             username = True
         else:
@@ -207,7 +260,4 @@ class Login(Resource):
             query = user.User.get_user(email=user_credential)
         elif username:
             query = user.User.get_user(name=user_credential)
-
-        if query:
-            return query.authenticate_password(password)
         return query
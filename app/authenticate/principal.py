@@ -0,0 +1,67 @@
+"""This module resolves token claims to the authenticated user and profile.
+
+Users and profiles are cached per process, detached from any session, so an
+authenticated request can get them without querying the database. Entries
+expire after PRINCIPAL_CACHE_TTL seconds and are dropped when the user is
+deleted in this process.
+"""
+
+from flask import current_app
+from sqlalchemy import event
+
+from app.base import database
+from app.cache import LRUCache
+from app.models import user
+
+
+def principal_cache():
+    """Get the principal cache of the current app, create it on first use."""
+    cache = current_app.extensions.get('principals')
+    if cache is None:
+        cache = LRUCache(
+            maxsize=current_app.config['PRINCIPAL_CACHE_SIZE'],
+            ttl=current_app.config['PRINCIPAL_CACHE_TTL'])
+        current_app.extensions['principals'] = cache
+    return cache
+
+
+def load_principal(user_id=None, profile_id=None):
+    """Get the user and profile a token was issued to.
+
+    Args:
+        user_id(int): id of the user, from the token claims
+        profile_id(int): id of the user's profile, from the token claims
+
+    Returns:
+        tuple of (user, profile) attached to the current session, or
+        (None, None) if the claims are missing or do not match a user
+    """
+    if user_id is None or profile_id is None:
+        return None, None
+
+    cache = principal_cache()
+    cached = cache.get(user_id)
+    if cached is None:
+        found = user.User.get_user(id=user_id)
+        if not found or found.profile_id != profile_id:
+            return None, None
+        found_profile = found.profile
+        # keep pristine detached copies, requests work on merged ones
+        database.session.expunge(found)
+        database.session.expunge(found_profile)
+        cached = (found, found_profile)
+        cache.set(user_id, cached)
+    elif cached[1].id != profile_id:
+        return None, None
+
+    found, found_profile = cached
+    return (database.session.merge(found, load=False),
+            database.session.merge(found_profile, load=False))
+
+
+@event.listens_for(user.User, "after_delete")
+def invalidate_principal(mapper, connection, target):
+    """Drop a deleted user from the principal cache."""
+    cache = current_app.extensions.get('principals')
+    if cache is not None:
+        cache.delete(target.id)
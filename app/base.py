@@ -6,11 +6,16 @@ The base Model class(BaseModel)is defined in this module, it defines common
 properties for models used in application.
 """
 
+import sqlite3
+from contextlib import contextmanager
+
 from flask import Blueprint, Flask, abort, json, request
 from flask_jwt_extended import JWTManager
 from flask_marshmallow import Marshmallow
 from flask_restplus import Api
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 
 from app import errors
 from config import config
@@ -38,6 +43,15 @@ api = Api(
 autheticate_manager = JWTManager()
 
 
+@event.listens_for(Engine, "connect")
+def enforce_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """Turn on foreign keys, and their ON DELETE CASCADE, on sqlite."""
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
 def new_app(enviroment="default"):
     """Factory Method that creates an instance of the app with the given config.
 
@@ -60,8 +74,9 @@ def new_app(enviroment="default"):
     from app.authenticate import authentication
     api.add_namespace(authentication.app)
 
-    from app.endpoint import endpoints
+    from app.endpoint import batch, endpoints
     api.add_namespace(endpoints.app)
+    api.add_namespace(batch.app)
 
     @flask.after_request
     def check_response(response):
@@ -91,17 +106,54 @@ def new_app(enviroment="default"):
     return flask
 
 
+@contextmanager
+def unit_of_work():
+    """Run every save and delete of the block in one transaction.
+
+    Saves and deletes only flush while the block runs, it is committed once
+    at the end, or rolled back if it raises. Call rollback() in the block to
+    discard it without raising.
+
+    Yields:
+        function that rolls the transaction back
+    """
+    session = database.session
+    state = {"rolled back": False}
+
+    def rollback():
+        state["rolled back"] = True
+        session.rollback()
+
+    session.info["unit of work"] = True
+    try:
+        yield rollback
+        if not state["rolled back"]:
+            session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.info.pop("unit of work", None)
+
+
+def committing(commit):
+    """Tell whether a save or delete commits or a unit of work will."""
+    return commit and not database.session.info.get("unit of work")
+
+
 class BaseModel(object):
     """Models, the base model which all other models created inherit from.
 
     It provide utility methods enabling object to be saved and deleted.
     """
 
-    def save(self):
+    def save(self, commit=True):
         """Save an instance of a model to the respective table.
 
         Args:
             self: specify the object to be saved to the table
+            commit(bool): commit the session, if False the session is only
+                flushed so that several saves can be committed once
 
         Returns:
             True if saving operation was succefull else, False
@@ -109,7 +161,10 @@ class BaseModel(object):
         saved = None
         try:
             database.session.add(self)
-            database.session.commit()
+            if committing(commit):
+                database.session.commit()
+            else:
+                database.session.flush()
             saved = True
         except Exception as e:
             saved = False
@@ -117,11 +172,13 @@ class BaseModel(object):
             database.session.rollback()
         return saved
 
-    def delete(self):
+    def delete(self, commit=True):
         """Delete an instance of a model to the respective table.
 
         Args:
             self: specify the object to be saved to the table
+            commit(bool): commit the session, if False the session is only
+                flushed so that several changes can be committed once
 
         Returns:
             True if delete operation was succefull else. False
@@ -129,7 +186,10 @@ class BaseModel(object):
         deleted = None
         try:
             database.session.delete(self)
-            database.session.commit()
+            if committing(commit):
+                database.session.commit()
+            else:
+                database.session.flush()
             deleted = True
         except Exception:
             deleted = False
@@ -0,0 +1,119 @@
+"""This module contains caching utilities.
+
+LRUCache keeps entries in the process, SharedCache keeps them in a simplekv
+store shared by every process, like redis. Both have the same interface.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """A bounded, thread safe cache with LRU eviction and per entry ttl."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        """Initialize the cache.
+
+        Args:
+            maxsize(int): Maximum number of entries held, the least recently
+                used entry is evicted when it is exceeded
+            ttl(float): Seconds an entry stays valid after it was set
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Get the value cached for key, default if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Cache value for key, evicting the least recently used entry."""
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Remove key from the cache if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Remove all entries from the cache."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        """Give the number of entries, expired ones included."""
+        return len(self._entries)
+
+
+class SharedCache(object):
+    """A cache on a simplekv store, shared by every process using the store.
+
+    Values are bytes. Entries expire after ttl seconds on stores with ttl
+    support, like redis, other stores keep them until they are replaced or
+    deleted. Stores evict entries on their own, so evictions stays 0.
+    """
+
+    evictions = 0
+
+    def __init__(self, store, ttl=300, prefix="cache_"):
+        """Initialize the cache.
+
+        Args:
+            store(KeyValueStore): simplekv store holding the entries
+            ttl(int): Seconds an entry stays valid after it was set
+            prefix(str): Prefix of the cache's keys in the store
+        """
+        self.store = store
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key, default=None):
+        """Get the value cached for key, default if missing or expired."""
+        try:
+            return self.store.get(self.prefix + key)
+        except KeyError:
+            return default
+
+    def set(self, key, value):
+        """Cache value for key."""
+        if getattr(self.store, 'ttl_support', False):
+            self.store.put(self.prefix + key, value, ttl_secs=self.ttl)
+        else:
+            self.store.put(self.prefix + key, value)
+
+    def delete(self, key):
+        """Remove key from the cache if present."""
+        self.store.delete(self.prefix + key)
+
+    def clear(self):
+        """Remove all entries of the cache from the store."""
+        for key in self._keys():
+            self.store.delete(key)
+
+    def __len__(self):
+        """Give the number of entries in the store."""
+        return len(self._keys())
+
+    def _keys(self):
+        return [
+            key for key in self.store.iter_keys()
+            if key.startswith(self.prefix)
+        ]
@@ -0,0 +1,267 @@
+"""This Module contains the batch endpoint of the Api.
+
+A batch runs an ordered list of bucket and item operations for the user in
+one request and one transaction, through the same Profile methods as the
+single operation endpoints. Either every operation is committed or, when one
+fails, none is.
+"""
+
+from flask import request
+from flask_restplus import Namespace, fields
+
+from app.base import unit_of_work
+from app.endpoint.endpoints import (BaseResource, asset_etag, bucket_json,
+                                    bulk_result, make_response, resource_path)
+from app.serialization import RawJSON, item_json
+from app.validation import valid_name
+
+app = Namespace(
+    "Batch",
+    description='Many bucketlist operations in one request',
+    path='/v1.0/batch')
+
+NAME_ERROR = "name can only contain letters numbers and space"
+
+# ids are integer columns, larger values would fail in the database
+MAX_ID = 2 ** 31 - 1
+
+
+def create_bucket(profile, operation):
+    """Create a bucket, like a POST to the bucket list."""
+    name = operation.get("name")
+    if not isinstance(name, str) or not valid_name(name):
+        return 400, {"message": "bucket " + NAME_ERROR}
+    if profile.get_bucket(name):
+        return 400, {"message": "Bucket: " + name + " exists"}
+    if not profile.add_bucket(name):
+        return 500, {"message": "Server was unable to process request"}
+    return 201, {"bucket": profile.get_bucket(name).to_dict()}
+
+
+def edit_bucket(profile, operation):
+    """Rename a bucket, like a PUT to a bucket."""
+    name = operation.get("name")
+    if not isinstance(name, str) or not valid_name(name):
+        return 400, {"message": "bucket " + NAME_ERROR}
+    bucket = profile.update_bucket(operation.get("bucket_id"), name)
+    if bucket is None:
+        return 404, {"message": "Bucket not found"}
+    if bucket is False:
+        return 422, {"message": "Bucket not edited"}
+    return 201, {"bucket": bucket_json(bucket)}
+
+
+def delete_bucket(profile, operation):
+    """Delete a bucket, like a DELETE of a bucket."""
+    deleted = profile.delete_asset(asset_id=operation.get("bucket_id"))
+    if deleted is None:
+        return 404, {"message": "Bucket not found"}
+    if not deleted:
+        return 422, {"message": "Bucket not deleted"}
+    return 200, {"message": "Bucket deleted succesfully"}
+
+
+def create_item(profile, operation):
+    """Create an item, like a POST to the items of a bucket."""
+    name = operation.get("name")
+    description = operation.get("description") or "Let's Do this"
+    if not isinstance(name, str) or not valid_name(name):
+        return 400, {"message": "item " + NAME_ERROR}
+    bucket_id = operation.get("bucket_id")
+    if profile.get_bucket(bucket_id=bucket_id) is None:
+        return 404, {"message": "Bucket not found"}
+    if profile.get_item(name=name):
+        return 400, {"message": "Item " + name + " exists"}
+    if not profile.add_item(
+            name=name, description=description, buc_id=bucket_id):
+        return 500, {"message": "Server error: Creating item failed"}
+    return 201, {"item": profile.get_item(name=name).to_dict()}
+
+
+def edit_item(profile, operation, **changes):
+    """Edit an item, the changes are the update_item arguments."""
+    item = profile.update_item(
+        operation.get("bucket_id"), operation.get("item_id"), **changes)
+    if item is None:
+        return 404, {"message": "Item not found in bucket"}
+    if item is False:
+        return 422, {"message": "Unable to edit item"}
+    return 200, {"item": RawJSON(item_json(item))}
+
+
+def update_item(profile, operation):
+    """Update the name or description of an item, like a PUT to it."""
+    name = operation.get("name")
+    description = operation.get("description")
+    if not (name or description):
+        return 400, {
+            "message": "Please enter field to be editted name or description"
+        }
+    if name and (not isinstance(name, str) or not valid_name(name)):
+        return 400, {"message": "Item " + NAME_ERROR}
+    status, values = edit_item(
+        profile, operation, name=name, description=description)
+    return 201 if status == 200 else status, values
+
+
+def patch_item(profile, operation):
+    """Mark an item done or not done, like a PATCH to it."""
+    done = operation.get("done")
+    if not isinstance(done, bool):
+        return 400, {"message": "done must be true or false"}
+    return edit_item(profile, operation, done=done)
+
+
+def delete_item(profile, operation):
+    """Delete an item, like a DELETE of it."""
+    bucket_id = operation.get("bucket_id")
+    item_id = operation.get("item_id")
+    if profile.get_item(item_id=item_id, buc_id=bucket_id) is None:
+        return 404, {"message": "Bucket/item specified does not exist"}
+    if not profile.delete_asset(item=True, asset_id=item_id, buc_id=bucket_id):
+        return 422, {"message": "Item was not delted"}
+    return 200, {"message": "Item deleted succesfully"}
+
+
+def id_error(operation):
+    """Utility function that checks the ids of an operation.
+
+    Returns:
+        message of what is wrong with the ids, None if they are valid
+    """
+    for key in ("bucket_id", "item_id"):
+        value = operation.get(key)
+        if value is None:
+            continue
+        # bool is an int too
+        if not isinstance(value, int) or isinstance(value, bool) or \
+                abs(value) > MAX_ID:
+            return key + " must be an integer"
+    return None
+
+
+def operation_target(profile, operation):
+    """Utility function that loads the bucket or item an operation writes.
+
+    Returns:
+        the item of item operations with an item_id, else the bucket of
+        operations with a bucket_id, None if there is neither or it does
+        not exist
+    """
+    bucket_id = operation.get("bucket_id")
+    item_id = operation.get("item_id")
+    if operation.get("type") == "item" and item_id is not None:
+        return profile.get_item(item_id=item_id, buc_id=bucket_id)
+    if bucket_id is not None:
+        return profile.get_bucket(bucket_id=bucket_id)
+    return None
+
+
+# (op, type) of every operation and the function running it
+OPERATIONS = {
+    ("create", "bucket"): create_bucket,
+    ("edit", "bucket"): edit_bucket,
+    ("delete", "bucket"): delete_bucket,
+    ("create", "item"): create_item,
+    ("edit", "item"): update_item,
+    ("patch", "item"): patch_item,
+    ("delete", "item"): delete_item,
+}
+
+
+def run_operation(profile, operation):
+    """Utility function that runs one operation of a batch.
+
+    Returns:
+        tuple of (status code, values of the result)
+    """
+    if not isinstance(operation, dict):
+        return 400, {"message": "An operation must be an object"}
+    run = OPERATIONS.get((operation.get("op"), operation.get("type")))
+    if run is None:
+        return 400, {
+            "message": "Unknown operation, op is create, edit, patch or "
+            "delete and type is bucket or item"
+        }
+    message = id_error(operation)
+    if message:
+        return 400, {"message": message}
+    if_match = operation.get("if_match")
+    if if_match is not None:
+        target = operation_target(profile, operation)
+        if target is None or asset_etag(target) != str(if_match).strip('"'):
+            return 412, {"message": "Modified since it was read, get it again"}
+    return run(profile, operation)
+
+
+@app.header("Authorization", "Access tokken", required=True)
+@app.route('/', endpoint='batch')
+class Batch(BaseResource):
+    """Resource running many operations in one transaction."""
+
+    api = app
+
+    # most operations run by a request
+    MAX_OPERATIONS = 100
+
+    # swagger documentation
+    operation_model = app.model(
+        "batch_operation", {
+            "op": fields.String(
+                required=True, description="create, edit, patch or delete"),
+            "type": fields.String(required=True, description="bucket or item"),
+            "bucket_id": fields.Integer(),
+            "item_id": fields.Integer(),
+            "name": fields.String(),
+            "description": fields.String(),
+            "done": fields.Boolean(),
+            "if_match": fields.String(
+                description="X-Resource-ETag of the bucket or item written")
+        })
+
+    @app.doc(body=[operation_model])
+    def post(self):
+        """Run an ordered list of operations in one transaction.
+
+        The operations run in order until one fails, results has the status
+        of every one that ran. If all succeed they are committed, otherwise
+        all are rolled back and the response has the failed status.
+
+        An If-Match header is checked against the ETag of the bucket list,
+        the if_match of an operation against the bucket or item it writes.
+        """
+        operations = request.get_json(silent=True)
+        if not isinstance(operations, list) or not operations:
+            return {"message": "Expected a non empty array of operations"}, 400
+        if len(operations) > Batch.MAX_OPERATIONS:
+            return {
+                "message":
+                "At most {} operations per request".format(
+                    Batch.MAX_OPERATIONS)
+            }, 400
+        failed = self.precondition_failed(
+            path=resource_path('api.bucketlist'))
+        if failed:
+            return failed
+
+        results = []
+        failed = None
+        with unit_of_work() as rollback:
+            for index, operation in enumerate(operations):
+                status, values = run_operation(self.profile, operation)
+                results.append(bulk_result(index, status, **values))
+                if status >= 400:
+                    failed = status
+                    rollback()
+                    break
+
+        if failed:
+            return make_response({
+                "message": "Operation {} failed, nothing was changed".format(
+                    len(results) - 1),
+                "results": results
+            }, failed)
+        return make_response({
+            "message": "{} operations done".format(len(results)),
+            "results": results
+        }, 200)
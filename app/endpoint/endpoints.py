@@ -1,16 +1,24 @@
 """This Module contains endpoints for Api."""
 
-import re
+import base64
+import hashlib
 
 import webargs
-from flask import request, url_for
-from flask.json import jsonify
+from flask import Response, abort, request, stream_with_context, url_for
 from flask_jwt_extended import get_jwt_claims, jwt_required
 from flask_restplus import Namespace, Resource, fields
-from sqlalchemy import or_
+from flask_sqlalchemy import Pagination
 from webargs.flaskparser import parser
+from werkzeug.http import quote_etag
 
-from app.models import bucketlist, user
+from app.authenticate import principal
+from app.models import bucketlist, profile, user
+from app.response_cache import (bucket_list_namespace, bucket_namespace,
+                                response_cache)
+from app.search import search_backend
+from app.serialization import (RawJSON, item_json, iter_bucket, iter_buckets,
+                               iter_export, iter_items, json_response)
+from app.validation import valid_name
 
 app = Namespace(
     "Bucketlist",
@@ -18,22 +26,201 @@ app = Namespace(
     path='/v1.0/bucketlist')
 
 
-def make_response(values, code, headers=None):
+# rows fetched at a time from server side cursors of streamed responses
+STREAM_BATCH = 500
+
+# header with the ETag of the bucket or item itself, see asset_etag
+RESOURCE_ETAG = "X-Resource-ETag"
+
+
+def make_response(values, code, headers=None, stream=False):
     """Utility function that assemble's endpoint responses."""
-    response = jsonify(values)
-    response.status_code = code
+    response = json_response(values, code, stream)
     if headers:
-        response.headers["Link"] = headers.get('link')
+        if 'link' in headers:
+            response.headers["Link"] = headers.get('link')
+        if headers.get('etag'):
+            response.set_etag(headers['etag'])
+        if headers.get('resource etag'):
+            response.headers[RESOURCE_ETAG] = quote_etag(
+                headers['resource etag'])
     return response
 
 
-def validat_str(name):
-    """Utility function that validates names for buckets/items."""
-    if len(name.strip()) == 0:
-        return False
-    if re.match("^[A-Za-z0-9_\s]*$", name):
-        return True
-    return False
+def resource_path(endpoint, **values):
+    """Utility function that gives the path of a resource like request.path.
+
+    It leaves out the script root url_for adds, so it can be passed to
+    BaseResource.etag.
+    """
+    return url_for(endpoint, **values)[len(request.script_root):]
+
+
+def asset_etag(asset):
+    """Utility function that gives the ETag of a bucket or item itself.
+
+    Unlike the ETags of responses it only changes with the asset's own
+    columns, writes to other assets of the profile leave it alone, so
+    writes conditioned on it do not fail for unrelated changes.
+
+    Returns:
+        ETag, without quotes
+    """
+    values = [asset.__tablename__, asset.id, asset.name, asset.date_modified]
+    if isinstance(asset, bucketlist.Item):
+        values += [asset.description, asset.done]
+    return hashlib.sha1(repr(values).encode()).hexdigest()
+
+
+def not_modified(etag):
+    """Utility function that assemble's a 304 response, it has no body."""
+    response = Response(status=304, mimetype='application/json')
+    response.set_etag(etag)
+    return response
+
+
+def encode_cursor(profile_id, asset_id):
+    """Utility function that builds an opaque keyset pagination cursor."""
+    raw = "{}:{}".format(profile_id, asset_id).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    """Utility function that reads a cursor built by encode_cursor.
+
+    Returns:
+        tuple of (profile_id, asset_id) if cursor is valid, else None
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        profile_id, asset_id = raw.split(":")
+        return int(profile_id), int(asset_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def keyset_page(query, model, after, limit, profile_id):
+    """Utility function that fetches the page of rows after a cursor.
+
+    Keyset pagination on asset_id, no count or offset is run so every page
+    costs the same as the first one.
+
+    Returns:
+        tuple of (rows, next cursor), (None, None) if the cursor is invalid
+    """
+    last_asset_id = -1
+    if after:
+        cursor = decode_cursor(after)
+        if cursor is None or cursor[0] != profile_id:
+            return None, None
+        last_asset_id = cursor[1]
+
+    rows = query.filter(model.asset_id > last_asset_id).order_by(
+        model.asset_id).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(profile_id, rows[-1].asset_id)
+    return rows, next_cursor
+
+
+def counted_page(query, page, limit, total):
+    """Utility function that fetches a page of rows already counted.
+
+    Like paginate, without the COUNT it runs.
+
+    Returns:
+        Pagination of the page, aborts with 404 before the first page and
+        past the last one
+    """
+    if page < 1:
+        abort(404)
+    items = query.limit(limit).offset((page - 1) * limit).all()
+    if not items and page != 1:
+        abort(404)
+    return Pagination(query, page, limit, total, items)
+
+
+def page_limit(limit):
+    """Utility function that bounds the page size asked for."""
+    if limit and limit > 100:
+        limit = 100
+    if not limit or limit < 1:
+        limit = 20
+    return limit
+
+
+def preview_size(items):
+    """Utility function that bounds the items embedded in a bucket."""
+    if items is None or items < 0:
+        return bucketlist.Bucket.ITEMS_PREVIEW
+    return min(items, 100)
+
+
+def bucket_representation(args):
+    """Utility function that reads how buckets should be represented.
+
+    Reads the fields, expand and items query arguments.
+
+    Returns:
+        tuple of (fields, preview, error), fields is None for every field
+        and preview is None to embed all items
+    """
+    fields = args.get("fields")
+    expand = args.get("expand")
+    preview = preview_size(args.get("items"))
+    if expand is not None:
+        if expand != "items":
+            return None, None, "Only items can be expanded"
+        preview = None
+    if fields is None:
+        return None, preview, None
+
+    fields = {
+        field.strip().replace("_", " ")
+        for field in fields.split(",") if field.strip()
+    }
+    if expand:
+        fields.add("items")
+    unknown = fields - set(bucketlist.Bucket.COLUMN_FIELDS)
+    unknown = unknown - bucketlist.Bucket.SUMMARY_FIELDS
+    if unknown:
+        return None, None, "Unknown fields: " + ", ".join(sorted(unknown))
+    return fields, preview, None
+
+
+def buckets_json(buckets, preview, fields=None, stream=False):
+    """Utility function that serializes buckets keyed by asset_id.
+
+    Args:
+        buckets(list): Buckets, or rows with the columns for fields
+        preview(int): Number of items to embed, None for all
+        fields(set): Fields to represent, None for every field
+        stream(bool): When all items are embedded, read them from a server
+            side cursor per bucket while serializing instead of up front
+    """
+    summaries = None
+    if fields is None or fields & bucketlist.Bucket.SUMMARY_FIELDS:
+        lazy = stream and preview is None
+        summaries = bucketlist.Bucket.item_summaries(
+            [bucket.id for bucket in buckets], 0 if lazy else preview)
+        if lazy:
+            for bucket_id, summary in summaries.items():
+                summary["items"] = bucketlist.Item.query.filter_by(
+                    bucket_id=bucket_id).order_by(
+                        bucketlist.Item.asset_id).yield_per(STREAM_BATCH)
+    return RawJSON(iter_buckets(buckets, summaries, fields))
+
+
+def bucket_json(bucket):
+    """Utility function that serializes a bucket and its item summary.
+
+    The JSON text is built at once, while the bucket is still in the
+    session, not when the response is written, which a batch does after
+    its transaction ended.
+    """
+    summary = bucketlist.Bucket.item_summaries([bucket.id])[bucket.id]
+    return RawJSON("".join(iter_bucket(bucket, summary)))
 
 
 # swagger documentation
@@ -51,6 +238,8 @@ bucket_model = app.model('BucketList', {
     'id': fields.Integer(),
     'name': fields.String(),
     'items': fields.Nested(item_model),
+    'item count': fields.Integer(),
+    'done count': fields.Integer(),
     'created by': fields.String(),
     'date created': fields.String(),
     'date modified': fields.String()
@@ -65,11 +254,101 @@ class BaseResource(Resource):
     @jwt_required
     def __init__(self, req):
         """Initialize username, user object and the user profile."""
-        self.username = get_jwt_claims()['user_credential']
-        self.user = user.User.get_user(name=self.username)
+        claims = get_jwt_claims()
+        self.username = claims['user_credential']
+        self.user, self.profile = principal.load_principal(
+            claims.get('user_id'), claims.get('profile_id'))
         if not self.user:
-            self.user = user.User.get_user(email=self.username)
-        self.profile = self.user.profile
+            # tokens issued before ids were added to the claims
+            self.user = user.User.get_user(name=self.username)
+            if not self.user:
+                self.user = user.User.get_user(email=self.username)
+            self.profile = self.user.profile
+
+    def etag(self, representation=None):
+        """Get the strong ETag of a representation of the user's assets.
+
+        It is derived from the profile's version, which is bumped by every
+        write to the profile's buckets and items, so it costs one query and
+        nothing has to be serialized to check it.
+
+        Args:
+            representation(str): Identifies the representation, by default
+                the path and query string of the request
+
+        Returns:
+            ETag, without quotes
+        """
+        if representation is None:
+            representation = request.full_path
+        version = profile.Profile.current_version(self.profile.id)
+        key = "{}:{}:{}:{}".format(self.profile.id, version, self.username,
+                                   representation)
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def cached(self, namespace, etag, build):
+        """Serve a GET from the response cache, else build and cache it.
+
+        Args:
+            namespace(str): Namespace of the response in the cache
+            etag(str): ETag of the response
+            build(callable): Builds the response from the database
+
+        Returns:
+            response, with an X-Cache header telling if it was cached
+        """
+        cache = response_cache()
+        if cache is None:
+            return build()
+
+        key = cache.key(namespace, self.username + ":" + request.full_path)
+        cached = cache.get(key)
+        if cached is not None:
+            body, headers = cached
+            response = Response(body, mimetype='application/json')
+            if headers.get("link") is not None:
+                response.headers["Link"] = headers["link"]
+            if headers.get("resource etag") is not None:
+                response.headers[RESOURCE_ETAG] = headers["resource etag"]
+            response.set_etag(etag)
+            response.headers["X-Cache"] = "HIT"
+            return response
+
+        response = build()
+        if isinstance(response, Response) and response.status_code == 200:
+            cache.set(key, response.get_data(), {
+                "link": response.headers.get("Link"),
+                "resource etag": response.headers.get(RESOURCE_ETAG)
+            })
+            response.headers["X-Cache"] = "MISS"
+        return response
+
+    def resource_etag(self):
+        """Get the ETag of the resource's GET without query arguments."""
+        return self.etag(request.path + "?")
+
+    def precondition_failed(self, find=None, path=None):
+        """Check the If-Match header of a write against the resource's ETags.
+
+        The ETag of the resource's GET matches while nothing of the profile
+        changed, the X-Resource-ETag of the bucket or item written, see
+        asset_etag, while it did not change itself.
+
+        Args:
+            find(callable): Loads the bucket or item written, called only
+                if the ETag of the GET did not match
+            path(str): Path of the GET, by default the request's
+
+        Returns:
+            412 response if the resource changed since it was read, else None
+        """
+        if not request.if_match or request.if_match.contains(
+                self.etag((path or request.path) + "?")):
+            return None
+        asset = find() if find else None
+        if asset is not None and request.if_match.contains(asset_etag(asset)):
+            return None
+        return {"message": "Modified since it was read, get it again"}, 412
 
 
 @app.header("Authorization", "Access tokken", required=True)
@@ -81,35 +360,76 @@ class BucketList(BaseResource):
     query_args = {
         "limit": webargs.fields.Int(),
         "page": webargs.fields.Int(),
-        "q": webargs.fields.Str()
+        "q": webargs.fields.Str(),
+        "after": webargs.fields.Str(),
+        "items": webargs.fields.Int(),
+        "fields": webargs.fields.Str(),
+        "expand": webargs.fields.Str(),
+        "stream": webargs.fields.Boolean()
     }
 
     @app.doc(params={
         "limit": "limit the results",
         "page": "page required",
-        "q": "Search term"
+        "q": "Search term",
+        "after": "cursor from the previous page, empty for the first page",
+        "items": "number of items embedded in each bucket",
+        "fields": "comma separated bucket fields to return",
+        "expand": "items, to embed all items of each bucket",
+        "stream": "stream the response as it is serialized, uncached"
     })
     def get(self):
         """List all the created bucket lists."""
         args = parser.parse(BucketList.query_args, request)
-        limit = args.get("limit")
+        limit = page_limit(args.get("limit"))
         page = args.get("page")
-        query = args.get("q")
-        if limit and limit > 100:
-            limit = 100
-        if not limit or limit < 1:
-            limit = 20
         if not page:
             page = 1
 
+        fields, preview, error = bucket_representation(args)
+        if error:
+            return {"message": error}, 400
+
+        etag = self.etag()
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+
+        if args.get("stream"):
+            return self.list_buckets(args, limit, page, fields, preview, etag)
+        return self.cached(
+            bucket_list_namespace(self.profile.id), etag,
+            lambda: self.list_buckets(args, limit, page, fields, preview,
+                                      etag))
+
+    def list_buckets(self, args, limit, page, fields, preview, etag):
+        """List buckets from the database."""
+        stream = bool(args.get("stream"))
+        query = args.get("q")
         get_bucket = bucketlist.Bucket.query.filter_by(
             profile_id=self.profile.id)
+        if fields is not None:
+            get_bucket = get_bucket.with_entities(
+                *bucketlist.Bucket.field_columns(fields))
+        rank = None
         if query:
-            get_bucket = get_bucket.filter(
-                or_(
-                    bucketlist.Bucket.name.ilike("%" + query + "%"),
-                    bucketlist.Bucket.name.contains(query)))
-        paginate = get_bucket.paginate(page, limit, True)
+            # the last word is matched as it is typed, like the substring
+            # match the listing had before full-text search
+            get_bucket, rank = search_backend().match(
+                get_bucket, bucketlist.Bucket, query, prefix=True)
+        if args.get("after") is not None:
+            # cursors page in asset_id order, so matches are not ranked
+            return self.get_after(get_bucket, args, limit, fields, preview,
+                                  etag)
+        if rank is not None:
+            get_bucket = get_bucket.order_by(rank)
+        get_bucket = get_bucket.order_by(bucketlist.Bucket.asset_id)
+        if query:
+            paginate = get_bucket.paginate(page, limit, True)
+        else:
+            # the profile counts its buckets, they are not counted again
+            paginate = counted_page(
+                get_bucket, page, limit,
+                profile.Profile.current_bucket_count(self.profile.id))
 
         headers = {}
         link = []
@@ -118,6 +438,10 @@ class BucketList(BaseResource):
                 'api.bucketlist',
                 q=query,
                 limit=limit,
+                items=args.get("items"),
+                fields=args.get("fields"),
+                expand=args.get("expand"),
+                stream=args.get("stream"),
                 page=paginate.next_num,
                 _external=True)
             link.append("<" + url_for_next + ">" + "; rel='next'")
@@ -127,22 +451,67 @@ class BucketList(BaseResource):
                 'api.bucketlist',
                 q=query,
                 limit=limit,
+                items=args.get("items"),
+                fields=args.get("fields"),
+                expand=args.get("expand"),
+                stream=args.get("stream"),
                 page=paginate.prev_num,
                 _external=True)
             link.append("<" + url_for_prev + ">" + "; rel='prev'")
         headers["link"] = link
+        headers["etag"] = etag
 
-        data = {bucket.asset_id: bucket.to_dict() for bucket in paginate.items}
+        data = buckets_json(paginate.items, preview, fields, stream)
         return make_response(
             {
                 "message": "User buckets",
                 "current page": page,
                 "total pages": paginate.pages,
+                "total buckets": paginate.total,
                 "user": self.username,
                 "buckets": data
             },
             200,
-            headers=headers)
+            headers=headers,
+            stream=stream)
+
+    def get_after(self, get_bucket, args, limit, fields, preview, etag):
+        """List buckets that come after a cursor."""
+        stream = bool(args.get("stream"))
+        buckets, next_cursor = keyset_page(get_bucket, bucketlist.Bucket,
+                                           args["after"], limit,
+                                           self.profile.id)
+        if buckets is None:
+            return {"message": "Invalid cursor"}, 400
+
+        headers = {}
+        link = []
+        if next_cursor:
+            url_for_next = url_for(
+                'api.bucketlist',
+                q=args.get("q"),
+                limit=limit,
+                items=args.get("items"),
+                fields=args.get("fields"),
+                expand=args.get("expand"),
+                stream=args.get("stream"),
+                after=next_cursor,
+                _external=True)
+            link.append("<" + url_for_next + ">" + "; rel='next'")
+        headers["link"] = link
+        headers["etag"] = etag
+
+        data = buckets_json(buckets, preview, fields, stream)
+        return make_response(
+            {
+                "message": "User buckets",
+                "next cursor": next_cursor,
+                "user": self.username,
+                "buckets": data
+            },
+            200,
+            headers=headers,
+            stream=stream)
 
     # swagger documentation
     create_bucket_args = {"name": webargs.fields.Str(required=True)}
@@ -156,7 +525,7 @@ class BucketList(BaseResource):
 
         # validate name
         name = args["name"]
-        if not validat_str(name):
+        if not valid_name(name):
             return {
                 "message":
                 "bucket name can only contain letters numbers and space"
@@ -183,14 +552,56 @@ class BucketList(BaseResource):
 class BucketListOperations(BaseResource):
     """Resource for Bucketlist Operations."""
 
+    # swagger documentation
+    query_args = {
+        "items": webargs.fields.Int(),
+        "fields": webargs.fields.Str(),
+        "expand": webargs.fields.Str()
+    }
+
+    @app.doc(params={
+        "items": "number of items embedded in the bucket",
+        "fields": "comma separated bucket fields to return",
+        "expand": "items, to embed all items of the bucket"
+    })
     def get(self, bucket_id):
         """Get single bucket list."""
-        data = self.profile.bucket_lists.get(bucket_id)
-        if data is None:
+        args = parser.parse(BucketListOperations.query_args, request)
+        fields, preview, error = bucket_representation(args)
+        if error:
+            return {"message": error}, 400
+
+        etag = self.etag()
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+
+        return self.cached(
+            bucket_namespace(self.profile.id, bucket_id), etag,
+            lambda: self.find_bucket(bucket_id, fields, preview, etag))
+
+    def find_bucket(self, bucket_id, fields, preview, etag):
+        """Get a bucket from the database."""
+        get_bucket = bucketlist.Bucket.query.filter_by(
+            profile_id=self.profile.id, asset_id=bucket_id)
+        if fields is not None:
+            get_bucket = get_bucket.with_entities(
+                *bucketlist.Bucket.field_columns(fields))
+        bucket = get_bucket.first()
+        if bucket is None:
             return {"message": "Bucket not found"}, 404
 
-        data = data.to_dict()
-        return make_response({"message": "bucket found", "bucket": data}, 200)
+        summary = None
+        if fields is None or fields & bucketlist.Bucket.SUMMARY_FIELDS:
+            summary = bucketlist.Bucket.item_summaries([bucket.id],
+                                                       preview)[bucket.id]
+        data = RawJSON(iter_bucket(bucket, summary, fields))
+        headers = {"etag": etag}
+        if fields is None:
+            headers["resource etag"] = asset_etag(bucket)
+        return make_response(
+            {"message": "bucket found", "bucket": data},
+            200,
+            headers=headers)
 
     # swagger documentation
     update_bucket_args = {"name": webargs.fields.Str(required=True)}
@@ -203,27 +614,41 @@ class BucketListOperations(BaseResource):
         args = parser.parse(BucketListOperations.update_bucket_args, request)
         name = args["name"]
 
-        if not validat_str(name):
+        if not valid_name(name):
             return {
                 "message":
                 "bucket name can only contain letters numbers and space"
             }, 400
 
-        edit = self.profile.edit_asset(
-            item=False, name=name, asset_id=bucket_id)
-        if edit is None:
+        failed = self.precondition_failed(
+            lambda: self.profile.get_bucket(bucket_id=bucket_id))
+        if failed:
+            return failed
+
+        bucket = self.profile.update_bucket(bucket_id, name)
+        if bucket is None:
             return {"message": "Bucket not found"}, 404
-        if not edit:
+        if bucket is False:
             return {"message": "Bucket not edited"}, 422
         else:
-            data = self.profile.bucket_lists.get(bucket_id).to_dict()
-            return make_response({
-                "message": "Updated bucket succesfully",
-                "bucket": data
-            }, 201)
+            return make_response(
+                {
+                    "message": "Updated bucket succesfully",
+                    "bucket": bucket_json(bucket)
+                },
+                201,
+                headers={
+                    "etag": self.resource_etag(),
+                    "resource etag": asset_etag(bucket)
+                })
 
     def delete(self, bucket_id):
         """Delete this single bucket list."""
+        failed = self.precondition_failed(
+            lambda: self.profile.get_bucket(bucket_id=bucket_id))
+        if failed:
+            return failed
+
         deleted = self.profile.delete_asset(asset_id=bucket_id)
         if deleted is None:
             return {"message": "Bucket not found"}, 404
@@ -233,11 +658,95 @@ class BucketListOperations(BaseResource):
             return {"message": "Bucket deleted succesfully"}, 200
 
 
+def bulk_item_error(entry):
+    """Utility function that validates an item of a bulk request.
+
+    Returns:
+        message of what is wrong with the item, None if it is valid
+    """
+    if not isinstance(entry, dict):
+        return "An item must be an object"
+    name = entry.get("name")
+    if not isinstance(name, str) or not valid_name(name):
+        return "item name can only contain letters numbers and space"
+    if len(name) > bucketlist.Item.name.type.length:
+        return "item name is too long"
+    description = entry.get("description")
+    if description is not None and not isinstance(description, str):
+        return "item description must be a string"
+    if description and len(description) > \
+            bucketlist.Item.description.type.length:
+        return "item description is too long"
+    return None
+
+
+def bulk_result(index, status, **values):
+    """Utility function that assemble's the result of a bulk request row."""
+    result = {"index": index, "status": status}
+    result.update(values)
+    return result
+
+
 @app.header("Authorization", "Access tokken", required=True)
 @app.route('/<int:bucket_id>/items', endpoint='item')
 class Item(BaseResource):
     """Resource for Item."""
 
+    # swagger documentation
+    list_items_args = {
+        "limit": webargs.fields.Int(),
+        "after": webargs.fields.Str(),
+        "done": webargs.fields.Boolean()
+    }
+
+    @app.doc(params={
+        "limit": "limit the results",
+        "after": "cursor from the previous page",
+        "done": "only items that are done (true) or not done (false)"
+    })
+    def get(self, bucket_id):
+        """List the items in a bucket list."""
+        args = parser.parse(Item.list_items_args, request)
+        limit = page_limit(args.get("limit"))
+        done = args.get("done")
+
+        bucket = self.profile.get_bucket(bucket_id=bucket_id)
+        if bucket is None:
+            return {"message": "Bucket not found"}, 404
+
+        get_item = bucketlist.Item.query.filter_by(bucket_id=bucket.id)
+        if done is not None:
+            get_item = get_item.filter_by(done=done)
+        items, next_cursor = keyset_page(get_item, bucketlist.Item,
+                                         args.get("after"), limit,
+                                         self.profile.id)
+        if items is None:
+            return {"message": "Invalid cursor"}, 400
+
+        headers = {}
+        link = []
+        if next_cursor:
+            url_for_next = url_for(
+                'api.item',
+                bucket_id=bucket_id,
+                limit=limit,
+                done=done,
+                after=next_cursor,
+                _external=True)
+            link.append("<" + url_for_next + ">" + "; rel='next'")
+        headers["link"] = link
+
+        data = RawJSON(iter_items(items))
+        return make_response(
+            {
+                "message": "Bucket items",
+                "bucket_id": bucket_id,
+                "next cursor": next_cursor,
+                "items": data
+            },
+            200,
+            headers=headers)
+
     # swagger documentation
     create_items_args = {
         "name": webargs.fields.Str(required=True),
@@ -256,14 +765,14 @@ class Item(BaseResource):
         description = args.get("description", "Let's Do this")
 
         # validate name
-        if not validat_str(name):
+        if not valid_name(name):
             return {
                 "message":
                 "bucket name can only contain letters numbers and space"
             }, 400
 
         # get bucket
-        bucket = self.profile.bucket_lists.get(bucket_id)
+        bucket = self.profile.get_bucket(bucket_id=bucket_id)
         if bucket is None:
             return {"message": "Bucket not found"}, 404
         # get item
@@ -283,6 +792,299 @@ class Item(BaseResource):
             "item": data
         }, 201
 
+    # most items marked by a request
+    MAX_MARKED = 1000
+
+    # swagger documentation
+    mark_items_args = {
+        "done": webargs.fields.Boolean(required=True),
+        "items": webargs.fields.List(webargs.fields.Int())
+    }
+    mark_items_args_model = app.model(
+        "mark_items_args", {
+            "done": fields.Boolean(required=True),
+            "items": fields.List(fields.Integer)
+        })
+
+    @app.doc(body=mark_items_args_model)
+    def patch(self, bucket_id):
+        """Mark items of a bucket list done, or not done.
+
+        Marks the items listed in items, or every item of the bucket if it
+        is not given, with one UPDATE.
+        """
+        args = parser.parse(Item.mark_items_args, request)
+        item_ids = args.get("items")
+        if item_ids is not None and len(item_ids) > Item.MAX_MARKED:
+            return {
+                "message":
+                "At most {} items per request".format(Item.MAX_MARKED)
+            }, 400
+
+        # the items are written on the condition of their bucket
+        failed = self.precondition_failed(
+            lambda: self.profile.get_bucket(bucket_id=bucket_id),
+            resource_path('api.bucketlistoperations', bucket_id=bucket_id))
+        if failed:
+            return failed
+
+        changed = self.profile.mark_items_done(
+            args["done"], buc_id=bucket_id, item_ids=item_ids)
+        if changed is None:
+            return {"message": "Bucket not found"}, 404
+        if changed is False:
+            return {"message": "Unable to edit items"}, 422
+        return {
+            "message": "Patched items succesfully",
+            "bucket_id": bucket_id,
+            "changed": changed
+        }, 200
+
+
+@app.header("Authorization", "Access tokken", required=True)
+@app.route('/<int:bucket_id>/items/bulk', endpoint='itembulk')
+class ItemBulk(BaseResource):
+    """Resource for creating many items at once."""
+
+    # most items created by a request
+    MAX_ITEMS = 500
+
+    # swagger documentation
+    create_items_model = app.model(
+        "create_items_bulk", {
+            "name": fields.String(required=True),
+            "description": fields.String()
+        })
+
+    @app.doc(body=[create_items_model])
+    def post(self, bucket_id):
+        """Create many items in a bucket list, in one transaction.
+
+        Takes a JSON array of items, every valid item is created and every
+        other one gets a message, at the same index of the results.
+        """
+        entries = request.get_json(silent=True)
+        if not isinstance(entries, list) or not entries:
+            return {"message": "Expected a non empty array of items"}, 400
+        if len(entries) > ItemBulk.MAX_ITEMS:
+            return {
+                "message":
+                "At most {} items per request".format(ItemBulk.MAX_ITEMS)
+            }, 400
+
+        bucket = self.profile.get_bucket(bucket_id=bucket_id)
+        if bucket is None:
+            return {"message": "Bucket not found"}, 404
+        # the items are written on the condition of their bucket
+        failed = self.precondition_failed(
+            lambda: bucket,
+            resource_path('api.bucketlistoperations', bucket_id=bucket_id))
+        if failed:
+            return failed
+
+        results = [None] * len(entries)
+        valid = []
+        for index, entry in enumerate(entries):
+            message = bulk_item_error(entry)
+            if message:
+                results[index] = bulk_result(index, 400, message=message)
+            else:
+                valid.append((index, entry))
+
+        # one query for the duplicates of every name
+        taken = bucketlist.Item.get_taken_names(
+            [entry["name"] for _, entry in valid], self.profile.id)
+        items = []
+        for index, entry in valid:
+            name = entry["name"]
+            if name in taken:
+                results[index] = bulk_result(
+                    index, 400, message="Item " + name + " exists")
+                continue
+            taken.add(name)
+            items.append((index, {
+                "name": name,
+                "description": entry.get("description") or "Let's Do this"
+            }))
+
+        asset_ids = self.profile.add_items(
+            [item for _, item in items], buc_id=bucket_id)
+        if asset_ids is False:
+            return {"message": "Server error: Creating items failed"}, 500
+
+        created = {}
+        if asset_ids:
+            created = {
+                item.asset_id: item
+                for item in bucketlist.Item.query.filter(
+                    bucketlist.Item.bucket_id == bucket.id,
+                    bucketlist.Item.asset_id.in_(asset_ids))
+            }
+        for (index, _), asset_id in zip(items, asset_ids or ()):
+            results[index] = bulk_result(
+                index, 201, item=RawJSON(item_json(created[asset_id])))
+
+        code = 207
+        if len(created) == len(entries):
+            code = 201
+        elif not created:
+            code = 400
+        return make_response(
+            {
+                "message": "{} of {} items created".format(
+                    len(created), len(entries)),
+                "bucket_id": bucket_id,
+                "results": results
+            }, code)
+
+
+@app.header("Authorization", "Access tokken", required=True)
+@app.route('/export', endpoint='export')
+class Export(BaseResource):
+    """Resource for exporting all bucket lists with their items."""
+
+    # swagger documentation
+    export_args = {"format": webargs.fields.Str()}
+
+    @app.doc(params={"format": "json (default) or ndjson, a line per record"})
+    def get(self):
+        """Export every bucket list and item, streamed."""
+        args = parser.parse(Export.export_args, request)
+        export_format = args.get("format") or "json"
+        if export_format not in ("json", "ndjson"):
+            return {"message": "Format can only be json or ndjson"}, 400
+
+        etag = self.etag()
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+
+        Bucket, Item = bucketlist.Bucket, bucketlist.Item
+        columns = Bucket.field_columns(set(Bucket.COLUMN_FIELDS) | {"items"})
+        buckets = Bucket.query.filter_by(
+            profile_id=self.profile.id).with_entities(*columns).order_by(
+                Bucket.id).yield_per(STREAM_BATCH)
+        items = Item.of_profile(self.profile.id).filter(
+            Item.bucket_id.isnot(None)).with_entities(
+                Item.bucket_id, Item.asset_id, Item.name, Item.description,
+                Item.done, Item.date_created, Item.date_modified).order_by(
+                    Item.bucket_id, Item.asset_id).yield_per(STREAM_BATCH)
+
+        chunks = iter_export(buckets, items, export_format == "ndjson")
+        mimetype = 'application/json'
+        if export_format == "ndjson":
+            mimetype = 'application/x-ndjson'
+        response = Response(stream_with_context(chunks), mimetype=mimetype)
+        response.set_etag(etag)
+        return response
+
+
+@app.header("Authorization", "Access tokken", required=True)
+@app.route('/suggest', endpoint='suggest')
+class Suggest(BaseResource):
+    """Resource for autocompleting bucket and item names."""
+
+    # names suggested by default and at most
+    SUGGESTIONS = 5
+    MAX_SUGGESTIONS = 20
+
+    # swagger documentation
+    suggest_args = {
+        "prefix": webargs.fields.Str(required=True),
+        "limit": webargs.fields.Int()
+    }
+
+    @app.doc(params={
+        "prefix": "Start of the names, in any case",
+        "limit": "number of names suggested, at most 20"
+    })
+    def get(self):
+        """Suggest bucket and item names starting with a prefix."""
+        args = parser.parse(Suggest.suggest_args, request)
+        limit = args.get("limit") or Suggest.SUGGESTIONS
+        limit = max(1, min(limit, Suggest.MAX_SUGGESTIONS))
+
+        backend = search_backend()
+        data = {}
+        queries = (
+            ("buckets", bucketlist.Bucket,
+             bucketlist.Bucket.query.filter_by(profile_id=self.profile.id)),
+            ("items", bucketlist.Item,
+             bucketlist.Item.of_profile(self.profile.id)), )
+        for key, model, names in queries:
+            names = backend.suggest(
+                names.with_entities(model.name), model, args["prefix"])
+            data[key] = [name for name, in names.limit(limit)]
+        return {
+            "message": "Suggestions",
+            "prefix": args["prefix"],
+            "buckets": data["buckets"],
+            "items": data["items"]
+        }, 200
+
+
+@app.header("Authorization", "Access tokken", required=True)
+@app.route('/items/search', endpoint='itemsearch')
+class ItemSearch(BaseResource):
+    """Resource for searching items in all bucket lists."""
+
+    # swagger documentation
+    search_args = {
+        "q": webargs.fields.Str(required=True),
+        "limit": webargs.fields.Int(),
+        "page": webargs.fields.Int()
+    }
+
+    @app.doc(params={
+        "q": "Search term, matched against item names and descriptions",
+        "limit": "limit the results",
+        "page": "page required"
+    })
+    def get(self):
+        """Search items, best matches first."""
+        args = parser.parse(ItemSearch.search_args, request)
+        limit = page_limit(args.get("limit"))
+        page = args.get("page") or 1
+
+        get_item = bucketlist.Item.query.join(
+            bucketlist.Bucket,
+            bucketlist.Item.bucket_id == bucketlist.Bucket.id).filter(
+                bucketlist.Item.profile_id == self.profile.id,
+                # not the items of buckets being purged
+                bucketlist.Bucket.profile_id == self.profile.id
+            ).with_entities(
+                    bucketlist.Item, bucketlist.Bucket.asset_id)
+        get_item, rank = search_backend().match(
+            get_item, bucketlist.Item, args["q"], prefix=True)
+        paginate = get_item.order_by(rank, bucketlist.Item.asset_id).paginate(
+            page, limit, False)
+
+        headers = {}
+        link = []
+        if paginate.has_next:
+            url_for_next = url_for(
+                'api.itemsearch',
+                q=args["q"],
+                limit=limit,
+                page=paginate.next_num,
+                _external=True)
+            link.append("<" + url_for_next + ">" + "; rel='next'")
+        headers["link"] = link
+
+        data = []
+        for item, bucket_id in paginate.items:
+            item_dict = item.to_dict()
+            item_dict["bucket id"] = bucket_id
+            data.append(item_dict)
+        return make_response(
+            {
+                "message": "Item search",
+                "current page": page,
+                "user": self.username,
+                "items": data
+            },
+            200,
+            headers=headers)
+
 
 @app.header("Authorization", "Access tokken", required=True)
 @app.route('/<int:bucket_id>/items/<int:item_id>', endpoint='itemoperations')
@@ -291,10 +1093,14 @@ class ItemOperations(BaseResource):
 
     def get(self, bucket_id, item_id):
         """Get Single Item."""
-        bucket = self.profile.bucket_lists.get(bucket_id)
+        etag = self.etag()
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+
+        bucket = self.profile.get_bucket(bucket_id=bucket_id)
         if not bucket:
             return {"message": "Bucket specified does not exist"}, 404
-        item = bucket.items.get(item_id)
+        item = bucket.get_item(item_id)
         if not item:
             return {
                 "mesage": "Item specified does not exist in the bucketlist"
@@ -308,7 +1114,10 @@ class ItemOperations(BaseResource):
                 "create by": bucket.created_by
             },
             "message": "Item found in bucket"
-        }, 200
+        }, 200, {
+            "ETag": quote_etag(etag),
+            RESOURCE_ETAG: quote_etag(asset_etag(item))
+        }
 
     update_items_args = {"done": webargs.fields.Boolean(required=True)}
     update_items_args_model = app.model(
@@ -320,24 +1129,28 @@ class ItemOperations(BaseResource):
         args = parser.parse(ItemOperations.update_items_args, request)
         done = args.get("done")
 
-        # get item
-        item = self.profile.get_item(item_id=item_id, buc_id=bucket_id)
-        bucket = self.profile.get_bucket(bucket_id=bucket_id)
-        if not item or not bucket and item.bucket_id != bucket.id:
-            return {"message": "Item not found in bucket"}, 404
-
-        # editted
-        edit = self.profile.edit_asset(
-            item=True, done=done, asset_id=item_id, buc_id=bucket_id)
+        failed = self.precondition_failed(
+            lambda: self.profile.get_item(item_id=item_id, buc_id=bucket_id))
+        if failed:
+            return failed
 
-        if not edit:
+        # one statement finds and edits the item
+        item = self.profile.update_item(bucket_id, item_id, done=done)
+        if item is None:
+            return {"message": "Item not found in bucket"}, 404
+        if item is False:
             return {"message": "Unable to edit item"}, 422
 
-        # get item
-        return {
-            "message": "Patched Item succesfully",
-            "item": item.to_dict()
-        }, 200
+        return make_response(
+            {
+                "message": "Patched Item succesfully",
+                "item": RawJSON(item_json(item))
+            },
+            200,
+            headers={
+                "etag": self.resource_etag(),
+                "resource etag": asset_etag(item)
+            })
 
     # swagger documrntation
     edit_items_args = {
@@ -363,36 +1176,35 @@ class ItemOperations(BaseResource):
             }, 400
 
         # validate name
-        if name and (not validat_str(name)):
+        if name and (not valid_name(name)):
             return {
                 "message":
                 "Item name can only contain letters numbers and space"
             }, 400
 
-        # get item
+        failed = self.precondition_failed(
+            lambda: self.profile.get_item(item_id=item_id, buc_id=bucket_id))
+        if failed:
+            return failed
 
-        item = self.profile.get_item(item_id=item_id, buc_id=bucket_id)
-        bucket = self.profile.get_bucket(bucket_id=bucket_id)
-        if not item or not bucket:
+        # one statement finds and edits the item
+        item = self.profile.update_item(
+            bucket_id, item_id, name=name, description=description)
+        if item is None:
             return {"message": "Unable to find bucket/item"}, 404
-
-        if item.bucket_id != bucket.id:
-            return {"message": "Item not found in bucket"}, 404
-
-        # editted
-        edit = self.profile.edit_asset(
-            item=True,
-            name=name,
-            description=description,
-            asset_id=item_id,
-            buc_id=bucket_id)
-        if not edit:
+        if item is False:
             return {"message": "Unable to edit item"}, 422
 
-        return {
-            "message": "Updated Item succesfully",
-            "item": item.to_dict()
-        }, 201
+        return make_response(
+            {
+                "message": "Updated Item succesfully",
+                "item": RawJSON(item_json(item))
+            },
+            201,
+            headers={
+                "etag": self.resource_etag(),
+                "resource etag": asset_etag(item)
+            })
 
     def delete(self, bucket_id, item_id):
         """Delete an item in a bucket list."""
@@ -404,6 +1216,11 @@ class ItemOperations(BaseResource):
             return {
                 "message": "Item not found in bucketlist:" + bucket.name
             }, 404
+
+        failed = self.precondition_failed(lambda: item)
+        if failed:
+            return failed
+
         deleted_item = self.profile.delete_asset(
             item=True, asset_id=item_id, buc_id=bucket_id)
         if not deleted_item:
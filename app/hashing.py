@@ -0,0 +1,132 @@
+"""This module hashes and checks passwords in a bounded process pool.
+
+Password hashing is deliberately slow, running it in worker processes keeps
+a burst of logins from stalling every other request on the web worker. The
+number of hash operations in flight is bounded, when the bound is reached
+HashingUnavailable is raised at once instead of queueing the request.
+"""
+
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+from werkzeug import security
+
+
+class HashingUnavailable(Exception):
+    """Raised when too many hash operations are already in flight."""
+
+
+def _generate(password, method, salt_length):
+    """Hash password, runs in a pool worker."""
+    started = time.time()
+    pwhash = security.generate_password_hash(
+        password, method=method, salt_length=salt_length)
+    return pwhash, started, time.time()
+
+
+def _check(pwhash, password):
+    """Check password against pwhash, runs in a pool worker."""
+    started = time.time()
+    valid = security.check_password_hash(pwhash, password)
+    return valid, started, time.time()
+
+
+class HashPool(object):
+    """Bounded pool of processes that run password hash operations."""
+
+    def __init__(self, workers=2, max_pending=32):
+        """Initialize the pool.
+
+        Args:
+            workers(int): Number of worker processes, 0 hashes inline
+            max_pending(int): Maximum operations queued or running at once
+        """
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._stats = {
+            "completed": 0,
+            "rejected": 0,
+            "queue wait total": 0.0,
+            "queue wait max": 0.0,
+            "hash time total": 0.0,
+            "hash time max": 0.0
+        }
+
+    def run(self, function, *args):
+        """Run function(*args) in the pool and wait for its result.
+
+        Raises:
+            HashingUnavailable: if max_pending operations are in flight
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise HashingUnavailable("Too many password operations queued")
+
+        submitted = time.time()
+        try:
+            if not self.workers:
+                result, started, finished = function(*args)
+            else:
+                with self._lock:
+                    # created lazily so a pool is never inherited on fork
+                    if self.executor is None:
+                        self.executor = ProcessPoolExecutor(self.workers)
+                result, started, finished = self.executor.submit(
+                    function, *args).result()
+        finally:
+            self._slots.release()
+
+        self._record(max(started - submitted, 0.0), finished - started)
+        return result
+
+    def _record(self, queue_wait, hash_time):
+        with self._lock:
+            stats = self._stats
+            stats["completed"] += 1
+            stats["queue wait total"] += queue_wait
+            stats["queue wait max"] = max(stats["queue wait max"], queue_wait)
+            stats["hash time total"] += hash_time
+            stats["hash time max"] = max(stats["hash time max"], hash_time)
+
+    def stats(self):
+        """Give counters for queue wait and hash time, in seconds."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["workers"] = self.workers
+        stats["max pending"] = self.max_pending
+        return stats
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def hash_pool():
+    """Get the hash pool of the current app, create it on first use."""
+    pool = current_app.extensions.get('hash_pool')
+    if pool is None:
+        pool = HashPool(
+            workers=current_app.config['PASSWORD_HASH_WORKERS'],
+            max_pending=current_app.config['PASSWORD_HASH_MAX_PENDING'])
+        current_app.extensions['hash_pool'] = pool
+    return pool
+
+
+def generate_password_hash(password):
+    """Hash password with the configured method in the hash pool."""
+    return hash_pool().run(_generate, password,
+                           current_app.config['PASSWORD_HASH_METHOD'],
+                           current_app.config['PASSWORD_SALT_LENGTH'])
+
+
+def check_password_hash(pwhash, password):
+    """Check password against pwhash in the hash pool."""
+    return hash_pool().run(_check, pwhash, password)
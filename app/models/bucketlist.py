@@ -1,7 +1,9 @@
 """This module contains Modlels for Item and Bucketlist."""
 
 from app.base import BaseModel, database
+from sqlalchemy import bindparam, func, or_, select, true
 from sqlalchemy.ext.declarative import declared_attr
+from sqlalchemy.orm import column_property
 from sqlalchemy.orm.collections import attribute_mapped_collection
 
 
@@ -27,8 +29,9 @@ class Base(database.Model, BaseModel):
     @declared_attr
     def profile_id(self):
         """Profile Id, links bucket/item to a profile."""
-        return database.Column(database.Integer,
-                               database.ForeignKey('profiles.id'))
+        return database.Column(
+            database.Integer,
+            database.ForeignKey('profiles.id', ondelete="CASCADE"))
 
     def to_dict(self):
         """Give a Dictionary represantation for the model."""
@@ -67,35 +70,120 @@ class Bucket(Base):
     """Model Bucket that holds items in the application."""
 
     __tablename__ = "buckets"
+    __table_args__ = (
+        database.Index(
+            'ix_buckets_profile_id_asset_id',
+            'profile_id',
+            'asset_id',
+            unique=True),
+        database.Index('ix_buckets_profile_id_name', 'profile_id', 'name'), )
+    # the database deletes the items of a deleted bucket, they are not
+    # loaded to be deleted one by one
     items = database.relationship(
         "Item",
         collection_class=attribute_mapped_collection('asset_id'),
-        cascade="all, delete-orphan")
+        cascade="all, delete-orphan",
+        passive_deletes=True)
 
     created_by = database.Column(database.String(128))
 
+    # number of items in the bucket and how many of them are done, kept in
+    # the transaction that adds, edits or deletes an item, see
+    # Bucket.add_to_counts
+    item_count = database.Column(
+        database.Integer, default=0, server_default="0", nullable=False)
+    done_count = database.Column(
+        database.Integer, default=0, server_default="0", nullable=False)
+
+    # number of items embedded in a bucket's dictionary represantation
+    ITEMS_PREVIEW = 5
+
+    # fields of the dictionary represantation and the columns they show
+    COLUMN_FIELDS = {
+        "id": "asset_id",
+        "name": "name",
+        "date created": "date_created",
+        "date modified": "date_modified",
+        "created by": "created_by",
+        "item count": "item_count",
+        "done count": "done_count"
+    }
+    SUMMARY_FIELDS = {"items"}
+
     def __init__(self, name=""):
         """Initialize a bucket with it's name."""
         self.name = name
 
-    def to_dict(self):
-        """Give a Dictionary represantation for the model."""
-        global index
-        index = -1
+    def to_dict(self, summary=None):
+        """Give a Dictionary represantation for the model.
 
-        def plus_one():
-            global index
-            index = index + 1
-            return index
+        Only the first few of the bucket's items are embedded, see
+        item_summaries, along with their counts.
 
-        base_dict = Base.to_dict(self)
-        base_dict.update({
-            "items":
-            {plus_one(): self.items[key].to_dict()
-             for key in self.items},
-            "created by": self.created_by
-        })
-        return base_dict
+        Args:
+            summary(dict): Item summary for the bucket from item_summaries,
+                queried for this bucket alone if not given
+        """
+        if summary is None:
+            summary = Bucket.item_summaries([self.id])[self.id]
+        fields = set(Bucket.COLUMN_FIELDS) | Bucket.SUMMARY_FIELDS
+        return Bucket.fields_to_dict(self, fields, summary)
+
+    @classmethod
+    def field_columns(cls, fields):
+        """Get the columns needed to represent some fields of buckets.
+
+        Args:
+            cls(Bucket): Model to be queried
+            fields(set): fields of the dictionary represantation
+
+        Returns:
+            list of columns, asset_id always included
+        """
+        names = {"asset_id"}
+        names.update(cls.COLUMN_FIELDS[field] for field in fields
+                     if field in cls.COLUMN_FIELDS)
+        if fields & cls.SUMMARY_FIELDS:
+            names.add("id")
+        return [getattr(cls, name) for name in sorted(names)]
+
+    @classmethod
+    def fields_to_dict(cls, row, fields, summary=None):
+        """Give a Dictionary represantation of some fields of a bucket.
+
+        Args:
+            row: Bucket or row queried with the columns from field_columns
+            fields(set): fields of the dictionary represantation
+            summary(dict): Item summary for the bucket from item_summaries,
+                needed if fields has items
+        """
+        data = {}
+        for field in fields:
+            if field in cls.COLUMN_FIELDS:
+                value = getattr(row, cls.COLUMN_FIELDS[field])
+                if field.startswith("date"):
+                    value = str(value)
+                data[field] = value
+        if "items" in fields:
+            data["items"] = {
+                index: item.to_dict()
+                for index, item in enumerate(summary["items"])
+            }
+        return data
+
+    def get_item(self, asset_id):
+        """Get an item in this bucket by its asset_id.
+
+        Queries the single row, unlike items which loads every item.
+
+        Args:
+            asset_id(int): asset_id of the item
+
+        Returns:
+            instance of Item if found in bucket, else None
+        """
+        return Item.query.filter_by(
+            bucket_id=self.id, asset_id=asset_id).first()
 
     @classmethod
     def get_buckets(cls):
@@ -109,6 +197,103 @@ class Bucket(Base):
         """
         return Bucket.get_object()
 
+    @classmethod
+    def item_summaries(cls, bucket_ids, preview=ITEMS_PREVIEW):
+        """Summarize the items of many buckets.
+
+        Runs one query for the first items of every bucket, whatever the
+        number of buckets and items, and none if preview is 0. The counts of
+        items are columns of the buckets.
+
+        Args:
+            cls(Bucket): Model to be queried
+            bucket_ids(list): ids of the buckets to summarize
+            preview(int): number of items to include per bucket, ordered by
+                asset_id, None includes all of them
+
+        Returns:
+            dict mapping each bucket id to a dict with its items
+        """
+        summaries = {bucket_id: {"items": []} for bucket_id in bucket_ids}
+        if not bucket_ids:
+            return summaries
+
+        if preview is None:
+            items = Item.query.filter(Item.bucket_id.in_(bucket_ids))
+        elif preview > 0:
+            position = func.row_number().over(
+                partition_by=Item.bucket_id, order_by=Item.asset_id)
+            ranked = database.session.query(
+                Item.id.label("id"), position.label("position")).filter(
+                    Item.bucket_id.in_(bucket_ids)).subquery()
+            items = Item.query.join(ranked, Item.id == ranked.c.id).filter(
+                ranked.c.position <= preview)
+        else:
+            return summaries
+
+        for item in items.order_by(Item.asset_id):
+            summaries[item.bucket_id]["items"].append(item)
+        return summaries
+
+    @classmethod
+    def add_to_counts(cls, counts, session=None):
+        """Add to the item and done counters of buckets, in one round trip.
+
+        Statements that add, delete or mark items without the session, like
+        bulk INSERTs, must call this, flushes call it on their own.
+
+        Args:
+            cls(Bucket): Model to be updated
+            counts(dict): maps bucket ids to a tuple of (items, done) to add
+            session(Session): Session to run the UPDATE in, by default the
+                application's
+        """
+        counts = [{
+            "bucket": bucket_id,
+            "items": items,
+            "done": done
+        } for bucket_id, (items, done) in sorted(counts.items())
+                  if items or done]
+        if counts:
+            buckets = cls.__table__
+            (session or database.session).execute(
+                buckets.update().where(
+                    buckets.c.id == bindparam("bucket")).values(
+                        item_count=buckets.c.item_count + bindparam("items"),
+                        done_count=buckets.c.done_count + bindparam("done")),
+                counts)
+
+    @classmethod
+    def recount(cls):
+        """Recompute the item and done counters of every bucket.
+
+        Args:
+            cls(Bucket): Model to be updated
+
+        Returns:
+            list of (profile_id, asset_id) of the buckets whose counters were
+            wrong
+        """
+        buckets, items = cls.__table__, Item.__table__
+        item_count = select([func.count(items.c.id)]).where(
+            items.c.bucket_id == buckets.c.id).as_scalar()
+        done_count = select([func.count(items.c.id)]).where(
+            items.c.bucket_id == buckets.c.id).where(
+                items.c.done == true()).as_scalar()
+        wrong = or_(buckets.c.item_count != item_count,
+                    buckets.c.done_count != done_count)
+
+        repaired = [
+            tuple(row)
+            for row in database.session.execute(
+                select([buckets.c.profile_id, buckets.c.asset_id]).where(
+                    wrong))
+        ]
+        if repaired:
+            database.session.execute(buckets.update().where(wrong).values(
+                item_count=item_count, done_count=done_count))
+        return repaired
+
     @classmethod
     def get_bucket(cls, name=None, id=None, asset_id=None, profile_id=None):
         """Get a buckets from the table buckets.
@@ -136,11 +321,25 @@ class Item(Base):
     """Model Item that represent todo experince in the application."""
 
     __tablename__ = "items"
+    __table_args__ = (
+        database.Index('ix_items_bucket_id_asset_id', 'bucket_id', 'asset_id'),
+        database.Index(
+            'ix_items_profile_id_asset_id',
+            'profile_id',
+            'asset_id',
+            unique=True),
+        database.Index('ix_items_profile_id_name', 'profile_id', 'name'), )
     description = database.Column(database.String(256), default="my todo")
-    done = database.Column(database.Boolean, default=False, nullable=False)
+    # the previous value is loaded before a new one is set, to keep the
+    # done counter of the bucket
+    done = column_property(
+        database.Column(database.Boolean, default=False, nullable=False),
+        active_history=True)
 
     bucket_id = database.Column(
-        database.Integer, database.ForeignKey('buckets.id'), nullable=True)
+        database.Integer,
+        database.ForeignKey('buckets.id', ondelete="CASCADE"),
+        nullable=True)
 
     def __init__(self, name, description=""):
         """Initilize name and description for an item."""
@@ -169,10 +368,75 @@ class Item(Base):
             an instance of Item if found in table, else None
         """
         item = None
-        if name:
+        if profile_id is not None and (name or asset_id or asset_id == 0):
+            query = cls.of_profile(profile_id)
+            if name:
+                item = query.filter(cls.name == name).first()
+            else:
+                item = query.filter(cls.asset_id == asset_id).first()
+        elif name:
             item = cls.get_object(name=name, profile_id=profile_id)
         elif id or id == 0:
             item = cls.get_object(id=id)
         elif asset_id or asset_id == 0:
             item = cls.get_object(asset_id=asset_id, profile_id=profile_id)
         return item
+
+    @classmethod
+    def of_profile(cls, profile_id, query=None):
+        """Query the items of a profile, but not those of detached buckets.
+
+        The items of a bucket detached from the profile to be purged, see
+        Profile.delete_asset, keep their profile_id until they are deleted,
+        the join to their bucket leaves them out.
+
+        Args:
+            cls(Item): Model to be queried
+            profile_id(int): id of the profile
+            query: Query of items to filter, by default all of them
+
+        Returns:
+            query of the items
+        """
+        if query is None:
+            query = cls.query
+        return query.outerjoin(Bucket, cls.bucket_id == Bucket.id).filter(
+            cls.profile_id == profile_id,
+            or_(cls.bucket_id.is_(None), Bucket.profile_id == profile_id))
+
+    @classmethod
+    def get_taken_names(cls, names, profile_id):
+        """Get which of names are already used by items of a profile.
+
+        Args:
+            cls(Item): Model to be queried
+            names(iterable): Names to check
+            profile_id(int): id of the profile
+
+        Returns:
+            set of the names taken
+        """
+        names = set(names)
+        if not names:
+            return set()
+        taken = cls.of_profile(profile_id).with_entities(cls.name).filter(
+            cls.name.in_(names))
+        return {name for name, in taken}
+
+    @classmethod
+    def get_bucket_item(cls, asset_id, bucket_asset_id, profile_id):
+        """Get an Item by its asset_id and the asset_id of its bucket.
+
+        Args:
+            cls(Item): Model to be queried
+            asset_id(int): asset_id of the item
+            bucket_asset_id(int): asset_id of the bucket holding the item
+            profile_id(int): id of the profile owning the bucket
+
+        Returns:
+            an instance of Item if found in the bucket, else None
+        """
+        return cls.query.join(Bucket, cls.bucket_id == Bucket.id).filter(
+            Bucket.profile_id == profile_id,
+            Bucket.asset_id == bucket_asset_id, cls.asset_id == asset_id,
+            cls.profile_id == profile_id).first()
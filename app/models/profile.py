@@ -1,14 +1,24 @@
 """This module contains Model a user's Profile."""
 
-from app.base import BaseModel, database
+from collections import defaultdict
+
+from flask import current_app
+
+from app.base import BaseModel, committing, database
 from app.models import bucketlist
+from app.purge import schedule_purge
+from app.response_cache import invalidate_on_commit
+from sqlalchemy import bindparam, event, func, select
+from sqlalchemy.orm import Session, attributes, make_transient_to_detached
+from sqlalchemy.orm.util import identity_key
 from sqlalchemy.orm.collections import attribute_mapped_collection
 
-budy = database.Table('budys',
-                      database.Column("user_id", database.Integer,
-                                      database.ForeignKey('users.id')),
-                      database.Column("profile_id", database.Integer,
-                                      database.ForeignKey('profiles.id')))
+budy = database.Table(
+    'budys',
+    database.Column("user_id", database.Integer,
+                    database.ForeignKey('users.id', ondelete="CASCADE")),
+    database.Column("profile_id", database.Integer,
+                    database.ForeignKey('profiles.id', ondelete="CASCADE")))
 
 
 class Profile(database.Model, BaseModel):
@@ -34,19 +44,182 @@ class Profile(database.Model, BaseModel):
         collection_class=attribute_mapped_collection('username'),
         backref=database.backref('followers'))
 
+    # buckets and items of a deleted profile are deleted by the database
     bucket_lists = database.relationship(
         "Bucket",
         collection_class=attribute_mapped_collection('asset_id'),
-        cascade="all, delete-orphan")
+        cascade="all, delete-orphan",
+        passive_deletes=True)
 
     next_bucket_id = database.Column(database.Integer, default=0)
     next_item_id = database.Column(database.Integer, default=0)
 
+    # bumped whenever a bucket or item of the profile changes, ETags of the
+    # profile's resources are derived from it
+    version = database.Column(
+        database.Integer, default=0, server_default="0", nullable=False)
+
+    # number of buckets of the profile, kept in the transaction that adds
+    # or deletes a bucket, see Profile.add_to_counts
+    bucket_count = database.Column(
+        database.Integer, default=0, server_default="0", nullable=False)
+
     def __init__(self, handle, owner):
         """Initilize the profile with required information."""
         self.handle = handle
         self.owner = owner
 
+    def allocate_asset_ids(self, counter, count=1):
+        """Reserve asset ids from one of the profile's id counters.
+
+        The counter is incremented in the database by a single UPDATE, which
+        holds the profile row's lock until the caller's transaction commits,
+        so concurrent requests can never be handed the same ids.
+
+        Args:
+            counter(str): Name of the counter, next_bucket_id or next_item_id
+            count(int): Number of ids to reserve
+
+        Returns:
+            first reserved id, the reserved ids run up to first + count - 1
+        """
+        column = getattr(Profile.__table__.c, counter)
+        statement = Profile.__table__.update().where(
+            Profile.__table__.c.id == self.id).values({
+                counter: database.func.coalesce(column, 0) + count
+            })
+
+        if database.session.bind.dialect.name == "postgresql":
+            next_id = database.session.execute(
+                statement.returning(column)).scalar()
+        else:
+            database.session.execute(statement)
+            next_id = database.session.execute(
+                select([column]).where(
+                    Profile.__table__.c.id == self.id)).scalar()
+
+        # the in memory counter is stale, reload it on next access
+        database.session.expire(self, [counter])
+        return next_id - count
+
+    @classmethod
+    def bump_versions(cls, profile_ids, session=None):
+        """Mark the buckets and items of profiles as changed.
+
+        Statements that write buckets or items without the session, like
+        bulk UPDATEs, must call this, flushes call it on their own.
+
+        Args:
+            cls(Profile): Model to be updated
+            profile_ids(iterable): ids of the profiles that changed
+            session(Session): Session to run the UPDATE in, by default the
+                application's
+        """
+        profile_ids = sorted(set(profile_ids))
+        if profile_ids:
+            (session or database.session).execute(cls.__table__.update().where(
+                cls.__table__.c.id.in_(profile_ids)).values(
+                    version=cls.__table__.c.version + 1))
+
+    @classmethod
+    def add_to_counts(cls, counts, session=None):
+        """Add to the bucket counters of profiles, in one round trip.
+
+        Statements that add or delete buckets without the session must call
+        this, flushes call it on their own.
+
+        Args:
+            cls(Profile): Model to be updated
+            counts(dict): maps profile ids to the number of buckets to add
+            session(Session): Session to run the UPDATE in, by default the
+                application's
+        """
+        counts = [{
+            "profile": profile_id,
+            "buckets": buckets
+        } for profile_id, buckets in sorted(counts.items()) if buckets]
+        if counts:
+            profiles = cls.__table__
+            (session or database.session).execute(
+                profiles.update().where(
+                    profiles.c.id == bindparam("profile")).values(
+                        bucket_count=profiles.c.bucket_count +
+                        bindparam("buckets")), counts)
+
+    @classmethod
+    def current_bucket_count(cls, profile_id):
+        """Get the number of buckets of a profile from the database.
+
+        Args:
+            cls(Profile): Model to be queried
+            profile_id(int): id of the profile
+
+        Returns:
+            number of buckets, None if the profile does not exist
+        """
+        return database.session.query(cls.bucket_count).filter_by(
+            id=profile_id).scalar()
+
+    @classmethod
+    def repair_counters(cls):
+        """Recompute the item, done and bucket counters from the tables.
+
+        Counters written by hand, or by statements that did not keep them,
+        are set to the counts of the rows, in one UPDATE per table. The
+        profiles of the buckets repaired get new ETags and their cached
+        responses are dropped.
+
+        Args:
+            cls(Profile): Model to be updated
+
+        Returns:
+            tuple of the number of buckets and profiles repaired, None if
+            they were not saved
+        """
+        profiles, buckets = cls.__table__, bucketlist.Bucket.__table__
+        bucket_count = select([func.count(buckets.c.id)]).where(
+            buckets.c.profile_id == profiles.c.id).as_scalar()
+        wrong = profiles.c.bucket_count != bucket_count
+        try:
+            repaired_buckets = bucketlist.Bucket.recount()
+            repaired_profiles = [
+                profile_id for profile_id, in database.session.execute(
+                    select([profiles.c.id]).where(wrong))
+            ]
+            if repaired_profiles:
+                database.session.execute(profiles.update().where(
+                    wrong).values(bucket_count=bucket_count))
+
+            changed = set(repaired_profiles)
+            for profile_id, asset_id in repaired_buckets:
+                if profile_id is not None:
+                    changed.add(profile_id)
+                    invalidate_on_commit(database.session, profile_id,
+                                         [asset_id])
+            for profile_id in changed:
+                invalidate_on_commit(database.session, profile_id)
+            cls.bump_versions(changed)
+            database.session.commit()
+        except Exception as e:
+            print(e)
+            database.session.rollback()
+            return None
+        return len(repaired_buckets), len(repaired_profiles)
+
+    @classmethod
+    def current_version(cls, profile_id):
+        """Get the version of a profile from the database.
+
+        Args:
+            cls(Profile): Model to be queried
+            profile_id(int): id of the profile
+
+        Returns:
+            version of the profile, None if it does not exist
+        """
+        return database.session.query(cls.version).filter_by(
+            id=profile_id).scalar()
+
     def get_bucket(self, name=None, bucket_id=None, id=None):
         """Get a bucket from the table buckets.
 
@@ -63,9 +236,8 @@ class Profile(database.Model, BaseModel):
             bucket = bucketlist.Bucket.get_bucket(
                 name=name, profile_id=self.id)
         elif bucket_id or bucket_id == 0:
-            # bucket = bucketlist.Bucket.get_bucket(
-            #     asset_id=bucket_id, profile_id=self.id)
-            bucket = self.bucket_lists.get(bucket_id)
+            bucket = bucketlist.Bucket.get_bucket(
+                asset_id=bucket_id, profile_id=self.id)
         elif id or id == 0:
             bucket = bucketlist.Bucket.get_bucket(id=id, profile_id=self.id)
         return bucket
@@ -77,20 +249,15 @@ class Profile(database.Model, BaseModel):
             name(str): Name of the bucket
 
         Returns:
-            True if succesfull, False if bucket was not saved and None if error
-            occured.
+            True if succesfull, False if bucket was not saved.
         """
         new_bucket = bucketlist.Bucket(name)
         new_bucket.created_by = self.owner.username
         new_bucket.profile_id = self.id
-        new_bucket.asset_id = self.next_bucket_id
+        new_bucket.asset_id = self.allocate_asset_ids("next_bucket_id")
 
-        if new_bucket.save() and self.save():
-            self.bucket_lists[new_bucket.asset_id] = new_bucket
-            self.next_bucket_id += 1
-            return self.save()
-        else:
-            return None
+        # one commit for the bucket and the profile's id counter
+        return new_bucket.save()
 
     def get_item(self, item_id=None, name=None, id=None, buc_id=None):
         """Get an item from the table items.
@@ -105,10 +272,8 @@ class Profile(database.Model, BaseModel):
         """
         item = None
         if (item_id or item_id == 0) and (buc_id or buc_id == 0):
-            # item = bucketlist.Item.get_item(
-            #     asset_id=item_id, profile_id=self.id)
-            if self.bucket_lists.get(buc_id):
-                item = self.bucket_lists.get(buc_id).items.get(item_id)
+            item = bucketlist.Item.get_bucket_item(
+                asset_id=item_id, bucket_asset_id=buc_id, profile_id=self.id)
         elif name:
             item = bucketlist.Item.get_item(name=name, profile_id=self.id)
         elif id or id == 0:
@@ -137,15 +302,102 @@ class Profile(database.Model, BaseModel):
         if bucket:
             new_item = bucketlist.Item(name, description)
             new_item.profile_id = self.id
-            new_item.asset_id = self.next_item_id
-            if bucket.save() and new_item.save() and self.save():
-                bucket.items[new_item.asset_id] = new_item
-                self.next_item_id += 1
-                return self.save()
-            else:
-                return False
+            new_item.asset_id = self.allocate_asset_ids("next_item_id")
+            new_item.bucket_id = bucket.id
+
+            # one commit for the item and the profile's id counter
+            return new_item.save()
         return None
 
+    def add_items(self, items, buc_id=None):
+        """Create many items in a bucket with one INSERT and one commit.
+
+        Args:
+            items(list): dicts with the name and description of every item
+            buc_id(int): asset_id for bucket items will be added here
+
+        Returns:
+            list of the asset_ids of the items, in order, if succesfull, False
+            if the items were not saved and None if the bucket does not exist
+        """
+        bucket = self.get_bucket(bucket_id=buc_id)
+        if not bucket:
+            return None
+        if not items:
+            return []
+
+        try:
+            first = self.allocate_asset_ids("next_item_id", count=len(items))
+            asset_ids = list(range(first, first + len(items)))
+            database.session.bulk_insert_mappings(bucketlist.Item, [{
+                "name": item["name"],
+                "description": item.get("description"),
+                "done": False,
+                "asset_id": asset_id,
+                "bucket_id": bucket.id,
+                "profile_id": self.id
+            } for asset_id, item in zip(asset_ids, items)])
+            # bulk inserts skip the flush events
+            bucketlist.Bucket.add_to_counts({bucket.id: (len(items), 0)})
+            expire_counts(database.session, buckets=[bucket.id])
+            Profile.bump_versions([self.id])
+            invalidate_on_commit(database.session, self.id, [buc_id])
+            if committing(True):
+                database.session.commit()
+        except Exception as e:
+            print(e)
+            database.session.rollback()
+            return False
+        return asset_ids
+
+    def mark_items_done(self, done, buc_id=None, item_ids=None):
+        """Mark items of a bucket done, or not done, with one UPDATE.
+
+        Args:
+            done(bool): Whether the items are done
+            buc_id(int): asset_id of the bucket of the items
+            item_ids(list): asset_ids of the items, None for every item of
+                the bucket
+
+        Returns:
+            number of items changed if succesfull, False if they were not
+            saved and None if the bucket does not exist
+        """
+        bucket = self.get_bucket(bucket_id=buc_id)
+        if not bucket:
+            return None
+        if item_ids is not None and not item_ids:
+            return 0
+
+        items = bucketlist.Item.__table__
+        statement = items.update().where(items.c.bucket_id == bucket.id)
+        if item_ids is not None:
+            statement = statement.where(items.c.asset_id.in_(set(item_ids)))
+        # items already done, or not done, are left as they are
+        statement = statement.where(items.c.done != done).values(done=done)
+        try:
+            database.session.flush()
+            changed = database.session.execute(statement).rowcount
+            if changed:
+                # the UPDATE skips the flush events
+                bucketlist.Bucket.add_to_counts(
+                    {bucket.id: (0, changed if done else -changed)})
+                expire_counts(database.session, buckets=[bucket.id])
+                Profile.bump_versions([self.id])
+                invalidate_on_commit(database.session, self.id, [buc_id])
+                for instance in list(database.session.identity_map.values()):
+                    if (isinstance(instance, bucketlist.Item) and
+                            instance.bucket_id == bucket.id):
+                        database.session.expire(
+                            instance, ["done", "date_modified"])
+            if committing(True):
+                database.session.commit()
+        except Exception as e:
+            print(e)
+            database.session.rollback()
+            return False
+        return changed
+
     def edit_asset(self,
                    asset_id=None,
                    name=None,
@@ -176,28 +428,124 @@ class Profile(database.Model, BaseModel):
                    description=None,
                    done=None,
                    buc_id=None):
-        edit_item = self.get_item(item_id=asset_id, buc_id=buc_id)
-
-        if edit_item:
-            bucket = self.get_bucket(id=edit_item.bucket_id)
-            if name and bucket:
-                # bucket.items[name] = bucket.items.pop(edit_item.name)
-                bucket.items[edit_item.asset_id].name = name
-            if description and bucket:
-                bucket.items[edit_item.asset_id].description = description
-            if done is not None and bucket:
-                bucket.items[edit_item.asset_id].done = done
-            if bucket:
-                return edit_item.save() and self.save() and bucket.save()
-        return None
+        edited = self.update_item(buc_id, asset_id, name, description, done)
+        return None if edited is None else edited is not False
 
     def _edit_bucket(self, asset_id=None, name=None):
-        edit_bucket = self.get_bucket(bucket_id=asset_id)
-        if name and edit_bucket:
-            # self.bucket_lists[name] = self.bucket_lists.pop(edit_bucket.name)
-            edit_bucket.name = name
-            return edit_bucket.save() and self.save()
-        return None
+        if not name:
+            return None
+        edited = self.update_bucket(asset_id, name)
+        return None if edited is None else edited is not False
+
+    def update_item(self,
+                    buc_id,
+                    item_id,
+                    name=None,
+                    description=None,
+                    done=None):
+        """Edit an item of a bucket in one round trip.
+
+        On postgresql one UPDATE ... RETURNING finds, edits and reads the
+        item, elsewhere it is loaded by one query and edited by one flush.
+
+        Args:
+            buc_id(int): asset_id of the bucket of the item
+            item_id(int): asset_id of the item
+            name(str): new name of the item
+            description(str): new description of the item
+            done(bool): whether the item is done
+
+        Returns:
+            the edited item if succesfull, False if it was not saved and None
+            if the item is not in the bucket
+        """
+        values = {}
+        if name:
+            values["name"] = name
+        if description:
+            values["description"] = description
+        if done is not None:
+            values["done"] = done
+
+        if values and database.session.bind.dialect.name == "postgresql":
+            buckets = bucketlist.Bucket.__table__
+            bucket_id = select([buckets.c.id]).where(
+                buckets.c.profile_id == self.id).where(
+                    buckets.c.asset_id == buc_id).as_scalar()
+            items = bucketlist.Item.__table__
+            # the rows of an UPDATE ... FROM the same table keep the values
+            # from before the update, for the done counter
+            previous = items.alias("previous")
+            statement = items.update().where(
+                items.c.profile_id == self.id).where(
+                    items.c.asset_id == item_id).where(
+                        items.c.bucket_id == bucket_id).where(
+                            previous.c.id == items.c.id)
+            return self._update_returning(
+                bucketlist.Item, statement, values, buc_id,
+                [previous.c.done.label("previous_done")])
+
+        item = self.get_item(item_id=item_id, buc_id=buc_id)
+        if item is None:
+            return None
+        for attribute, value in values.items():
+            setattr(item, attribute, value)
+        return item.save() and item
+
+    def update_bucket(self, buc_id, name):
+        """Rename a bucket in one round trip, see update_item.
+
+        Args:
+            buc_id(int): asset_id of the bucket
+            name(str): new name of the bucket
+
+        Returns:
+            the edited bucket if succesfull, False if it was not saved and
+            None if the bucket does not exist
+        """
+        if database.session.bind.dialect.name == "postgresql":
+            buckets = bucketlist.Bucket.__table__
+            statement = buckets.update().where(
+                buckets.c.profile_id == self.id).where(
+                    buckets.c.asset_id == buc_id)
+            return self._update_returning(bucketlist.Bucket, statement,
+                                          {"name": name}, buc_id)
+
+        bucket = self.get_bucket(bucket_id=buc_id)
+        if bucket is None:
+            return None
+        bucket.name = name
+        return bucket.save() and bucket
+
+    def _update_returning(self, model, statement, values, buc_id,
+                          previous=()):
+        try:
+            database.session.flush()
+            row = database.session.execute(
+                statement.values(values).returning(
+                    *(list(model.__table__.c) + list(previous)))).first()
+            if row is None:
+                return None
+            # the UPDATE skips the flush events
+            if previous and row.done != row.previous_done:
+                bucketlist.Bucket.add_to_counts(
+                    {row.bucket_id: (0, 1 if row.done else -1)})
+                expire_counts(database.session, buckets=[row.bucket_id])
+            Profile.bump_versions([self.id])
+            invalidate_on_commit(database.session, self.id, [buc_id])
+            # the object of the row, as loaded by a query, without one
+            instance = attributes.manager_of_class(model).new_instance()
+            for column in model.__mapper__.column_attrs:
+                setattr(instance, column.key, row[column.columns[0]])
+            make_transient_to_detached(instance)
+            instance = database.session.merge(instance, load=False)
+            if committing(True):
+                database.session.commit()
+        except Exception as e:
+            print(e)
+            database.session.rollback()
+            return False
+        return instance
 
     def delete_asset(self, asset_id=None, name=None, item=False, buc_id=None):
         """Delete an assets(item/bucket) on Profile.
@@ -222,9 +570,40 @@ class Profile(database.Model, BaseModel):
             assert_to_delete = self.get_bucket(name=name)
 
         if assert_to_delete:
+            if not item and committing(True) and self._is_large(
+                    assert_to_delete):
+                return self._detach_bucket(assert_to_delete)
+            # the database deletes the items of a bucket
             return assert_to_delete.delete()
         return assert_to_delete
 
+    def _is_large(self, bucket):
+        threshold = current_app.config.get('PURGE_THRESHOLD')
+        if not threshold:
+            return False
+        return database.session.query(bucketlist.Item.id).filter(
+            bucketlist.Item.bucket_id == bucket.id).offset(
+                threshold).limit(1).first() is not None
+
+    def _detach_bucket(self, bucket):
+        # the bucket leaves the profile at once, its items are purged after
+        buckets = bucketlist.Bucket.__table__
+        bucket_id = bucket.id
+        try:
+            database.session.execute(buckets.update().where(
+                buckets.c.id == bucket_id).values(profile_id=None))
+            Profile.add_to_counts({self.id: -1})
+            Profile.bump_versions([self.id])
+            invalidate_on_commit(database.session, self.id, [bucket.asset_id])
+            database.session.commit()
+        except Exception as e:
+            print(e)
+            database.session.rollback()
+            return False
+        database.session.expunge(bucket)
+        schedule_purge(bucket_id)
+        return True
+
     @classmethod
     def get_profile(cls, handle=None):
         """Get a Profile from the table profiles.
@@ -250,3 +629,88 @@ class Profile(database.Model, BaseModel):
             list of all profile instances
         """
         return cls.query.all()
+
+
+@event.listens_for(Session, "before_flush")
+def bump_changed_versions(session, flush_context, instances):
+    """Bump the version of profiles whose buckets or items are flushed."""
+    changed = set()
+    for instance in session.new | session.dirty | session.deleted:
+        if not isinstance(instance, (bucketlist.Bucket, bucketlist.Item)):
+            continue
+        if instance in session.dirty and not session.is_modified(instance):
+            continue
+        if instance.profile_id is not None:
+            changed.add(instance.profile_id)
+    Profile.bump_versions(changed, session)
+
+
+def expire_counts(session, buckets=(), profiles=()):
+    """Expire the counters of the buckets and profiles in session.
+
+    Args:
+        session(Session): Session holding the instances
+        buckets(iterable): ids of the buckets whose counters changed
+        profiles(iterable): ids of the profiles whose counters changed
+    """
+    for model, ids, names in (
+            (bucketlist.Bucket, buckets, ["item_count", "done_count"]),
+            (Profile, profiles, ["bucket_count"])):
+        for id in ids:
+            instance = session.identity_map.get(identity_key(model, id))
+            if instance is not None:
+                session.expire(instance, names)
+
+
+@event.listens_for(Session, "before_flush")
+def count_removed_assets(session, flush_context, instances):
+    """Count the items and buckets a flush deletes or marks done."""
+    bucket_counts = defaultdict(lambda: [0, 0])
+    profile_counts = defaultdict(int)
+    for instance in session.deleted:
+        if isinstance(instance, bucketlist.Item):
+            if instance.bucket_id is not None:
+                counts = bucket_counts[instance.bucket_id]
+                counts[0] -= 1
+                counts[1] -= 1 if instance.done else 0
+        elif isinstance(instance, bucketlist.Bucket):
+            if instance.profile_id is not None:
+                profile_counts[instance.profile_id] -= 1
+    for instance in session.dirty:
+        if (isinstance(instance, bucketlist.Item) and
+                instance.bucket_id is not None):
+            added, _, deleted = attributes.get_history(instance, "done")
+            if added and deleted and bool(added[0]) != bool(deleted[0]):
+                bucket_counts[instance.bucket_id][1] += 1 if added[0] else -1
+    flush_context.attributes["counts"] = (bucket_counts, profile_counts)
+
+
+@event.listens_for(Session, "after_flush")
+def count_flushed_assets(session, flush_context):
+    """Keep the counters of the buckets and items a flush adds or deletes.
+
+    New items have the id of their bucket only once they are flushed.
+    """
+    bucket_counts, profile_counts = flush_context.attributes.pop(
+        "counts", (defaultdict(lambda: [0, 0]), defaultdict(int)))
+    for instance in session.new:
+        if isinstance(instance, bucketlist.Item):
+            if instance.bucket_id is not None:
+                counts = bucket_counts[instance.bucket_id]
+                counts[0] += 1
+                counts[1] += 1 if instance.done else 0
+        elif isinstance(instance, bucketlist.Bucket):
+            if instance.profile_id is not None:
+                profile_counts[instance.profile_id] += 1
+    bucketlist.Bucket.add_to_counts(bucket_counts, session)
+    Profile.add_to_counts(profile_counts, session)
+    flush_context.attributes["expire counts"] = (list(bucket_counts),
+                                                 list(profile_counts))
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def expire_flushed_counts(session, flush_context):
+    """Expire the counters kept by count_flushed_assets."""
+    bucket_ids, profile_ids = flush_context.attributes.pop(
+        "expire counts", ((), ()))
+    expire_counts(session, buckets=bucket_ids, profiles=profile_ids)
@@ -1,11 +1,12 @@
 """This module contains Model for  a User."""
 
-import re
-
+from flask import current_app
 from marshmallow import ValidationError, fields, validates
-from werkzeug.security import check_password_hash, generate_password_hash
-
+from sqlalchemy import or_
 from app.base import BaseModel, database, json_schema
+from app.hashing import (HashingUnavailable, check_password_hash,
+                         generate_password_hash)
+from app.validation import PASSWORD_PATTERN, USERNAME_PATTERN
 
 
 class User(database.Model, BaseModel):
@@ -42,13 +43,37 @@ class User(database.Model, BaseModel):
     def authenticate_password(self, password):
         """Validate user password.
 
+        A password hashed with outdated parameters is rehashed with the
+        configured ones once it has been validated, the rehash is skipped
+        when the hash pool is saturated.
+
         Args:
             password(str): User password
 
         Returns:
             instance of True if password match, else False
         """
-        return check_password_hash(self.password, str(password))
+        valid = check_password_hash(self.password, str(password))
+        if valid and self.password_needs_rehash():
+            try:
+                self.user_password = password
+            except HashingUnavailable:
+                return valid
+            self.save()
+        return valid
+
+    def password_needs_rehash(self):
+        """Check if the stored password hash uses the configured parameters.
+
+        Returns:
+            True if the hash method or salt length differs from the config
+        """
+        parts = self.password.split('$')
+        if len(parts) != 3:
+            return True
+        method, salt, _ = parts
+        return (method != current_app.config['PASSWORD_HASH_METHOD'] or
+                len(salt) != current_app.config['PASSWORD_SALT_LENGTH'])
 
     @classmethod
     def get_user(cls, name=None, id=None, email=None):
@@ -70,6 +95,24 @@ class User(database.Model, BaseModel):
             return cls.query.filter_by(id=id).first()
         return None
 
+    @classmethod
+    def get_taken(cls, name=None, email=None):
+        """Get users whose username or email is already taken.
+
+        Uses one query on the unique username and email columns, no user
+        object or password hash is loaded.
+
+        Args:
+            cls (User): Model to be queried
+            name (str): Specify username to check
+            email (str): Specify email to check
+
+        Returns:
+            list of (username, email) rows that collide
+        """
+        return cls.query.with_entities(cls.username, cls.email).filter(
+            or_(cls.username == name, cls.email == email)).all()
+
     @classmethod
     def get_users(cls):
         """Get all Users from the table users.
@@ -102,7 +145,7 @@ class UserSchema(json_schema.ModelSchema):
         """Username validator check if user name is valid."""
         if value == "":
             raise ValidationError("User name can not be empty.")
-        elif not re.match("^[A-Za-z0-9]+\s?[A-Za-z0-9]+$", value):
+        elif not USERNAME_PATTERN.match(value):
             raise ValidationError("Username can not have special characters.")
         elif not 2 < len(value) < 128:
             raise ValidationError("Username should contain 3 or more letters.")
@@ -115,9 +158,7 @@ class UserSchema(json_schema.ModelSchema):
         elif len(value) < 8:
             raise ValidationError(
                 "password is too short, must contain more than 8 characters")
-        elif not re.match(
-                "((?=.*\d)(?=.*[a-z])(?=.*[A-Z])(?=.*[@#$%*&]).{7,56})",
-                value):
+        elif not PASSWORD_PATTERN.match(value):
             raise ValidationError(
                 "must contain one digit 0-9, one lowercase characters, one " +
                 "uppercase characters, one special symbols in the list *&@#$%")
@@ -0,0 +1,102 @@
+"""This module purges the items of very large buckets in the background.
+
+The database deletes the items of a deleted bucket on its own, but for a
+bucket of many thousand items that single DELETE still outlasts a request.
+Such a bucket is detached from its profile at once, so it is gone for the
+user, and its items are deleted in small batches, each in its own short
+transaction, before the bucket itself.
+
+Queries of the items of a profile join them to its buckets, see
+Item.of_profile, so the items of a detached bucket are left out until they
+are purged. A purge cut short, by a worker stopping, leaves its bucket
+detached; purge_detached finishes every such purge.
+"""
+
+import threading
+
+from flask import current_app
+from sqlalchemy import select
+
+from app.base import database
+from app.models.bucketlist import Bucket, Item
+
+
+def purge_bucket(bucket_id, batch=1000):
+    """Delete a bucket and its items, a batch of items per transaction.
+
+    Args:
+        bucket_id(int): id of the bucket
+        batch(int): Number of items deleted by each transaction
+
+    Returns:
+        number of items deleted
+    """
+    items, buckets = Item.__table__, Bucket.__table__
+    deleted = 0
+    while True:
+        ids = select([items.c.id]).where(
+            items.c.bucket_id == bucket_id).limit(batch)
+        count = database.session.execute(
+            items.delete().where(items.c.id.in_(ids))).rowcount
+        database.session.commit()
+        deleted += count
+        if count < batch:
+            break
+    database.session.execute(
+        buckets.delete().where(buckets.c.id == bucket_id))
+    database.session.commit()
+    return deleted
+
+
+def purge_detached(batch=1000):
+    """Purge every bucket detached from its profile.
+
+    Args:
+        batch(int): Number of items deleted by each transaction
+
+    Returns:
+        tuple of the number of buckets and items deleted
+    """
+    buckets = Bucket.__table__
+    bucket_ids = [
+        bucket_id for bucket_id, in database.session.execute(
+            select([buckets.c.id]).where(buckets.c.profile_id.is_(None)))
+    ]
+    database.session.commit()
+    deleted = 0
+    for bucket_id in bucket_ids:
+        deleted += purge_bucket(bucket_id, batch)
+    return len(bucket_ids), deleted
+
+
+def _purge_in_app(app, bucket_id, batch):
+    with app.app_context():
+        try:
+            purge_bucket(bucket_id, batch)
+        except Exception as e:
+            print(e)
+            database.session.rollback()
+        finally:
+            database.session.remove()
+
+
+def schedule_purge(bucket_id):
+    """Purge a detached bucket, in a background thread by default.
+
+    PURGE_IN_BACKGROUND turns the thread off, the purge then runs before
+    this returns, PURGE_BATCH sets the items deleted per transaction.
+
+    Args:
+        bucket_id(int): id of the bucket
+    """
+    config = current_app.config
+    batch = config.get('PURGE_BATCH', 1000)
+    if not config.get('PURGE_IN_BACKGROUND', True):
+        purge_bucket(bucket_id, batch)
+        return
+    thread = threading.Thread(
+        target=_purge_in_app,
+        args=(current_app._get_current_object(), bucket_id, batch),
+        name="purge-bucket-{}".format(bucket_id))
+    thread.daemon = True
+    thread.start()
@@ -0,0 +1,182 @@
+"""This module caches serialized bucket responses.
+
+Responses are cached in namespaces, one for the bucket listing of every
+profile and one for every bucket. A namespace is invalidated by giving it a
+new random generation, which is part of the keys of its entries, so entries
+cached for other query arguments are dropped without listing them.
+
+Flushes record the namespaces their buckets and items belong to and they are
+invalidated once the transaction commits. Statements that write buckets or
+items without the session must call invalidate_on_commit.
+"""
+
+import hashlib
+import json
+import threading
+import uuid
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from app.cache import LRUCache, SharedCache
+from app.models.bucketlist import Bucket, Item
+
+
+def bucket_list_namespace(profile_id):
+    """Get the namespace of a profile's bucket listing."""
+    return "buckets_{}".format(profile_id)
+
+
+def bucket_namespace(profile_id, asset_id):
+    """Get the namespace of a single bucket of a profile."""
+    return "bucket_{}_{}".format(profile_id, asset_id)
+
+
+class ResponseCache(object):
+    """Cache of serialized responses with hit, miss and eviction counters."""
+
+    def __init__(self, backend):
+        """Initialize the cache.
+
+        Args:
+            backend: LRUCache or SharedCache holding the entries
+        """
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def key(self, namespace, representation):
+        """Build the key of a representation in a namespace.
+
+        Build it before querying the database, so that what gets cached
+        under it is unreachable if a write commits in between.
+
+        Args:
+            namespace(str): Namespace of the response
+            representation(str): Identifies the response in the namespace
+        """
+        generation_key = "generation_" + namespace
+        generation = self.backend.get(generation_key)
+        if generation is None:
+            generation = uuid.uuid4().hex.encode()
+            self.backend.set(generation_key, generation)
+        key = namespace.encode() + b":" + generation + b":"
+        key += representation.encode()
+        return "response_" + hashlib.sha1(key).hexdigest()
+
+    def get(self, key):
+        """Get a cached response.
+
+        Returns:
+            tuple of (body, headers) if cached, else None
+        """
+        value = self.backend.get(key)
+        with self._lock:
+            self._stats["hits" if value is not None else "misses"] += 1
+        if value is None:
+            return None
+        value = json.loads(value.decode())
+        return value["body"].encode(), value["headers"]
+
+    def set(self, key, body, headers):
+        """Cache a response body and its headers."""
+        value = json.dumps({"body": body.decode(), "headers": headers})
+        self.backend.set(key, value.encode())
+
+    def invalidate(self, namespaces):
+        """Drop every response cached in namespaces."""
+        for namespace in namespaces:
+            self.backend.delete("generation_" + namespace)
+        with self._lock:
+            self._stats["invalidations"] += len(namespaces)
+
+    def stats(self):
+        """Give the hit, miss, invalidation and eviction counters."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["evictions"] = self.backend.evictions
+        return stats
+
+
+def response_cache():
+    """Get the response cache of the current app, create it on first use.
+
+    Returns:
+        ResponseCache, None if RESPONSE_CACHE is not set
+    """
+    if 'responses' not in current_app.extensions:
+        config = current_app.config
+        kind = config.get('RESPONSE_CACHE')
+        cache = None
+        if kind == 'lru':
+            cache = ResponseCache(
+                LRUCache(
+                    maxsize=config['RESPONSE_CACHE_SIZE'],
+                    ttl=config['RESPONSE_CACHE_TTL']))
+        elif kind == 'shared':
+            if config.get('RESPONSE_CACHE_STORE') is None:
+                raise ValueError("RESPONSE_CACHE_STORE is required")
+            cache = ResponseCache(
+                SharedCache(
+                    config['RESPONSE_CACHE_STORE'],
+                    ttl=config['RESPONSE_CACHE_TTL'],
+                    prefix="responses_"))
+        elif kind:
+            raise ValueError("No response cache " + kind)
+        current_app.extensions['responses'] = cache
+    return current_app.extensions['responses']
+
+
+def invalidate_on_commit(session, profile_id, bucket_ids=()):
+    """Invalidate a profile's cached responses when session commits.
+
+    Args:
+        session(Session): Session of the transaction writing the profile
+        profile_id(int): id of the profile written
+        bucket_ids(iterable): asset_ids of the buckets written
+    """
+    pending = session.info.setdefault('invalidate_responses', set())
+    pending.add(bucket_list_namespace(profile_id))
+    pending.update(
+        bucket_namespace(profile_id, asset_id) for asset_id in bucket_ids)
+
+
+@event.listens_for(Session, "after_flush")
+def record_changed_buckets(session, flush_context):
+    """Record the namespaces of the buckets and items flushed."""
+    buckets = set()
+    item_buckets = set()
+    for instance in session.new | session.dirty | session.deleted:
+        if instance in session.dirty and not session.is_modified(instance):
+            continue
+        if isinstance(instance, Bucket):
+            buckets.add((instance.profile_id, instance.asset_id))
+        elif isinstance(instance, Item):
+            item_buckets.add(instance.bucket_id)
+    item_buckets.discard(None)
+
+    if item_buckets:
+        buckets.update(
+            tuple(row) for row in session.execute(
+                select([Bucket.profile_id, Bucket.asset_id]).where(
+                    Bucket.id.in_(item_buckets))))
+    for profile_id, asset_id in buckets:
+        if profile_id is not None:
+            invalidate_on_commit(session, profile_id, [asset_id])
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_committed(session):
+    """Invalidate the namespaces written by the committed transaction."""
+    pending = session.info.pop('invalidate_responses', None)
+    if pending and has_app_context():
+        cache = response_cache()
+        if cache is not None:
+            cache.invalidate(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_rolled_back(session):
+    """Forget the namespaces written by a rolled back transaction."""
+    session.info.pop('invalidate_responses', None)
@@ -0,0 +1,233 @@
+"""This module implements full-text search of bucket and item names.
+
+Buckets are searched on their name, items on their name and description.
+Names are also suggested from a prefix, on an index of the lowercased names
+of every profile. Two backends share one interface:
+
+    PostgresSearch matches a tsvector of the text against a GIN index.
+    SQLiteSearch matches FTS5 tables that triggers keep in sync.
+
+SEARCH_BACKEND picks the backend, when it is not set the dialect of the
+database does.
+"""
+
+import re
+
+from flask import current_app
+from sqlalchemy import DDL, Float, Integer, event, false, func, literal_column
+from sqlalchemy import text
+
+from app.base import database
+from app.models.bucketlist import Bucket, Item
+
+# characters of a search term that make up words
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def search_words(term):
+    """Split a search term in the words it is made of."""
+    return WORD_PATTERN.findall(term or "")
+
+
+class PostgresSearch(object):
+    """Search backend on postgresql text search."""
+
+    # text search configuration, 'simple' does not stem or drop stop words
+    # so it works for names in any language
+    LANGUAGE = "'simple'"
+
+    def document(self, model):
+        """Get the tsvector expression matching the model's GIN index."""
+        text_column = model.name
+        if model is Item:
+            text_column = model.name.op("||")(literal_column("' '")).op("||")(
+                func.coalesce(model.description, literal_column("''")))
+        return func.to_tsvector(literal_column(self.LANGUAGE), text_column)
+
+    def match(self, query, model, term, prefix=False):
+        """Filter a query of buckets or items to the ones matching term.
+
+        Args:
+            query: Query selecting from the model
+            model: Bucket or Item
+            term(str): Words that must all be found
+            prefix(bool): Match the last word as the start of a word
+
+        Returns:
+            tuple of (query, rank) where rank orders the best matches first
+        """
+        words = search_words(term)
+        if not words:
+            return query.filter(false()), model.asset_id
+        # every word is a quoted lexeme, so no tsquery syntax gets through
+        lexemes = ["'" + word + "'" for word in words]
+        if prefix:
+            lexemes[-1] += ":*"
+        terms = func.to_tsquery(
+            literal_column(self.LANGUAGE), " & ".join(lexemes))
+        document = self.document(model)
+        query = query.filter(document.op("@@")(terms))
+        return query, func.ts_rank(document, terms).desc()
+
+    def suggest(self, query, model, prefix):
+        """Filter a query of buckets or items to names starting with prefix.
+
+        The LIKE runs on the text_pattern_ops index of lower(name).
+
+        Args:
+            query: Query selecting from the model
+            model: Bucket or Item
+            prefix(str): Start of the names, in any case
+
+        Returns:
+            query ordered by lowercased name
+        """
+        name = func.lower(model.name)
+        pattern = prefix.lower().replace("\\", "\\\\")
+        pattern = pattern.replace("%", "\\%").replace("_", "\\_")
+        return query.filter(name.like(pattern + "%",
+                                      escape="\\")).order_by(name)
+
+
+class SQLiteSearch(object):
+    """Search backend on sqlite FTS5 tables."""
+
+    def match(self, query, model, term, prefix=False):
+        """Filter a query of buckets or items to the ones matching term.
+
+        Args:
+            query: Query selecting from the model
+            model: Bucket or Item
+            term(str): Words that must all be found
+            prefix(bool): Match the last word as the start of a word
+
+        Returns:
+            tuple of (query, rank) where rank orders the best matches first
+        """
+        words = search_words(term)
+        if not words:
+            return query.filter(false()), model.asset_id
+        # every word is a quoted string, so no FTS5 syntax gets through
+        phrases = ['"' + word + '"' for word in words]
+        if prefix:
+            phrases[-1] += "*"
+
+        table = model.__tablename__ + "_search"
+        matches = text(
+            "SELECT rowid AS id, bm25({0}) AS rank FROM {0} "
+            "WHERE {0} MATCH :terms".format(table)).columns(
+                id=Integer, rank=Float).bindparams(
+                    terms=" ".join(phrases)).alias("matches")
+        query = query.join(matches, model.id == matches.c.id)
+        # bm25 scores are negative, lower is a better match
+        return query, matches.c.rank.asc()
+
+    def suggest(self, query, model, prefix):
+        """Filter a query of buckets or items to names starting with prefix.
+
+        A range on lower(name) rather than a LIKE, which sqlite only runs on
+        an index for case insensitive columns.
+
+        Args:
+            query: Query selecting from the model
+            model: Bucket or Item
+            prefix(str): Start of the names, in any case
+
+        Returns:
+            query ordered by lowercased name
+        """
+        name = func.lower(model.name)
+        prefix = prefix.lower()
+        query = query.filter(name >= prefix)
+        if prefix:
+            # first string after every string starting with prefix
+            upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            query = query.filter(name < upper)
+        return query.order_by(name)
+
+
+BACKENDS = {"postgresql": PostgresSearch, "sqlite": SQLiteSearch}
+
+
+def search_backend():
+    """Get the search backend of the current app, create it on first use."""
+    backend = current_app.extensions.get('search')
+    if backend is None:
+        name = current_app.config.get('SEARCH_BACKEND')
+        if not name:
+            name = database.get_engine(current_app).dialect.name
+        if name not in BACKENDS:
+            raise ValueError("No search backend for " + name)
+        backend = BACKENDS[name]()
+        current_app.extensions['search'] = backend
+    return backend
+
+
+# index the text searched and the names suggested for every model, the
+# statements only run on the dialect of their backend when the tables are
+# created
+SEARCH_DDL = {
+    Bucket: {
+        "postgresql": [
+            "CREATE INDEX ix_buckets_search ON buckets "
+            "USING gin (to_tsvector('simple', name))",
+            "CREATE INDEX ix_buckets_suggest ON buckets "
+            "(profile_id, lower(name) text_pattern_ops)"
+        ],
+        "sqlite": [
+            "CREATE INDEX ix_buckets_suggest ON buckets "
+            "(profile_id, lower(name))",
+            "CREATE VIRTUAL TABLE IF NOT EXISTS buckets_search USING "
+            "fts5(name, content='buckets', content_rowid='id')",
+            "CREATE TRIGGER buckets_search_insert AFTER INSERT ON buckets "
+            "BEGIN INSERT INTO buckets_search(rowid, name) "
+            "VALUES (new.id, new.name); END",
+            "CREATE TRIGGER buckets_search_delete AFTER DELETE ON buckets "
+            "BEGIN INSERT INTO buckets_search(buckets_search, rowid, name) "
+            "VALUES ('delete', old.id, old.name); END",
+            "CREATE TRIGGER buckets_search_update AFTER UPDATE OF name "
+            "ON buckets BEGIN "
+            "INSERT INTO buckets_search(buckets_search, rowid, name) "
+            "VALUES ('delete', old.id, old.name); "
+            "INSERT INTO buckets_search(rowid, name) "
+            "VALUES (new.id, new.name); END",
+        ]
+    },
+    Item: {
+        "postgresql": [
+            "CREATE INDEX ix_items_search ON items USING gin (to_tsvector("
+            "'simple', name || ' ' || coalesce(description, '')))",
+            "CREATE INDEX ix_items_suggest ON items "
+            "(profile_id, lower(name) text_pattern_ops)"
+        ],
+        "sqlite": [
+            "CREATE INDEX ix_items_suggest ON items (profile_id, lower(name))",
+            "CREATE VIRTUAL TABLE IF NOT EXISTS items_search USING "
+            "fts5(name, description, content='items', content_rowid='id')",
+            "CREATE TRIGGER items_search_insert AFTER INSERT ON items "
+            "BEGIN INSERT INTO items_search(rowid, name, description) "
+            "VALUES (new.id, new.name, new.description); END",
+            "CREATE TRIGGER items_search_delete AFTER DELETE ON items "
+            "BEGIN INSERT INTO "
+            "items_search(items_search, rowid, name, description) "
+            "VALUES ('delete', old.id, old.name, old.description); END",
+            "CREATE TRIGGER items_search_update AFTER UPDATE OF name, "
+            "description ON items BEGIN INSERT INTO "
+            "items_search(items_search, rowid, name, description) "
+            "VALUES ('delete', old.id, old.name, old.description); "
+            "INSERT INTO items_search(rowid, name, description) "
+            "VALUES (new.id, new.name, new.description); END",
+        ]
+    }
+}
+
+for model, statements in SEARCH_DDL.items():
+    for dialect, dialect_statements in statements.items():
+        for statement in dialect_statements:
+            event.listen(model.__table__, "after_create",
+                         DDL(statement).execute_if(dialect=dialect))
+    # the FTS5 table outlives the table it indexes unless dropped with it
+    event.listen(
+        model.__table__, "before_drop",
+        DDL("DROP TABLE IF EXISTS " + model.__tablename__ +
+            "_search").execute_if(dialect="sqlite"))
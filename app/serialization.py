@@ -0,0 +1,264 @@
+"""This module serializes buckets and items to JSON text.
+
+Rows are written straight to JSON, without building a dictionary for every
+bucket and item. The JSON of every key is computed once, values are encoded
+by their type and dates are written in ISO format, with a space between
+date and time like str() does. Serializers yield text chunks, so a response
+can be streamed and nothing is held per item longer than it takes to write
+it.
+"""
+
+import itertools
+import json
+from json.encoder import encode_basestring
+
+from flask import Response, stream_with_context
+
+from app.models.bucketlist import Bucket
+
+
+def _string(value):
+    if value is None:
+        return "null"
+    return encode_basestring(value)
+
+
+def _integer(value):
+    if value is None:
+        return "null"
+    return str(int(value))
+
+
+def _boolean(value):
+    if value is None:
+        return "null"
+    return "true" if value else "false"
+
+
+def _date(value):
+    if value is None:
+        return "null"
+    return '"' + value.isoformat(" ") + '"'
+
+
+def _encoder(fields):
+    """Precompute (field, JSON key, attribute, value encoder) of fields."""
+    return tuple((field, json.dumps(field) + ":", attribute, encode)
+                 for field, attribute, encode in fields)
+
+
+ITEM_FIELDS = _encoder((
+    ("name", "name", _string),
+    ("id", "asset_id", _integer),
+    ("date created", "date_created", _date),
+    ("date modified", "date_modified", _date),
+    ("description", "description", _string),
+    ("done", "done", _boolean), ))
+
+# the columns of Bucket.COLUMN_FIELDS
+BUCKET_FIELDS = _encoder((
+    ("name", "name", _string),
+    ("id", "asset_id", _integer),
+    ("date created", "date_created", _date),
+    ("date modified", "date_modified", _date),
+    ("created by", "created_by", _string),
+    ("item count", "item_count", _integer),
+    ("done count", "done_count", _integer), ))
+ALL_BUCKET_FIELDS = set(Bucket.COLUMN_FIELDS) | Bucket.SUMMARY_FIELDS
+
+
+class RawJSON(object):
+    """Wrap JSON text, or an iterable of its chunks, to embed it as is."""
+
+    def __init__(self, chunks):
+        """Initialize with JSON text or an iterable of JSON text chunks."""
+        self.chunks = chunks
+
+    def __iter__(self):
+        """Iterate over the JSON text chunks."""
+        if isinstance(self.chunks, str):
+            return iter((self.chunks, ))
+        return iter(self.chunks)
+
+
+def item_json(item):
+    """Serialize an Item, or a row with its columns, to a JSON object."""
+    return "{" + ",".join([
+        key + encode(getattr(item, attribute))
+        for _, key, attribute, encode in ITEM_FIELDS
+    ]) + "}"
+
+
+def iter_items(items, positions=False):
+    """Serialize items to a JSON object.
+
+    Args:
+        items(iterable): Items or rows with their columns
+        positions(bool): Key items by their position instead of asset_id
+
+    Yields:
+        JSON text chunks, one for every item
+    """
+    yield "{"
+    separator = ""
+    for index, item in enumerate(items):
+        key = index if positions else item.asset_id
+        yield separator + '"' + str(key) + '":' + item_json(item)
+        separator = ","
+    yield "}"
+
+
+def iter_bucket(bucket, summary=None, fields=None):
+    """Serialize a Bucket, or a row with the columns for fields.
+
+    Args:
+        bucket: Bucket or row queried with Bucket.field_columns(fields)
+        summary(dict): Item summary for the bucket from item_summaries,
+            needed if fields has items
+        fields(set): Fields to serialize, None for every field
+
+    Yields:
+        JSON text chunks
+    """
+    if fields is None:
+        fields = ALL_BUCKET_FIELDS
+    members = _bucket_members(bucket, fields)
+    yield "{" + ",".join(members)
+    if "items" in fields:
+        yield (',' if members else '') + '"items":'
+        # embedded items are keyed by their position, like to_dict does
+        for chunk in iter_items(summary["items"], positions=True):
+            yield chunk
+    yield "}"
+
+
+def _bucket_members(bucket, fields):
+    return [
+        key + encode(getattr(bucket, attribute))
+        for field, key, attribute, encode in BUCKET_FIELDS if field in fields
+    ]
+
+
+def iter_buckets(buckets, summaries=None, fields=None):
+    """Serialize buckets to a JSON object keyed by their asset_id.
+
+    Args:
+        buckets(iterable): Buckets, or rows with the columns for fields
+        summaries(dict): Item summaries of the buckets by bucket id
+        fields(set): Fields to serialize, None for every field
+
+    Yields:
+        JSON text chunks
+    """
+    yield "{"
+    separator = ""
+    for bucket in buckets:
+        summary = summaries[bucket.id] if summaries else None
+        yield separator + '"' + str(bucket.asset_id) + '":'
+        for chunk in iter_bucket(bucket, summary, fields):
+            yield chunk
+        separator = ","
+    yield "}"
+
+
+def iter_export(buckets, items, ndjson=False):
+    """Serialize buckets with every one of their items.
+
+    Both are only iterated once, in step, so they can be server side
+    cursors and nothing is held but the current bucket and item.
+
+    Args:
+        buckets(iterable): Buckets or rows with their columns and id,
+            ordered by id
+        items(iterable): Items or rows with their columns and bucket_id,
+            ordered by bucket_id
+        ndjson(bool): Write a line for every bucket, followed by a line for
+            every one of its items, instead of a JSON object
+
+    Yields:
+        JSON text chunks
+    """
+    fields = set(Bucket.COLUMN_FIELDS)
+    groups = itertools.groupby(items, key=lambda item: item.bucket_id)
+    group_id, group = next(groups, (None, ()))
+
+    if not ndjson:
+        yield '{"buckets":{'
+    separator = ""
+    for bucket in buckets:
+        # items of buckets that are not exported
+        while group_id is not None and group_id < bucket.id:
+            group_id, group = next(groups, (None, ()))
+        bucket_items = ()
+        if group_id == bucket.id:
+            bucket_items = group
+
+        members = ",".join(_bucket_members(bucket, fields))
+        if ndjson:
+            yield '{"bucket":{' + members + '}}\n'
+            bucket_id = ',"bucket id":' + str(bucket.asset_id) + '}}\n'
+            for item in bucket_items:
+                yield '{"item":' + item_json(item)[:-1] + bucket_id
+        else:
+            yield separator + '"' + str(bucket.asset_id) + '":{' + members
+            yield ',"items":'
+            for chunk in iter_items(bucket_items):
+                yield chunk
+            yield "}"
+            separator = ","
+
+        if group_id == bucket.id:
+            group_id, group = next(groups, (None, ()))
+    if not ndjson:
+        yield "}}"
+
+
+def iter_json(value):
+    """Serialize a value to JSON text chunks, RawJSON values are embedded.
+
+    Dictionaries and lists are walked so RawJSON can be nested in them,
+    other values are encoded by the json module.
+    """
+    if isinstance(value, RawJSON):
+        for chunk in value:
+            yield chunk
+    elif isinstance(value, dict):
+        yield "{"
+        separator = ""
+        for key, member in value.items():
+            yield separator + encode_basestring(str(key)) + ":"
+            for chunk in iter_json(member):
+                yield chunk
+            separator = ","
+        yield "}"
+    elif isinstance(value, (list, tuple)):
+        yield "["
+        separator = ""
+        for member in value:
+            yield separator
+            for chunk in iter_json(member):
+                yield chunk
+            separator = ","
+        yield "]"
+    else:
+        yield json.dumps(value)
+
+
+def json_response(values, code=200, stream=False):
+    """Build a JSON response from values, which may embed RawJSON.
+
+    Args:
+        values: Value to serialize
+        code(int): Status code of the response
+        stream(bool): Stream the chunks instead of joining them first
+
+    Returns:
+        Response
+    """
+    chunks = iter_json(values)
+    if stream:
+        # the request, and the database session, outlive the view
+        chunks = stream_with_context(chunks)
+    else:
+        chunks = "".join(chunks)
+    return Response(chunks, status=code, mimetype='application/json')
@@ -0,0 +1,46 @@
+"""This module contains validators shared by authentication and endpoints.
+
+Patterns are compiled once at import and schemas are built once per thread,
+so validating a request does not pay for regex lookups or for building a
+marshmallow schema.
+"""
+
+import re
+import threading
+
+# names of buckets and items: letters, numbers, underscores and space
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9_\s]*$")
+
+# usernames: letters and numbers, at most one space between them
+USERNAME_PATTERN = re.compile(r"^[A-Za-z0-9]+\s?[A-Za-z0-9]+$")
+
+# passwords: a digit, a lower case, an upper case letter and a symbol
+PASSWORD_PATTERN = re.compile(
+    r"((?=.*\d)(?=.*[a-z])(?=.*[A-Z])(?=.*[@#$%*&]).{7,56})")
+
+_schemas = threading.local()
+
+
+def valid_name(name):
+    """Check if name is a valid name for a bucket/item."""
+    if len(name.strip()) == 0:
+        return False
+    return NAME_PATTERN.match(name) is not None
+
+
+def is_username(credential):
+    """Check if a login credential is a username rather than an email."""
+    return USERNAME_PATTERN.match(credential) is not None
+
+
+def user_schema():
+    """Get this thread's UserSchema, schemas keep state while loading.
+
+    Returns:
+        instance of UserSchema, built on the first call in a thread
+    """
+    schema = getattr(_schemas, "user", None)
+    if schema is None:
+        from app.models.user import UserSchema
+        schema = _schemas.user = UserSchema()
+    return schema
@@ -0,0 +1,5 @@
+"""Benchmarks for hot paths in the application.
+
+Each module is a script, run it from the project root with
+python -m benchmarks.<module>.
+"""
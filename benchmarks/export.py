@@ -0,0 +1,102 @@
+"""Benchmark peak memory of exporting a profile's buckets and items.
+
+Seeds one profile with more and more items and measures, with tracemalloc,
+the peak memory of the streamed export against building the whole bucket
+listing with Bucket.to_dict and jsonify. The streamed export should stay
+flat as the profile grows.
+
+Usage:
+    python -m benchmarks.export [buckets] [items...]
+"""
+
+import sys
+import tracemalloc
+
+from flask import jsonify
+
+from app.base import database, new_app
+from app.endpoint.endpoints import STREAM_BATCH
+from app.models import bucketlist, profile
+from app.serialization import iter_export
+
+
+def seed(buckets, items):
+    """Insert buckets with items spread over them for profile 1."""
+    database.session.execute(profile.Profile.__table__.insert(), [{
+        "id": 1,
+        "handle": "@benchmark"
+    }])
+    database.session.execute(bucketlist.Bucket.__table__.insert(), [{
+        "id": bucket_id + 1,
+        "asset_id": bucket_id,
+        "name": "bucket " + str(bucket_id),
+        "profile_id": 1
+    } for bucket_id in range(buckets)])
+    database.session.execute(bucketlist.Item.__table__.insert(), [{
+        "asset_id": asset_id,
+        "name": "item " + str(asset_id),
+        "description": "Something to do before " + str(asset_id),
+        "done": False,
+        "bucket_id": asset_id % buckets + 1,
+        "profile_id": 1
+    } for asset_id in range(items)])
+    database.session.commit()
+
+
+def export():
+    """Stream the export, dropping every chunk once written."""
+    Bucket, Item = bucketlist.Bucket, bucketlist.Item
+    columns = Bucket.field_columns(set(Bucket.COLUMN_FIELDS) | {"items"})
+    buckets = Bucket.query.filter_by(profile_id=1).with_entities(
+        *columns).order_by(Bucket.id).yield_per(STREAM_BATCH)
+    items = Item.query.filter_by(profile_id=1).with_entities(
+        Item.bucket_id, Item.asset_id, Item.name, Item.description,
+        Item.done, Item.date_created, Item.date_modified).order_by(
+            Item.bucket_id, Item.asset_id).yield_per(STREAM_BATCH)
+    for _ in iter_export(buckets, items):
+        pass
+
+
+def build():
+    """Build the listing of every bucket with all its items at once."""
+    buckets = bucketlist.Bucket.query.filter_by(profile_id=1).all()
+    summaries = bucketlist.Bucket.item_summaries(
+        [bucket.id for bucket in buckets], None)
+    jsonify({
+        bucket.asset_id: bucket.to_dict(summaries[bucket.id])
+        for bucket in buckets
+    }).get_data()
+
+
+def peak(function):
+    """Run function and give its peak traced memory in MiB."""
+    database.session.expunge_all()
+    tracemalloc.start()
+    function()
+    _, peak_size = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak_size / 1024.0 / 1024.0
+
+
+def main(buckets=100, *sizes):
+    """Print peak memory of both paths for every number of items."""
+    sizes = sizes or (10000, 50000, 100000)
+    app = new_app("testing")
+    rows = []
+    with app.test_request_context():
+        for items in sizes:
+            database.drop_all()
+            database.create_all()
+            seed(buckets, items)
+            rows.append((items, peak(export), peak(build)))
+        database.drop_all()
+
+    print("{} buckets".format(buckets))
+    print("{:<10}{:>20}{:>24}".format("items", "export (MiB)",
+                                      "to_dict + jsonify (MiB)"))
+    for items, streamed, built in rows:
+        print("{:<10}{:>20.1f}{:>24.1f}".format(items, streamed, built))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,126 @@
+"""Benchmark per-profile lookups with and without the composite indexes.
+
+Seeds the buckets and items tables, then times the lookups used by
+Base.get_object and the endpoints, first with the composite indexes dropped
+and then with them created.
+
+Usage:
+    python -m benchmarks.lookup_indexes [items] [lookups]
+"""
+
+import random
+import sys
+import timeit
+
+from app.base import database, new_app
+from app.models import bucketlist, profile
+
+PROFILES = 100
+BUCKETS_PER_PROFILE = 100
+CHUNK = 50000
+
+
+def seed(items):
+    """Insert buckets and items spread evenly over PROFILES profiles."""
+    buckets = PROFILES * BUCKETS_PER_PROFILE
+    items_per_bucket = max(items // buckets, 1)
+    database.session.execute(profile.Profile.__table__.insert(), [{
+        "id": profile_id,
+        "handle": "@benchmark" + str(profile_id)
+    } for profile_id in range(1, PROFILES + 1)])
+    database.session.execute(bucketlist.Bucket.__table__.insert(), [{
+        "id": bucket_id,
+        "asset_id": (bucket_id - 1) % BUCKETS_PER_PROFILE,
+        "name": "bucket " + str((bucket_id - 1) % BUCKETS_PER_PROFILE),
+        "profile_id": (bucket_id - 1) // BUCKETS_PER_PROFILE + 1
+    } for bucket_id in range(1, buckets + 1)])
+    item_rows = []
+    for bucket_id in range(1, buckets + 1):
+        profile_id, asset_id = divmod(bucket_id - 1, BUCKETS_PER_PROFILE)
+        for index in range(items_per_bucket):
+            item_asset_id = asset_id * items_per_bucket + index
+            item_rows.append({
+                "asset_id": item_asset_id,
+                "name": "item " + str(item_asset_id),
+                "done": False,
+                "bucket_id": bucket_id,
+                "profile_id": profile_id + 1
+            })
+        if len(item_rows) >= CHUNK:
+            database.session.execute(bucketlist.Item.__table__.insert(),
+                                     item_rows)
+            item_rows = []
+    if item_rows:
+        database.session.execute(bucketlist.Item.__table__.insert(),
+                                 item_rows)
+    database.session.commit()
+    return items_per_bucket
+
+
+def lookups(count, items_per_bucket):
+    """Build random (profile_id, bucket_id, bucket asset_id, item asset_id)."""
+    keys = []
+    for _ in range(count):
+        bucket_id = random.randint(1, PROFILES * BUCKETS_PER_PROFILE)
+        profile_id, asset_id = divmod(bucket_id - 1, BUCKETS_PER_PROFILE)
+        item_asset_id = asset_id * items_per_bucket + random.randrange(
+            items_per_bucket)
+        keys.append((profile_id + 1, bucket_id, asset_id, item_asset_id))
+    return keys
+
+
+def run(keys):
+    """Time each lookup path over keys, return average ms per lookup."""
+    Bucket, Item = bucketlist.Bucket, bucketlist.Item
+    paths = [
+        ("buckets(profile_id, asset_id)",
+         lambda p, b, a, i: Bucket.get_object(asset_id=a, profile_id=p)),
+        ("buckets(profile_id, name)",
+         lambda p, b, a, i: Bucket.get_object(
+             name="bucket " + str(a), profile_id=p)),
+        ("items(bucket_id, asset_id)",
+         lambda p, b, a, i: Item.query.filter_by(
+             bucket_id=b, asset_id=i).first()),
+        ("items(profile_id, name)",
+         lambda p, b, a, i: Item.get_object(
+             name="item " + str(i), profile_id=p)),
+    ]
+    timings = []
+    for label, lookup in paths:
+        start = timeit.default_timer()
+        for key in keys:
+            lookup(*key)
+        elapsed = timeit.default_timer() - start
+        database.session.expunge_all()
+        timings.append((label, elapsed * 1000 / len(keys)))
+    return timings
+
+
+def main(items=1000000, count=200):
+    """Seed the tables and print lookup latency before and after indexing."""
+    app = new_app("testing")
+    with app.app_context():
+        database.drop_all()
+        database.create_all()
+        indexes = list(bucketlist.Bucket.__table__.indexes) + list(
+            bucketlist.Item.__table__.indexes)
+        for index in indexes:
+            index.drop(database.engine)
+
+        items_per_bucket = seed(items)
+        keys = lookups(count, items_per_bucket)
+        before = run(keys)
+        for index in indexes:
+            index.create(database.engine)
+        after = run(keys)
+        database.drop_all()
+
+    print("{} items, {} lookups per path".format(
+        items_per_bucket * PROFILES * BUCKETS_PER_PROFILE, count))
+    print("{:<32}{:>14}{:>14}".format("path", "before (ms)", "after (ms)"))
+    for (label, slow), (_, fast) in zip(before, after):
+        print("{:<32}{:>14.3f}{:>14.3f}".format(label, slow, fast))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
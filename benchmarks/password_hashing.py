@@ -0,0 +1,67 @@
+"""Benchmark login throughput of a single worker per password hash setting.
+
+For each hash method a user is registered with it and then logged in
+repeatedly through the test client, the login rate is what one sync gunicorn
+worker can serve when it does nothing else.
+
+Usage:
+    python -m benchmarks.password_hashing [logins] [method ...]
+"""
+
+import sys
+import timeit
+
+from app.base import database, new_app
+from app.models import profile, user
+
+METHODS = [
+    'pbkdf2:sha256:1000',
+    'pbkdf2:sha256:50000',
+    'pbkdf2:sha256:150000',
+    'pbkdf2:sha256:260000',
+]
+
+
+def measure(method, logins):
+    """Log in logins times with passwords hashed by method.
+
+    Returns:
+        tuple of (ms per password check, logins per second)
+    """
+    app = new_app("testing")
+    app.config['PASSWORD_HASH_METHOD'] = method
+    with app.app_context():
+        database.drop_all()
+        database.create_all()
+        owner = user.User("bench", "Bench#123456", "bench@gmail.com")
+        profile.Profile("@bench", owner).save()
+
+        start = timeit.default_timer()
+        for _ in range(logins):
+            owner.authenticate_password("Bench#123456")
+        check = (timeit.default_timer() - start) * 1000 / logins
+
+        client = app.test_client()
+        data = {"email": "bench@gmail.com", "password": "Bench#123456"}
+        start = timeit.default_timer()
+        for _ in range(logins):
+            response = client.post("/api/v1.0/login", data=data)
+            assert response.status_code == 200, response.data
+        rate = logins / (timeit.default_timer() - start)
+
+        database.session.remove()
+        database.drop_all()
+    return check, rate
+
+
+def main(logins=50, *methods):
+    """Print the password check cost and login rate for each method."""
+    print("{:<26}{:>16}{:>18}".format("method", "check (ms)",
+                                      "logins/s/worker"))
+    for method in methods or METHODS:
+        check, rate = measure(method, logins)
+        print("{:<26}{:>16.2f}{:>18.1f}".format(method, check, rate))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50, *sys.argv[2:])
@@ -0,0 +1,76 @@
+"""Benchmark serializing a bucket with many items.
+
+Compares Bucket.to_dict with jsonify, the path the bucket endpoints used,
+with the serializers of app.serialization, on the same loaded bucket and
+items. Database time is left out, the items are loaded once.
+
+Usage:
+    python -m benchmarks.serialization [items] [repeat]
+"""
+
+import sys
+import timeit
+
+from flask import jsonify
+
+from app.base import database, new_app
+from app.models import bucketlist, profile
+from app.serialization import RawJSON, iter_bucket, json_response
+
+
+def seed(items):
+    """Insert a bucket with items for profile 1, return the bucket."""
+    database.session.execute(profile.Profile.__table__.insert(), [{
+        "id": 1,
+        "handle": "@benchmark"
+    }])
+    bucket = bucketlist.Bucket("benchmark")
+    bucket.asset_id = 0
+    bucket.profile_id = 1
+    bucket.created_by = "benchmark"
+    bucket.save()
+    database.session.execute(bucketlist.Item.__table__.insert(), [{
+        "asset_id": asset_id,
+        "name": "item " + str(asset_id),
+        "description": "Something to do before " + str(asset_id),
+        "done": asset_id % 2 == 0,
+        "bucket_id": bucket.id,
+        "profile_id": 1
+    } for asset_id in range(items)])
+    database.session.commit()
+    return bucket
+
+
+def main(items=10000, repeat=20):
+    """Seed a bucket and print the time each path takes to serialize it."""
+    app = new_app("testing")
+    with app.app_context():
+        database.drop_all()
+        database.create_all()
+        bucket = seed(items)
+        summary = bucketlist.Bucket.item_summaries([bucket.id],
+                                                   None)[bucket.id]
+        paths = [
+            ("to_dict + jsonify",
+             lambda: jsonify({"bucket": bucket.to_dict(summary)}).get_data()),
+            ("app.serialization",
+             lambda: json_response({
+                 "bucket": RawJSON(iter_bucket(bucket, summary))
+             }).get_data()),
+        ]
+        timings = []
+        with app.test_request_context():
+            for label, serialize in paths:
+                size = len(serialize())
+                elapsed = timeit.timeit(serialize, number=repeat)
+                timings.append((label, elapsed * 1000 / repeat, size))
+        database.drop_all()
+
+    print("bucket with {} items, average of {} runs".format(items, repeat))
+    print("{:<24}{:>12}{:>14}".format("path", "ms", "bytes"))
+    for label, elapsed, size in timings:
+        print("{:<24}{:>12.2f}{:>14}".format(label, elapsed, size))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
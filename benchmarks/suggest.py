@@ -0,0 +1,77 @@
+"""Benchmark name suggestions for a profile with many buckets.
+
+Seeds one profile with buckets named from random words and times the
+prefix lookup run by the suggest endpoint, for prefixes of one to four
+letters.
+
+Usage:
+    python -m benchmarks.suggest [buckets] [lookups]
+"""
+
+import random
+import string
+import sys
+import timeit
+
+from app.base import database, new_app
+from app.models import bucketlist, profile
+from app.search import search_backend
+
+LIMIT = 5
+
+
+def seed(buckets):
+    """Insert buckets with random names for profile 1."""
+    database.session.execute(profile.Profile.__table__.insert(), [{
+        "id": 1,
+        "handle": "@benchmark"
+    }])
+    rows = []
+    for asset_id in range(buckets):
+        name = " ".join("".join(
+            random.choice(string.ascii_lowercase)
+            for _ in range(random.randint(3, 9))) for _ in range(2))
+        rows.append({
+            "asset_id": asset_id,
+            "name": name.capitalize(),
+            "profile_id": 1
+        })
+    database.session.execute(bucketlist.Bucket.__table__.insert(), rows)
+    database.session.commit()
+
+
+def run(count, length):
+    """Time count suggestions for prefixes of length, return ms each."""
+    Bucket = bucketlist.Bucket
+    backend = search_backend()
+    prefixes = [
+        "".join(random.choice(string.ascii_lowercase) for _ in range(length))
+        for _ in range(count)
+    ]
+    start = timeit.default_timer()
+    for prefix in prefixes:
+        names = Bucket.query.filter_by(profile_id=1).with_entities(
+            Bucket.name)
+        backend.suggest(names, Bucket, prefix).limit(LIMIT).all()
+    return (timeit.default_timer() - start) * 1000 / count
+
+
+def main(buckets=100000, count=1000):
+    """Seed the buckets and print suggestion latency per prefix length."""
+    app = new_app("testing")
+    with app.app_context():
+        database.drop_all()
+        database.create_all()
+        seed(buckets)
+        timings = [(length, run(count, length)) for length in range(1, 5)]
+        database.drop_all()
+
+    print("{} buckets, {} suggestions per prefix length".format(
+        buckets, count))
+    print("{:<16}{:>14}".format("prefix length", "ms"))
+    for length, elapsed in timings:
+        print("{:<16}{:>14.3f}".format(length, elapsed))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,73 @@
+"""Benchmark per request validation for register, login and bucket create.
+
+Compares building a UserSchema and matching string literal patterns on every
+call, as the endpoints used to, with the compiled patterns and cached schema
+of app.validation.
+
+Usage:
+    python -m benchmarks.validation [iterations]
+"""
+
+import re
+import sys
+import timeit
+
+from app.base import new_app
+from app.models import user
+from app.validation import is_username, user_schema, valid_name
+
+REGISTER = {
+    "username": "Friedrich Nietzscher",
+    "email": "Nietzschern@gmail.com",
+    "password": "Userpassword#2345"
+}
+LOGIN = {"username": "crimson", "password": "Userpassword#2345"}
+BUCKET = "Travelling the world"
+
+
+def register_before():
+    user.UserSchema().validate(REGISTER)
+
+
+def register_after():
+    user_schema().validate(REGISTER)
+
+
+def login_before():
+    re.match("^[A-Za-z0-9]+\\s?[A-Za-z0-9]+$", LOGIN["username"])
+    user.UserSchema().validate(LOGIN, partial=True)
+
+
+def login_after():
+    is_username(LOGIN["username"])
+    user_schema().validate(LOGIN, partial=True)
+
+
+def bucket_before():
+    len(BUCKET.strip()) and re.match("^[A-Za-z0-9_\\s]*$", BUCKET)
+
+
+def bucket_after():
+    valid_name(BUCKET)
+
+
+def main(iterations=2000):
+    """Print microseconds of validation per request, before and after."""
+    cases = [
+        ("register", register_before, register_after),
+        ("login", login_before, login_after),
+        ("bucket create", bucket_before, bucket_after),
+    ]
+    app = new_app("testing")
+    with app.app_context():
+        print("{:<16}{:>14}{:>14}".format("request", "before (us)",
+                                          "after (us)"))
+        for label, before, after in cases:
+            slow = timeit.timeit(before, number=iterations)
+            fast = timeit.timeit(after, number=iterations)
+            print("{:<16}{:>14.2f}{:>14.2f}".format(
+                label, slow * 1e6 / iterations, fast * 1e6 / iterations))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -16,6 +16,33 @@ class Config():
     SWAGGER_UI_DOC_EXPANSION = 'list'
     SWAGGER_UI_JSONEDITOR = True
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=120)
+    PRINCIPAL_CACHE_SIZE = 1024
+    PRINCIPAL_CACHE_TTL = 300
+    # werkzeug hash method, include the iteration count, e.g. pbkdf2:sha256:N
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:50000'
+    PASSWORD_SALT_LENGTH = 8
+    # worker processes per web worker that run password hashing, 0 runs it
+    # inline; more than PASSWORD_HASH_MAX_PENDING operations get a 503, keep
+    # it below the threads of a web worker (WEB_THREADS in the Procfile) so
+    # logins never hold every thread
+    PASSWORD_HASH_WORKERS = 2
+    PASSWORD_HASH_MAX_PENDING = 4
+    # full-text search backend, postgresql or sqlite, None uses the dialect
+    # of the database
+    SEARCH_BACKEND = None
+    # cache of bucket GET responses: lru keeps them in each process, shared
+    # keeps them in RESPONSE_CACHE_STORE, a simplekv store such as
+    # RedisStore, so writes in one process invalidate them in all of them;
+    # off unless an environment opts in, lru only suits a single process
+    RESPONSE_CACHE = None
+    RESPONSE_CACHE_STORE = None
+    RESPONSE_CACHE_SIZE = 4096
+    RESPONSE_CACHE_TTL = 30
+    # buckets of more items are deleted in the background, PURGE_BATCH
+    # items per transaction
+    PURGE_THRESHOLD = 10000
+    PURGE_BATCH = 1000
+    PURGE_IN_BACKGROUND = True
 
 
 class DevelopmentConfig(Config):
@@ -25,6 +52,10 @@ class DevelopmentConfig(Config):
     DEVELOPMENT = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DEV_DATABASE') or \
         'sqlite:///:memory:'
+    # the development server runs a single process
+    RESPONSE_CACHE = 'lru'
+    # a thread would not see the in memory database
+    PURGE_IN_BACKGROUND = bool(os.environ.get('DEV_DATABASE'))
 
 
 class TestingConfig(Config):
@@ -34,6 +65,12 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_TRACK_MODIFICATIONS = True
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=1)
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    PASSWORD_HASH_WORKERS = 0
+    SEARCH_BACKEND = 'sqlite'
+    RESPONSE_CACHE = 'lru'
+    # every connection to an in memory database has its own database
+    PURGE_IN_BACKGROUND = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE') or \
         'sqlite:///:memory:'
 
@@ -42,6 +79,13 @@ class ProductionConfig(Config):
     """Model Production enviroment config object."""
 
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or \
+        'pbkdf2:sha256:150000'
+    PASSWORD_SALT_LENGTH = 16
+    SEARCH_BACKEND = 'postgresql'
+    # several web workers run, the lru cache would serve other workers'
+    # stale responses until they expire
+    RESPONSE_CACHE = os.environ.get('RESPONSE_CACHE')
 
 
 class StagingConfig(Config):
@@ -50,6 +94,8 @@ class StagingConfig(Config):
     DEBUG = True
     DEVELOPMENT = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
+    # runs several web workers like production
+    RESPONSE_CACHE = os.environ.get('RESPONSE_CACHE')
 
 
 config = {
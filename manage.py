@@ -4,6 +4,7 @@
 import os
 import unittest
 
+from app import purge
 from app.base import database, new_app
 from app.models import bucketlist, profile, user
 from flask_migrate import Migrate, MigrateCommand
@@ -35,6 +36,28 @@ def create_database():
         print("Failed, make sure your database server is running!")
 
 
+@manager.command
+def repair_counters():
+    """Recompute the item, done and bucket counters from the tables."""
+    repaired = profile.Profile.repair_counters()
+    if repaired is None:
+        print("Failed, make sure your database server is running!")
+    else:
+        print("Repaired counters of {} buckets and {} profiles.".format(
+            *repaired))
+
+
+@manager.command
+def purge_detached():
+    """Delete the buckets, and their items, whose purge did not finish."""
+    try:
+        buckets, items = purge.purge_detached(app.config['PURGE_BATCH'])
+        print("Purged {} buckets and {} items.".format(buckets, items))
+    except Exception:
+        database.session.rollback()
+        print("Failed, make sure your database server is running!")
+
+
 @manager.command
 def test():
     """Run tests."""
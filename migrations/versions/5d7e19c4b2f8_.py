@@ -0,0 +1,76 @@
+"""full-text search indexes for buckets and items
+
+Revision ID: 5d7e19c4b2f8
+Revises: a84e2d5c0f13
+Create Date: 2026-10-18 13:02:41.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d7e19c4b2f8'
+down_revision = 'a84e2d5c0f13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.execute("CREATE INDEX ix_buckets_search ON buckets "
+                   "USING gin (to_tsvector('simple', name))")
+        op.execute("CREATE INDEX ix_items_search ON items USING gin "
+                   "(to_tsvector('simple', "
+                   "name || ' ' || coalesce(description, '')))")
+    elif dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE buckets_search USING "
+                   "fts5(name, content='buckets', content_rowid='id')")
+        op.execute("CREATE TRIGGER buckets_search_insert AFTER INSERT ON "
+                   "buckets BEGIN INSERT INTO buckets_search(rowid, name) "
+                   "VALUES (new.id, new.name); END")
+        op.execute("CREATE TRIGGER buckets_search_delete AFTER DELETE ON "
+                   "buckets BEGIN INSERT INTO "
+                   "buckets_search(buckets_search, rowid, name) "
+                   "VALUES ('delete', old.id, old.name); END")
+        op.execute("CREATE TRIGGER buckets_search_update AFTER UPDATE OF "
+                   "name ON buckets BEGIN INSERT INTO "
+                   "buckets_search(buckets_search, rowid, name) "
+                   "VALUES ('delete', old.id, old.name); "
+                   "INSERT INTO buckets_search(rowid, name) "
+                   "VALUES (new.id, new.name); END")
+        op.execute("INSERT INTO buckets_search(buckets_search) "
+                   "VALUES ('rebuild')")
+
+        op.execute("CREATE VIRTUAL TABLE items_search USING "
+                   "fts5(name, description, content='items', "
+                   "content_rowid='id')")
+        op.execute("CREATE TRIGGER items_search_insert AFTER INSERT ON items "
+                   "BEGIN INSERT INTO items_search(rowid, name, description) "
+                   "VALUES (new.id, new.name, new.description); END")
+        op.execute("CREATE TRIGGER items_search_delete AFTER DELETE ON items "
+                   "BEGIN INSERT INTO "
+                   "items_search(items_search, rowid, name, description) "
+                   "VALUES ('delete', old.id, old.name, old.description); "
+                   "END")
+        op.execute("CREATE TRIGGER items_search_update AFTER UPDATE OF name, "
+                   "description ON items BEGIN INSERT INTO "
+                   "items_search(items_search, rowid, name, description) "
+                   "VALUES ('delete', old.id, old.name, old.description); "
+                   "INSERT INTO items_search(rowid, name, description) "
+                   "VALUES (new.id, new.name, new.description); END")
+        op.execute("INSERT INTO items_search(items_search) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        op.drop_index('ix_items_search', table_name='items')
+        op.drop_index('ix_buckets_search', table_name='buckets')
+    elif dialect == 'sqlite':
+        for table in ('items', 'buckets'):
+            for action in ('insert', 'delete', 'update'):
+                op.execute("DROP TRIGGER IF EXISTS {}_search_{}".format(
+                    table, action))
+            op.execute("DROP TABLE IF EXISTS {}_search".format(table))
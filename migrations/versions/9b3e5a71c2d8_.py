@@ -0,0 +1,80 @@
+"""delete buckets and items with ON DELETE CASCADE
+
+Revision ID: 9b3e5a71c2d8
+Revises: e41a7c3d9b52
+Create Date: 2026-10-18 16:05:52.318640
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b3e5a71c2d8'
+down_revision = 'e41a7c3d9b52'
+branch_labels = None
+depends_on = None
+
+# (table, column, referenced table) of the foreign keys, named as
+# postgresql names them
+FOREIGN_KEYS = [
+    ('buckets', 'profile_id', 'profiles'),
+    ('items', 'bucket_id', 'buckets'),
+    ('items', 'profile_id', 'profiles'),
+    ('budys', 'user_id', 'users'),
+    ('budys', 'profile_id', 'profiles'),
+]
+
+
+def replace_foreign_keys(ondelete):
+    for table, column, referenced in FOREIGN_KEYS:
+        name = "{}_{}_fkey".format(table, column)
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, referenced, [column], ['id'],
+                              ondelete=ondelete)
+
+
+def sqlite_foreign_keys(ondelete):
+    # sqlite can not alter constraints and copying the tables would drop
+    # their search triggers and expression indexes; the foreign keys are
+    # changed in the sql of the tables instead, as the sqlite documentation
+    # of ALTER TABLE describes, the rows on disk stay as they are
+    bind = op.get_bind()
+    version = bind.execute("PRAGMA schema_version").scalar()
+    bind.execute("PRAGMA writable_schema=ON")
+    for table in sorted({table for table, _, _ in FOREIGN_KEYS}):
+        sql = bind.execute(
+            sa.text("SELECT sql FROM sqlite_master "
+                    "WHERE type = 'table' AND name = :name"),
+            name=table).scalar()
+        for fk_table, column, referenced in FOREIGN_KEYS:
+            if fk_table == table:
+                sql = re.sub(
+                    r"(FOREIGN KEY\s*\({}\)\s*REFERENCES\s+{}\s*\(id\))"
+                    r"( ON DELETE CASCADE)?".format(column, referenced),
+                    r"\1" + (" ON DELETE " + ondelete if ondelete else ""),
+                    sql)
+        bind.execute(
+            sa.text("UPDATE sqlite_master SET sql = :sql "
+                    "WHERE type = 'table' AND name = :name"),
+            sql=sql, name=table)
+    bind.execute("PRAGMA schema_version = {}".format(version + 1))
+    bind.execute("PRAGMA writable_schema=OFF")
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        replace_foreign_keys('CASCADE')
+    elif dialect == 'sqlite':
+        sqlite_foreign_keys('CASCADE')
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        replace_foreign_keys(None)
+    elif dialect == 'sqlite':
+        sqlite_foreign_keys(None)
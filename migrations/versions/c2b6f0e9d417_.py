@@ -0,0 +1,32 @@
+"""index lowercased names for suggestions
+
+Revision ID: c2b6f0e9d417
+Revises: 5d7e19c4b2f8
+Create Date: 2026-10-18 13:40:12.530871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2b6f0e9d417'
+down_revision = '5d7e19c4b2f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # postgresql only runs LIKE prefixes on an index with text_pattern_ops
+    ops = ''
+    if op.get_bind().dialect.name == 'postgresql':
+        ops = ' text_pattern_ops'
+    op.execute("CREATE INDEX ix_buckets_suggest ON buckets "
+               "(profile_id, lower(name){})".format(ops))
+    op.execute("CREATE INDEX ix_items_suggest ON items "
+               "(profile_id, lower(name){})".format(ops))
+
+
+def downgrade():
+    op.drop_index('ix_items_suggest', table_name='items')
+    op.drop_index('ix_buckets_suggest', table_name='buckets')
@@ -1,9 +1,43 @@
-from unittest import TestCase
+from contextlib import contextmanager
+from unittest import TestCase, mock
+
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql.base import PGCompiler
+from sqlalchemy.dialects.sqlite.base import SQLiteCompiler
 
 from app.base import database, new_app
 from app.models import bucketlist, profile, user
 
 
+@contextmanager
+def as_dialect(name=None):
+    """Take the code paths of the dialect name on the sqlite test database.
+
+    Statements written for postgresql, as UPDATE ... RETURNING, run on
+    sqlite, which only returns the columns of the updated table, so the
+    done column of the row before an update is taken as the opposite of
+    the new one.
+    """
+    if name is None:
+        yield
+        return
+
+    engine = database.session.bind
+
+    def previous_done(conn, cursor, statement, parameters, *args):
+        return statement.replace(
+            "previous.done AS", "NOT items.done AS"), parameters
+
+    event.listen(engine, "before_cursor_execute", previous_done, retval=True)
+    try:
+        with mock.patch.object(engine.dialect, "name", name), \
+                mock.patch.object(SQLiteCompiler, "returning_clause",
+                                  PGCompiler.returning_clause):
+            yield
+    finally:
+        event.remove(engine, "before_cursor_execute", previous_done)
+
+
 class BaseTestCase(TestCase):
     def setUp(self):
         self.app = new_app('testing')
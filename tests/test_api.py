@@ -1,6 +1,12 @@
 import json
 
-from tests.base_test_setup import BaseTestCase
+from simplekv.memory import DictStore
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.base import database
+from app.response_cache import response_cache
+from tests.base_test_setup import BaseTestCase, as_dialect
 
 
 class TestBucketList(BaseTestCase):
@@ -17,6 +23,46 @@ class TestBucketList(BaseTestCase):
     def tearDown(self):
         BaseTestCase.tearDown(self)
 
+    def count_queries(self, url):
+        """Issue a GET request and count the sql statements it runs."""
+        response, statements = self.record_queries(url)
+        return response, len(statements)
+
+    def record_queries(self, url, headers=None, method="get", data=None):
+        """Issue a request, a GET by default, and record its sql statements."""
+        statements = []
+        database.session.expunge_all()
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(database.engine, "before_cursor_execute", record)
+        try:
+            response = getattr(self.client, method)(
+                url, headers=headers or self.headers, data=data)
+        finally:
+            event.remove(database.engine, "before_cursor_execute", record)
+        return response, statements
+
+    def test_principal_is_cached(self):
+        response, statements = self.record_queries('/api/v1.0/bucketlist/0')
+        self.assertTrue(response.status_code == 200)
+        self.assertTrue(any("FROM users" in sql for sql in statements))
+
+        response, statements = self.record_queries('/api/v1.0/bucketlist/0')
+        self.assertTrue(response.status_code == 200)
+        self.assertFalse(any("FROM users" in sql for sql in statements))
+        # only the profile's version is read, for the ETag
+        self.assertFalse(any("profiles.handle" in sql for sql in statements))
+
+    def test_principal_cache_invalidated_on_delete(self):
+        self.client.get('/api/v1.0/bucketlist/', headers=self.headers)
+        cache = self.app.extensions['principals']
+        self.assertTrue(cache.get(self.new_user.id))
+
+        self.new_user.delete()
+        self.assertFalse(cache.get(self.new_user.id))
+
     def test_create_bucketlist(self):
 
         # create bucket
@@ -44,6 +90,575 @@ class TestBucketList(BaseTestCase):
         self.assertTrue(data['buckets'])
         self.assertTrue(isinstance(data['buckets'], dict))
 
+    def test_get_many_bucketlist_query_count(self):
+        for index in range(10):
+            name = "bucket " + str(index)
+            self.new_profile.add_bucket(name)
+            self.new_profile.add_item("item " + str(index), buc_name=name)
+        # fill the principal cache
+        self.client.get('/api/v1.0/bucketlist/', headers=self.headers)
+
+        response, small_page = self.count_queries(
+            '/api/v1.0/bucketlist/?limit=2')
+        self.assertTrue(response.status_code == 200)
+        self.assertTrue(len(json.loads(response.data)['buckets']) == 2)
+
+        response, big_page = self.count_queries(
+            '/api/v1.0/bucketlist/?limit=11')
+        self.assertTrue(response.status_code == 200)
+        self.assertTrue(len(json.loads(response.data)['buckets']) == 11)
+        self.assertTrue(small_page == big_page)
+
+    def test_get_many_bucketlist_after_cursor(self):
+        for index in range(4):
+            self.new_profile.add_bucket("bucket " + str(index))
+        # fill the principal cache
+        self.client.get('/api/v1.0/bucketlist/', headers=self.headers)
+
+        response, first_page = self.count_queries(
+            '/api/v1.0/bucketlist/?limit=2&after=')
+        self.assertTrue(response.status_code == 200)
+        data = json.loads(response.data)
+        self.assertTrue(sorted(data['buckets']) == ['0', '1'])
+        self.assertTrue("after=" in response.headers["Link"])
+
+        response, next_page = self.count_queries(
+            '/api/v1.0/bucketlist/?limit=2&after=' + data['next cursor'])
+        data = json.loads(response.data)
+        self.assertTrue(sorted(data['buckets']) == ['2', '3'])
+        self.assertTrue(first_page == next_page)
+
+        response, last_page = self.count_queries(
+            '/api/v1.0/bucketlist/?limit=2&after=' + data['next cursor'])
+        data = json.loads(response.data)
+        self.assertTrue(sorted(data['buckets']) == ['4'])
+        self.assertTrue(data['next cursor'] is None)
+
+    def test_get_many_bucketlist_invalid_cursor(self):
+        response = self.client.get(
+            '/api/v1.0/bucketlist/?after=notacursor', headers=self.headers)
+        self.assertTrue(response.status_code == 400)
+
+    def test_single_object_get_loads_one_row(self):
+        for index in range(5):
+            self.new_profile.add_bucket("bucket " + str(index))
+            self.new_profile.add_item("item " + str(index), buc_id=0)
+
+        response, statements = self.record_queries(
+            '/api/v1.0/bucketlist/0/items/0')
+        self.assertTrue(response.status_code == 200)
+        # every bucket/item lookup is keyed on asset_id
+        for sql in statements:
+            if "FROM buckets" in sql or "FROM items" in sql:
+                self.assertTrue("asset_id = ?" in sql)
+
+    def test_bucket_embeds_item_summary(self):
+        for index in range(7):
+            self.new_profile.add_item("item " + str(index), buc_id=0)
+        self.new_profile.edit_asset(item=True, asset_id=0, done=True, buc_id=0)
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0', headers=self.headers)
+        bucket = json.loads(response.data)['bucket']
+        self.assertTrue(bucket['item count'] == 9)
+        self.assertTrue(bucket['done count'] == 1)
+        self.assertTrue(len(bucket['items']) == 5)
+        self.assertTrue(bucket['items']['0']['id'] == 0)
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/?items=0', headers=self.headers)
+        bucket = json.loads(response.data)['buckets']['0']
+        self.assertTrue(bucket['item count'] == 9)
+        self.assertTrue(bucket['items'] == {})
+
+    def test_list_buckets_reads_counters(self):
+        for index in range(3):
+            self.new_profile.add_bucket("bucket " + str(index))
+
+        self.client.get('/api/v1.0/bucketlist/?limit=2', headers=self.headers)
+        response, statements = self.record_queries(
+            '/api/v1.0/bucketlist/?limit=2&page=2')
+        self.assertTrue(response.status_code == 200)
+        data = json.loads(response.data)
+        self.assertTrue(data['total buckets'] == 4)
+        self.assertTrue(data['total pages'] == 2)
+        self.assertTrue(data['buckets']['3']['item count'] == 0)
+        # the counters are read, nothing is counted
+        self.assertFalse(any("count(" in sql.lower() for sql in statements))
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/?limit=2&page=3', headers=self.headers)
+        self.assertTrue(response.status_code == 404)
+        response = self.client.get(
+            '/api/v1.0/bucketlist/?limit=2&page=-1', headers=self.headers)
+        self.assertTrue(response.status_code == 404)
+
+    def test_list_items(self):
+        for index in range(3):
+            self.new_profile.add_item("item " + str(index), buc_id=0)
+        self.new_profile.edit_asset(item=True, asset_id=1, done=True, buc_id=0)
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0/items?limit=3', headers=self.headers)
+        self.assertTrue(response.status_code == 200)
+        data = json.loads(response.data)
+        self.assertTrue(sorted(data['items']) == ['0', '1', '2'])
+        self.assertTrue("after=" in response.headers["Link"])
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0/items?limit=3&after=' +
+            data['next cursor'],
+            headers=self.headers)
+        data = json.loads(response.data)
+        self.assertTrue(sorted(data['items']) == ['3', '4'])
+        self.assertTrue(data['next cursor'] is None)
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0/items?done=true', headers=self.headers)
+        data = json.loads(response.data)
+        self.assertTrue(list(data['items']) == ['1'])
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/9/items', headers=self.headers)
+        self.assertTrue(response.status_code == 404)
+
+    def test_sparse_fieldsets(self):
+        for index in range(7):
+            self.new_profile.add_item("item " + str(index), buc_id=0)
+
+        self.client.get('/api/v1.0/bucketlist/', headers=self.headers)
+        response, statements = self.record_queries(
+            '/api/v1.0/bucketlist/?fields=name')
+        self.assertTrue(response.status_code == 200)
+        bucket = json.loads(response.data)['buckets']['0']
+        self.assertTrue(bucket == {"name": bucket["name"]})
+        # one narrow column query, no item summaries
+        selects = [sql for sql in statements if "FROM buckets" in sql]
+        self.assertTrue(len(selects) == 1)
+        self.assertFalse("date_created" in selects[0])
+        self.assertFalse(any("FROM items" in sql for sql in statements))
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0?fields=id,item_count&expand=items',
+            headers=self.headers)
+        bucket = json.loads(response.data)['bucket']
+        self.assertTrue(sorted(bucket) == ['id', 'item count', 'items'])
+        self.assertTrue(len(bucket['items']) == 9)
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/?fields=name,owner', headers=self.headers)
+        self.assertTrue(response.status_code == 400)
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0?expand=owner', headers=self.headers)
+        self.assertTrue(response.status_code == 400)
+
+    def test_search_buckets_ranked(self):
+        self.new_profile.add_bucket("Cook dinner")
+        self.new_profile.add_bucket("Travelling abroad by train")
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/?q=travelling', headers=self.headers)
+        self.assertTrue(response.status_code == 200)
+        buckets = json.loads(response.data)['buckets']
+        self.assertTrue(sorted(buckets) == ['0', '2'])
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/?q=train%20abroad', headers=self.headers)
+        buckets = json.loads(response.data)['buckets']
+        self.assertTrue(list(buckets) == ['2'])
+
+        # the last word is matched as the start of a word
+        response = self.client.get(
+            '/api/v1.0/bucketlist/?q=trav', headers=self.headers)
+        buckets = json.loads(response.data)['buckets']
+        self.assertTrue(sorted(buckets) == ['0', '2'])
+        response = self.client.get(
+            '/api/v1.0/bucketlist/?q=trav%20abroad', headers=self.headers)
+        self.assertTrue(json.loads(response.data)['buckets'] == {})
+
+        self.new_profile.edit_asset(asset_id=1, name="Travelling cook")
+        response = self.client.get(
+            '/api/v1.0/bucketlist/?q=cook&after=', headers=self.headers)
+        buckets = json.loads(response.data)['buckets']
+        self.assertTrue(list(buckets) == ['1'])
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/?q=%22%2A', headers=self.headers)
+        self.assertTrue(json.loads(response.data)['buckets'] == {})
+
+    def test_search_items(self):
+        self.new_profile.add_item(
+            "Swim", description="swim with dolphins in Mombasa", buc_id=0)
+        self.new_profile.add_bucket("Other")
+        self.new_profile.add_item("Eat", description="swim later", buc_id=1)
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/items/search?q=mombasa',
+            headers=self.headers)
+        self.assertTrue(response.status_code == 200)
+        items = json.loads(response.data)['items']
+        # the name match ranks above the description match
+        self.assertTrue([item['id'] for item in items] == [1, 2])
+        self.assertTrue(items[0]['bucket id'] == 0)
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/items/search?q=swim', headers=self.headers)
+        items = json.loads(response.data)['items']
+        self.assertTrue([item['id'] for item in items] == [2, 3])
+        self.assertTrue(items[1]['bucket id'] == 1)
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/items/search?q=dolph', headers=self.headers)
+        items = json.loads(response.data)['items']
+        self.assertTrue([item['id'] for item in items] == [2])
+
+        self.new_profile.delete_asset(item=True, asset_id=2, buc_id=0)
+        response = self.client.get(
+            '/api/v1.0/bucketlist/items/search?q=swim', headers=self.headers)
+        items = json.loads(response.data)['items']
+        self.assertTrue([item['id'] for item in items] == [3])
+
+    def test_suggest_names(self):
+        for name in ["trip to paris", "Trek", "train_ride", "cook"]:
+            self.new_profile.add_bucket(name)
+        self.new_profile.add_item("Tramp", buc_id=0)
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/suggest?prefix=TR', headers=self.headers)
+        self.assertTrue(response.status_code == 200)
+        data = json.loads(response.data)
+        self.assertTrue(data['buckets'] == [
+            "train_ride", "Travelling", "Trek", "trip to paris"
+        ])
+        self.assertTrue(data['items'] == ["Tramp"])
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/suggest?prefix=tr&limit=2',
+            headers=self.headers)
+        data = json.loads(response.data)
+        self.assertTrue(data['buckets'] == ["train_ride", "Travelling"])
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/suggest?prefix=train_',
+            headers=self.headers)
+        data = json.loads(response.data)
+        self.assertTrue(data['buckets'] == ["train_ride"])
+        self.assertTrue(data['items'] == [])
+
+    def test_conditional_get(self):
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0', headers=self.headers)
+        etag = response.headers['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        headers = dict(self.headers, **{'If-None-Match': etag})
+        response, statements = self.record_queries('/api/v1.0/bucketlist/0',
+                                                   headers)
+        self.assertTrue(response.status_code == 304)
+        self.assertTrue(response.data == b"")
+        # only the profile's version is read
+        self.assertTrue(len(statements) == 1)
+        self.assertTrue(response.headers['ETag'] == etag)
+
+        # other representations have their own ETag
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0?items=1', headers=headers)
+        self.assertTrue(response.status_code == 200)
+
+        # any write to the profile's buckets or items changes it
+        self.new_profile.edit_asset(item=True, asset_id=0, done=True, buc_id=0)
+        response = self.client.get('/api/v1.0/bucketlist/0', headers=headers)
+        self.assertTrue(response.status_code == 200)
+        self.assertTrue(response.headers['ETag'] != etag)
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0/items/0', headers=self.headers)
+        headers['If-None-Match'] = response.headers['ETag']
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0/items/0', headers=headers)
+        self.assertTrue(response.status_code == 304)
+        response = self.client.get('/api/v1.0/bucketlist/', headers=headers)
+        self.assertTrue(response.status_code == 200)
+
+    def test_conditional_write(self):
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0/items/0', headers=self.headers)
+        headers = dict(self.headers, **{'If-Match': response.headers['ETag']})
+
+        data = json.dumps({"done": True})
+        response = self.client.patch(
+            '/api/v1.0/bucketlist/0/items/0', data=data, headers=headers)
+        self.assertTrue(response.status_code == 200)
+        etag = response.headers['ETag']
+
+        # the first write changed the ETag the second one was based on
+        response = self.client.put(
+            '/api/v1.0/bucketlist/0/items/0',
+            data=json.dumps({"name": "new name"}),
+            headers=headers)
+        self.assertTrue(response.status_code == 412)
+        response = self.client.delete(
+            '/api/v1.0/bucketlist/0', headers=headers)
+        self.assertTrue(response.status_code == 412)
+        self.assertTrue(self.new_profile.get_bucket(bucket_id=0))
+
+        headers['If-Match'] = etag
+        response = self.client.put(
+            '/api/v1.0/bucketlist/0/items/0',
+            data=json.dumps({"name": "new name"}),
+            headers=headers)
+        self.assertTrue(response.status_code == 201)
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0', headers=self.headers)
+        headers['If-Match'] = response.headers['ETag']
+        response = self.client.put(
+            '/api/v1.0/bucketlist/0',
+            data=json.dumps({"name": "renamed"}),
+            headers=headers)
+        self.assertTrue(response.status_code == 201)
+        headers['If-Match'] = response.headers['ETag']
+        response = self.client.delete(
+            '/api/v1.0/bucketlist/0', headers=headers)
+        self.assertTrue(response.status_code == 200)
+
+    def test_conditional_write_on_returned_resource_etag(self):
+        for dialect in (None, "postgresql"):
+            with as_dialect(dialect):
+                response = self.client.put(
+                    '/api/v1.0/bucketlist/0',
+                    data=json.dumps({"name": "Trips " + str(dialect)}),
+                    headers=self.headers)
+                self.assertTrue(response.status_code == 201)
+                bucket_etag = response.headers['X-Resource-ETag']
+                response = self.client.patch(
+                    '/api/v1.0/bucketlist/0/items/0',
+                    data=json.dumps({"done": dialect is None}),
+                    headers=self.headers)
+                self.assertTrue(response.status_code == 200)
+                item_etag = response.headers['X-Resource-ETag']
+
+                # the ETags of the writes are those of the next GETs
+                response = self.client.get(
+                    '/api/v1.0/bucketlist/0', headers=self.headers)
+                self.assertTrue(
+                    response.headers['X-Resource-ETag'] == bucket_etag)
+                response = self.client.get(
+                    '/api/v1.0/bucketlist/0/items/0', headers=self.headers)
+                self.assertTrue(
+                    response.headers['X-Resource-ETag'] == item_etag)
+
+                headers = dict(self.headers, **{'If-Match': item_etag})
+                response = self.client.put(
+                    '/api/v1.0/bucketlist/0/items/0',
+                    data=json.dumps({"name": "Juice " + str(dialect)}),
+                    headers=headers)
+                self.assertTrue(response.status_code == 201)
+                response = self.client.put(
+                    '/api/v1.0/bucketlist/0/items/0',
+                    data=json.dumps({"name": "Water"}),
+                    headers=headers)
+                self.assertTrue(response.status_code == 412)
+
+                headers['If-Match'] = bucket_etag
+                response = self.client.put(
+                    '/api/v1.0/bucketlist/0',
+                    data=json.dumps({"name": "Journeys " + str(dialect)}),
+                    headers=headers)
+                self.assertTrue(response.status_code == 201)
+
+    def test_conditional_write_on_resource_etag(self):
+        self.new_profile.add_bucket("Second")
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0', headers=self.headers)
+        bucket_etag = response.headers['X-Resource-ETag']
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0', headers=self.headers)
+        self.assertTrue(response.headers['X-Cache'] == "HIT")
+        self.assertTrue(response.headers['X-Resource-ETag'] == bucket_etag)
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0/items/0', headers=self.headers)
+        item_etag = response.headers['X-Resource-ETag']
+
+        # writes to other buckets and items leave the resource ETags alone
+        self.client.put(
+            '/api/v1.0/bucketlist/1',
+            data=json.dumps({"name": "Renamed"}),
+            headers=self.headers)
+        self.client.patch(
+            '/api/v1.0/bucketlist/0/items/1',
+            data=json.dumps({"done": True}),
+            headers=self.headers)
+        headers = dict(self.headers, **{'If-Match': item_etag})
+        response = self.client.patch(
+            '/api/v1.0/bucketlist/0/items/0',
+            data=json.dumps({"done": True}),
+            headers=headers)
+        self.assertTrue(response.status_code == 200)
+        response = self.client.put(
+            '/api/v1.0/bucketlist/0/items/0',
+            data=json.dumps({"name": "new name"}),
+            headers=headers)
+        self.assertTrue(response.status_code == 412)
+
+        headers['If-Match'] = bucket_etag
+        response = self.client.put(
+            '/api/v1.0/bucketlist/0',
+            data=json.dumps({"name": "Trips"}),
+            headers=headers)
+        self.assertTrue(response.status_code == 201)
+        response = self.client.put(
+            '/api/v1.0/bucketlist/0',
+            data=json.dumps({"name": "Journeys"}),
+            headers=headers)
+        self.assertTrue(response.status_code == 412)
+
+        # items of a bucket are written on the condition of the bucket
+        response = self.client.patch(
+            '/api/v1.0/bucketlist/0/items',
+            data=json.dumps({"done": False}),
+            headers=headers)
+        self.assertTrue(response.status_code == 412)
+        response = self.client.post(
+            '/api/v1.0/bucketlist/0/items/bulk',
+            data=json.dumps([{"name": "Sail"}]),
+            headers=headers)
+        self.assertTrue(response.status_code == 412)
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0', headers=self.headers)
+        headers['If-Match'] = response.headers['X-Resource-ETag']
+        response = self.client.patch(
+            '/api/v1.0/bucketlist/0/items',
+            data=json.dumps({"done": False}),
+            headers=headers)
+        self.assertTrue(response.status_code == 200)
+
+    def test_conditional_batch(self):
+        response = self.client.get(
+            '/api/v1.0/bucketlist/', headers=self.headers)
+        headers = dict(self.headers, **{'If-Match': response.headers['ETag']})
+        data = json.dumps([
+            {"op": "edit", "type": "bucket", "bucket_id": 0, "name": "Trips"}
+        ])
+        response = self.client.post(
+            "/api/v1.0/batch/", headers=headers, data=data)
+        self.assertTrue(response.status_code == 200)
+        # the bucket list changed since the ETag was read
+        response = self.client.post(
+            "/api/v1.0/batch/", headers=headers, data=data)
+        self.assertTrue(response.status_code == 412)
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0/items/0', headers=self.headers)
+        etag = response.headers['X-Resource-ETag']
+        data = json.dumps([
+            {"op": "create", "type": "bucket", "name": "Sports"},
+            {"op": "patch", "type": "item", "bucket_id": 0, "item_id": 0,
+             "done": True, "if_match": etag},
+            {"op": "edit", "type": "item", "bucket_id": 0, "item_id": 0,
+             "name": "Stale", "if_match": etag},
+        ])
+        response = self.client.post(
+            "/api/v1.0/batch/", headers=self.headers, data=data)
+        self.assertTrue(response.status_code == 412)
+        results = json.loads(response.data)["results"]
+        self.assertTrue([result["status"] for result in results] ==
+                        [201, 200, 412])
+        self.assertFalse(self.new_profile.get_bucket(name="Sports"))
+
+    def test_response_cache(self):
+        self.new_profile.add_bucket("Second")
+        urls = ['/api/v1.0/bucketlist/', '/api/v1.0/bucketlist/0',
+                '/api/v1.0/bucketlist/1']
+        for url in urls:
+            response = self.client.get(url, headers=self.headers)
+            self.assertTrue(response.headers['X-Cache'] == "MISS")
+
+        response, statements = self.record_queries('/api/v1.0/bucketlist/0')
+        self.assertTrue(response.headers['X-Cache'] == "HIT")
+        self.assertTrue(json.loads(response.data)['bucket']['id'] == 0)
+        self.assertFalse(any("FROM buckets" in sql for sql in statements))
+        self.new_profile = database.session.merge(self.new_profile)
+
+        # an item of bucket 0 changes the listing and bucket 0 only
+        self.new_profile.add_item("Swim", buc_id=0)
+        cached = [
+            self.client.get(url, headers=self.headers).headers['X-Cache']
+            for url in urls
+        ]
+        self.assertTrue(cached == ["MISS", "MISS", "HIT"])
+        response = self.client.get(urls[1], headers=self.headers)
+        self.assertTrue(
+            json.loads(response.data)['bucket']['item count'] == 3)
+
+        self.new_profile.edit_asset(asset_id=1, name="Renamed")
+        cached = [
+            self.client.get(url, headers=self.headers).headers['X-Cache']
+            for url in urls
+        ]
+        self.assertTrue(cached == ["MISS", "HIT", "MISS"])
+
+        stats = response_cache().stats()
+        self.assertTrue(stats["hits"] == 4)
+        self.assertTrue(stats["misses"] == 7)
+        self.assertTrue(stats["evictions"] == 0)
+
+    def test_shared_response_cache(self):
+        store = DictStore()
+        self.app.config['RESPONSE_CACHE'] = 'shared'
+        self.app.config['RESPONSE_CACHE_STORE'] = store
+        self.app.extensions.pop('responses')
+        self.client.get('/api/v1.0/bucketlist/0', headers=self.headers)
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0', headers=self.headers)
+        self.assertTrue(response.headers['X-Cache'] == "HIT")
+        self.assertTrue(store.keys())
+
+        # another process sharing the store sees the invalidation
+        self.app.extensions.pop('responses')
+        self.new_profile.delete_asset(item=True, asset_id=0, buc_id=0)
+        response = self.client.get(
+            '/api/v1.0/bucketlist/0', headers=self.headers)
+        self.assertTrue(response.headers['X-Cache'] == "MISS")
+        self.assertTrue(
+            json.loads(response.data)['bucket']['item count'] == 1)
+
+    def test_streamed_listing(self):
+        for index in range(7):
+            self.new_profile.add_item("item " + str(index), buc_id=0)
+        response = self.client.get(
+            '/api/v1.0/bucketlist/?stream=true&expand=items',
+            headers=self.headers)
+        self.assertTrue(response.status_code == 200)
+        self.assertTrue(response.is_streamed)
+        self.assertFalse('X-Cache' in response.headers)
+        bucket = json.loads(response.data)['buckets']['0']
+        self.assertTrue(len(bucket['items']) == 9)
+        self.assertTrue(bucket['item count'] == 9)
+
+    def test_export(self):
+        self.new_profile.add_bucket("Second")
+        self.new_profile.add_item("Swim", buc_id=1)
+        response = self.client.get(
+            '/api/v1.0/bucketlist/export', headers=self.headers)
+        self.assertTrue(response.status_code == 200)
+        self.assertTrue(response.is_streamed)
+        buckets = json.loads(response.data)['buckets']
+        self.assertTrue(sorted(buckets) == ['0', '1'])
+        self.assertTrue(sorted(buckets['0']['items']) == ['0', '1'])
+        self.assertTrue(list(buckets['1']['items']) == ['2'])
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/export?format=ndjson', headers=self.headers)
+        self.assertTrue(response.mimetype == 'application/x-ndjson')
+        lines = response.data.decode().splitlines()
+        self.assertTrue(len(lines) == 5)
+        self.assertTrue(json.loads(lines[4])['item']['bucket id'] == 1)
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/export?format=xml', headers=self.headers)
+        self.assertTrue(response.status_code == 400)
+
     def test_edit_bucketlist(self):
         data = json.dumps({"name": "new name"})
         response = self.client.put(
@@ -61,6 +676,28 @@ class TestBucketList(BaseTestCase):
         data = json.loads(response.data)
         self.assertTrue(data["message"] == "Bucket deleted succesfully")
 
+        # the database deleted its items
+        response = self.client.get(
+            '/api/v1.0/bucketlist/items/search?q=Mombasa',
+            headers=self.headers)
+        self.assertTrue(json.loads(response.data)["items"] == [])
+
+    def test_delete_large_bucket_frees_item_names(self):
+        self.app.config['PURGE_THRESHOLD'] = 1
+        self.new_profile.add_bucket("Other")
+        response = self.client.delete(
+            '/api/v1.0/bucketlist/0', headers=self.headers)
+        self.assertTrue(response.status_code == 200)
+
+        response = self.client.get(
+            '/api/v1.0/bucketlist/suggest?prefix=go', headers=self.headers)
+        self.assertTrue(json.loads(response.data)["items"] == [])
+        response = self.client.post(
+            "/api/v1.0/bucketlist/1/items",
+            headers=self.headers,
+            data=json.dumps({"name": "Go to Mombasa"}))
+        self.assertTrue(response.status_code == 201)
+
     def test_create_item(self):
         data = json.dumps({
             "name": "new item",
@@ -72,6 +709,192 @@ class TestBucketList(BaseTestCase):
         data = json.loads(response.data)
         self.assertTrue(data["item"].get("id") == 2)
 
+    def test_create_items_bulk(self):
+        data = json.dumps([{
+            "name": "Swim",
+            "description": "In the ocean"
+        }, {
+            "name": "Go to Mombasa"
+        }, {
+            "name": "Swim"
+        }, {
+            "name": "Hike!"
+        }, "Dive", {
+            "name": "Dive"
+        }])
+        response, statements = self.record_queries(
+            "/api/v1.0/bucketlist/0/items/bulk", method="post", data=data)
+        self.assertTrue(response.status_code == 207)
+        results = json.loads(response.data)["results"]
+        self.assertTrue([result["status"] for result in results] ==
+                        [201, 400, 400, 400, 400, 201])
+        self.assertTrue(results[0]["item"]["id"] == 2)
+        self.assertTrue(results[0]["item"]["description"] == "In the ocean")
+        self.assertTrue(results[1]["message"] == "Item Go to Mombasa exists")
+        self.assertTrue(results[5]["item"]["id"] == 3)
+        inserts = [sql for sql in statements if sql.startswith("INSERT")]
+        self.assertTrue(len(inserts) == 1)
+
+        response = self.client.get(
+            "/api/v1.0/bucketlist/0/items", headers=self.headers)
+        self.assertTrue(len(json.loads(response.data)["items"]) == 4)
+
+        # an explicit null description gets the default one
+        response = self.client.post(
+            "/api/v1.0/bucketlist/0/items/bulk",
+            headers=self.headers,
+            data=json.dumps([{"name": "Dance", "description": None}]))
+        item = json.loads(response.data)["results"][0]["item"]
+        self.assertTrue(item["description"] == "Let's Do this")
+
+    def test_create_items_bulk_invalid(self):
+        url = "/api/v1.0/bucketlist/0/items/bulk"
+        response = self.client.post(
+            url, headers=self.headers, data=json.dumps({"name": "Swim"}))
+        self.assertTrue(response.status_code == 400)
+        response = self.client.post(
+            url, headers=self.headers, data=json.dumps([{"name": ""}]))
+        self.assertTrue(response.status_code == 400)
+        response = self.client.post(
+            "/api/v1.0/bucketlist/9/items/bulk",
+            headers=self.headers,
+            data=json.dumps([{"name": "Swim"}]))
+        self.assertTrue(response.status_code == 404)
+
+    def test_batch(self):
+        data = json.dumps([
+            {"op": "create", "type": "bucket", "name": "Sports"},
+            {"op": "create", "type": "item", "bucket_id": 1, "name": "Swim",
+             "description": None},
+            {"op": "patch", "type": "item", "bucket_id": 1, "item_id": 2,
+             "done": True},
+            {"op": "edit", "type": "item", "bucket_id": 0, "item_id": 0,
+             "description": "Mango juice"},
+            {"op": "delete", "type": "item", "bucket_id": 0, "item_id": 1},
+            {"op": "edit", "type": "bucket", "bucket_id": 0, "name": "Trips"},
+        ])
+        commits = []
+
+        def record(session):
+            commits.append(session)
+
+        event.listen(Session, "after_commit", record)
+        try:
+            response = self.client.post(
+                "/api/v1.0/batch/", headers=self.headers, data=data)
+        finally:
+            event.remove(Session, "after_commit", record)
+        self.assertTrue(response.status_code == 200)
+        self.assertTrue(len(commits) == 1)
+        results = json.loads(response.data)["results"]
+        self.assertTrue([result["status"] for result in results] ==
+                        [201, 201, 200, 201, 200, 201])
+        self.assertTrue(results[1]["item"]["description"] == "Let's Do this")
+        self.assertTrue(results[2]["item"]["done"])
+        self.assertTrue(results[5]["bucket"]["name"] == "Trips")
+
+        response = self.client.get(
+            "/api/v1.0/bucketlist/0", headers=self.headers)
+        bucket = json.loads(response.data)["bucket"]
+        self.assertTrue(bucket["item count"] == 1)
+        self.assertTrue(bucket["items"]["0"]["description"] == "Mango juice")
+
+    def test_batch_results_are_serialized_in_transaction(self):
+        data = json.dumps([
+            {"op": "create", "type": "bucket", "name": "Fresh"},
+            {"op": "edit", "type": "bucket", "bucket_id": 1,
+             "name": "Fresher"},
+            {"op": "delete", "type": "item", "bucket_id": 0, "item_id": 99},
+        ])
+        response = self.client.post(
+            "/api/v1.0/batch/", headers=self.headers, data=data)
+        self.assertTrue(response.status_code == 404)
+        results = json.loads(response.data)["results"]
+        self.assertTrue(results[1]["bucket"]["name"] == "Fresher")
+
+        data = json.dumps([
+            {"op": "edit", "type": "bucket", "bucket_id": 0,
+             "name": "Renamed"},
+            {"op": "delete", "type": "bucket", "bucket_id": 9},
+        ])
+        response = self.client.post(
+            "/api/v1.0/batch/", headers=self.headers, data=data)
+        self.assertTrue(response.status_code == 404)
+        results = json.loads(response.data)["results"]
+        # the result of the operation, which was rolled back
+        self.assertTrue(results[0]["bucket"]["name"] == "Renamed")
+        self.assertTrue(self.new_profile.get_bucket(bucket_id=0).name ==
+                        "Travelling")
+
+    def test_batch_rejects_invalid_ids(self):
+        for bucket_id in [[1], "0", True, 2 ** 40]:
+            data = json.dumps([
+                {"op": "create", "type": "bucket", "name": "Sports"},
+                {"op": "delete", "type": "bucket", "bucket_id": bucket_id},
+            ])
+            response = self.client.post(
+                "/api/v1.0/batch/", headers=self.headers, data=data)
+            self.assertTrue(response.status_code == 400)
+            results = json.loads(response.data)["results"]
+            self.assertTrue(results[1]["message"] ==
+                            "bucket_id must be an integer")
+        data = json.dumps([
+            {"op": "delete", "type": "item", "bucket_id": 0, "item_id": "0"}
+        ])
+        response = self.client.post(
+            "/api/v1.0/batch/", headers=self.headers, data=data)
+        self.assertTrue(response.status_code == 400)
+        self.assertFalse(self.new_profile.get_bucket(name="Sports"))
+
+    def test_batch_is_rolled_back(self):
+        data = json.dumps([
+            {"op": "create", "type": "bucket", "name": "Sports"},
+            {"op": "delete", "type": "item", "bucket_id": 0, "item_id": 0},
+            {"op": "delete", "type": "item", "bucket_id": 0, "item_id": 9},
+            {"op": "create", "type": "bucket", "name": "Music"},
+        ])
+        response = self.client.post(
+            "/api/v1.0/batch/", headers=self.headers, data=data)
+        self.assertTrue(response.status_code == 404)
+        results = json.loads(response.data)["results"]
+        self.assertTrue([result["status"] for result in results] ==
+                        [201, 200, 404])
+
+        response = self.client.get(
+            "/api/v1.0/bucketlist/", headers=self.headers)
+        buckets = json.loads(response.data)["buckets"]
+        self.assertTrue(list(buckets) == ["0"])
+        self.assertTrue(buckets["0"]["item count"] == 2)
+
+        response = self.client.post(
+            "/api/v1.0/batch/", headers=self.headers,
+            data=json.dumps([{"op": "rename", "type": "bucket"}]))
+        self.assertTrue(response.status_code == 400)
+
+    def test_mark_items_done(self):
+        url = "/api/v1.0/bucketlist/0/items"
+        data = json.dumps({"done": True, "items": [1, 7]})
+        response, statements = self.record_queries(
+            url, method="patch", data=data)
+        self.assertTrue(response.status_code == 200)
+        self.assertTrue(json.loads(response.data)["changed"] == 1)
+        updates = [sql for sql in statements if sql.startswith("UPDATE items")]
+        self.assertTrue(len(updates) == 1)
+
+        response = self.client.get(url + "?done=true", headers=self.headers)
+        self.assertTrue(list(json.loads(response.data)["items"]) == ["1"])
+
+        # every item of the bucket
+        data = json.dumps({"done": True})
+        response = self.client.patch(url, headers=self.headers, data=data)
+        self.assertTrue(json.loads(response.data)["changed"] == 1)
+        response = self.client.get(url + "?done=false", headers=self.headers)
+        self.assertTrue(json.loads(response.data)["items"] == {})
+
+        response = self.client.patch(
+            "/api/v1.0/bucketlist/9/items", headers=self.headers, data=data)
+        self.assertTrue(response.status_code == 404)
+
     def test_get_item(self):
         response = self.client.get(
             "/api/v1.0/bucketlist/0/items/0", headers=self.headers)
@@ -93,6 +916,21 @@ class TestBucketList(BaseTestCase):
         self.assertTrue(data['item'].get("name") == "new_name")
         self.assertTrue(data['item'].get("description") == "new description")
 
+    def test_edit_item_round_trips(self):
+        data = json.dumps({"done": True})
+        response, statements = self.record_queries(
+            "/api/v1.0/bucketlist/0/items/1", method="patch", data=data)
+        self.assertTrue(response.status_code == 200)
+        self.assertTrue(json.loads(response.data)["item"]["done"])
+        items = [sql for sql in statements if "items" in sql]
+        # the item is loaded with its bucket, updated and read back once
+        # committed, sqlite has no UPDATE ... RETURNING
+        self.assertTrue(len(items) == 3)
+
+        response = self.client.patch(
+            "/api/v1.0/bucketlist/0/items/9", headers=self.headers, data=data)
+        self.assertTrue(response.status_code == 404)
+
     def test_delete_item(self):
         response = self.client.delete(
             "/api/v1.0/bucketlist/0/items/0", headers=self.headers)
@@ -98,3 +98,22 @@ class TestRegister(BaseTestCase):
             email="crimson2@gmail.com")
         response = self.client.post(self.register_url, data=existing_user)
         self.assertTrue(response.status_code == 400)
+
+    def test_register_existing_username_or_email(self):
+        taken_email = dict(
+            username="crimson3",
+            password="Userpassword#2345",
+            email="crimson@gmail.com")
+        response = self.client.post(self.register_url, data=taken_email)
+        self.assertTrue(response.status_code == 400)
+        data = json.loads(response.data)
+        self.assertTrue(data["message"].startswith("Email exists"))
+
+        taken_username = dict(
+            username="crimson",
+            password="Userpassword#2345",
+            email="crimson3@gmail.com")
+        response = self.client.post(self.register_url, data=taken_username)
+        self.assertTrue(response.status_code == 400)
+        data = json.loads(response.data)
+        self.assertTrue(data["message"].startswith("Username exists"))
@@ -0,0 +1,71 @@
+"""This module contains unit tests for caching utilities."""
+
+import time
+from unittest import TestCase
+
+from simplekv.memory import DictStore
+
+from app.cache import LRUCache, SharedCache
+
+
+class TestLRUCache(TestCase):
+    def test_get_and_set(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        self.assertTrue(cache.get("a") == 1)
+        self.assertTrue(cache.get("b") is None)
+        self.assertTrue(cache.get("b", 2) == 2)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertTrue(cache.get("a") == 1)
+        self.assertTrue(cache.get("b") is None)
+        self.assertTrue(cache.get("c") == 3)
+        self.assertTrue(len(cache) == 2)
+        self.assertTrue(cache.evictions == 1)
+
+    def test_expired_entries_are_dropped(self):
+        cache = LRUCache(maxsize=2, ttl=0.01)
+        cache.set("a", 1)
+        time.sleep(0.02)
+        self.assertTrue(cache.get("a") is None)
+        self.assertTrue(len(cache) == 0)
+
+    def test_delete(self):
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.delete("a")
+        cache.delete("missing")
+        self.assertTrue(cache.get("a") is None)
+
+
+class TestSharedCache(TestCase):
+    def test_get_set_and_delete(self):
+        store = DictStore()
+        cache = SharedCache(store, ttl=60, prefix="test_")
+        cache.set("a", b"1")
+        self.assertTrue(cache.get("a") == b"1")
+        self.assertTrue(cache.get("b") is None)
+        self.assertTrue(list(store.keys()) == ["test_a"])
+
+        # every cache on the store sees the entry
+        self.assertTrue(SharedCache(store, prefix="test_").get("a") == b"1")
+
+        cache.delete("a")
+        cache.delete("missing")
+        self.assertTrue(cache.get("a") is None)
+
+    def test_clear_only_own_entries(self):
+        store = DictStore()
+        store.put("other", b"kept")
+        cache = SharedCache(store, prefix="test_")
+        cache.set("a", b"1")
+        cache.set("b", b"2")
+        self.assertTrue(len(cache) == 2)
+        cache.clear()
+        self.assertTrue(len(cache) == 0)
+        self.assertTrue(store.get("other") == b"kept")
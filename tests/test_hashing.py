@@ -0,0 +1,61 @@
+"""This module contains unit tests for the password hash pool."""
+
+import json
+
+from app import hashing
+from tests.base_test_setup import BaseTestCase
+
+
+class CheckOnlyPool(hashing.HashPool):
+    """Pool with no slot left for hashing, as if saturated after a check."""
+
+    def run(self, function, *args):
+        if function is hashing._generate:
+            raise hashing.HashingUnavailable("Too many password operations")
+        return super(CheckOnlyPool, self).run(function, *args)
+
+
+class TestHashPool(BaseTestCase):
+    def test_process_pool_hashes_and_checks(self):
+        pool = hashing.HashPool(workers=1, max_pending=4)
+        try:
+            pwhash = pool.run(hashing._generate, "Secret#123",
+                              "pbkdf2:sha256:1000", 8)
+            self.assertTrue(pwhash.startswith("pbkdf2:sha256:1000$"))
+            self.assertTrue(pool.run(hashing._check, pwhash, "Secret#123"))
+            self.assertFalse(pool.run(hashing._check, pwhash, "wrong"))
+        finally:
+            pool.shutdown()
+
+        stats = pool.stats()
+        self.assertTrue(stats["completed"] == 3)
+        self.assertTrue(stats["rejected"] == 0)
+        self.assertTrue(stats["hash time total"] > 0)
+        self.assertTrue(stats["queue wait max"] >= 0)
+
+    def test_saturated_pool_rejects(self):
+        pool = hashing.HashPool(workers=0, max_pending=0)
+        with self.assertRaises(hashing.HashingUnavailable):
+            pool.run(hashing._check, "pbkdf2:sha256:1$a$b", "password")
+        self.assertTrue(pool.stats()["rejected"] == 1)
+
+    def test_saturated_pool_fails_login_fast(self):
+        self.app.extensions['hash_pool'] = hashing.HashPool(max_pending=0)
+        with self.assertLogs(self.app.logger, "WARNING") as logs:
+            response = self.client.post(self.login_url, data=self.data)
+        self.assertTrue(response.status_code == 503)
+        self.assertTrue("'rejected': 1" in logs.output[0])
+        self.assertTrue(response.headers["Retry-After"] == "1")
+        data = json.loads(response.data)
+        self.assertTrue(data["status"] == "Login Failed")
+
+        response = self.client.post(self.register_url, data=self.registerdata)
+        self.assertTrue(response.status_code == 503)
+
+    def test_saturated_pool_skips_rehash_on_login(self):
+        self.app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1500'
+        self.app.extensions['hash_pool'] = CheckOnlyPool(workers=0)
+        response = self.client.post(self.login_url, data=self.data)
+        self.assertTrue(response.status_code == 200)
+        data = json.loads(response.data)
+        self.assertTrue(data["status"] == "authunticated")
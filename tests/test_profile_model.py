@@ -1,7 +1,18 @@
 """This module contains unit tests for models used in application."""
 
+import os
+import shutil
+import tempfile
+import threading
+import timeit
+from unittest import TestCase
+
+from sqlalchemy import event
+
+from app import purge
+from app.base import database, new_app
 from app.models import bucketlist, profile, user
-from tests.base_test_setup import BaseTestCase
+from tests.base_test_setup import BaseTestCase, as_dialect
 
 
 class TestProfile(BaseTestCase):
@@ -63,6 +74,89 @@ class TestProfile(BaseTestCase):
             name="Space", profile_id=self.new_profile.id)
         self.assertTrue(query.name == "Space")
 
+    def test_create_asset_commits_once(self):
+        commits = []
+
+        def record(session):
+            commits.append(session)
+
+        event.listen(database.session, "after_commit", record)
+        try:
+            self.assertTrue(self.new_profile.add_bucket("Space"))
+            self.assertTrue(len(commits) == 1)
+            self.assertTrue(
+                self.new_profile.add_item("Go to mars", buc_name="Space"))
+            self.assertTrue(len(commits) == 2)
+        finally:
+            event.remove(database.session, "after_commit", record)
+
+    def test_create_item_rolls_back_as_whole(self):
+        next_item_id = self.new_profile.next_item_id
+        saved = self.new_profile.add_item(None, buc_name="Travelling")
+        self.assertFalse(saved)
+        self.assertTrue(self.new_profile.next_item_id == next_item_id)
+
+    def test_mark_items_done(self):
+        item = self.new_profile.get_item(name="Go to Mombasa")
+        version = profile.Profile.current_version(self.new_profile.id)
+        changed = self.new_profile.mark_items_done(True, buc_id=0)
+        self.assertTrue(changed == 2)
+        self.assertTrue(item.done)
+        self.assertTrue(
+            profile.Profile.current_version(self.new_profile.id) > version)
+
+        # nothing left to change
+        self.assertTrue(
+            self.new_profile.mark_items_done(True, buc_id=0, item_ids=[0]) ==
+            0)
+        self.assertTrue(self.new_profile.mark_items_done(True, buc_id=9) is
+                        None)
+
+    def counters(self, buc_id=0):
+        database.session.expire_all()
+        bucket = self.new_profile.get_bucket(bucket_id=buc_id)
+        return (bucket.item_count, bucket.done_count,
+                self.new_profile.bucket_count)
+
+    def test_counters_follow_assets(self):
+        self.assertTrue(self.counters() == (2, 0, 1))
+
+        self.new_profile.add_item("Climb Kilimanjaro", buc_id=0)
+        self.assertTrue(self.counters() == (3, 0, 1))
+        self.new_profile.edit_asset(item=True, asset_id=0, done=True, buc_id=0)
+        self.assertTrue(self.counters() == (3, 1, 1))
+        # marking it done again changes nothing
+        self.new_profile.edit_asset(item=True, asset_id=0, done=True, buc_id=0)
+        self.assertTrue(self.counters() == (3, 1, 1))
+        self.new_profile.mark_items_done(True, buc_id=0)
+        self.assertTrue(self.counters() == (3, 3, 1))
+        self.new_profile.delete_asset(item=True, asset_id=0, buc_id=0)
+        self.assertTrue(self.counters() == (2, 2, 1))
+        self.new_profile.add_items([{"name": "Sail"}, {"name": "Dive"}], 0)
+        self.assertTrue(self.counters() == (4, 2, 1))
+
+        self.new_profile.add_bucket("Reading")
+        self.assertTrue(self.counters() == (4, 2, 2))
+        self.new_profile.delete_asset(asset_id=1)
+        self.assertTrue(self.counters() == (4, 2, 1))
+
+    def test_repair_counters(self):
+        buckets = bucketlist.Bucket.__table__
+        profiles = profile.Profile.__table__
+        database.session.execute(
+            buckets.update().values(item_count=7, done_count=5))
+        database.session.execute(profiles.update().values(bucket_count=0))
+        database.session.commit()
+        version = profile.Profile.current_version(self.new_profile.id)
+
+        repaired = profile.Profile.repair_counters()
+        # the mentor's profile has a bucket of two items too
+        self.assertTrue(repaired == (2, 2))
+        self.assertTrue(self.counters() == (2, 0, 1))
+        self.assertTrue(
+            profile.Profile.current_version(self.new_profile.id) > version)
+        self.assertTrue(profile.Profile.repair_counters() == (0, 0))
+
     def test_get_item_from_profile(self):
         item = self.new_profile.get_item(name="Go to Mombasa")
         self.assertTrue(item.name == "Go to Mombasa")
@@ -112,6 +206,28 @@ class TestProfile(BaseTestCase):
         bucket = self.new_profile.get_bucket(name="Philosophy")
         self.assertTrue(bucket)
 
+    def test_update_returns_assets_on_every_dialect(self):
+        for dialect in (None, "postgresql"):
+            with as_dialect(dialect):
+                item = self.new_profile.update_item(
+                    0, 1, name="Go to " + str(dialect), done=True)
+                bucket = self.new_profile.update_bucket(
+                    0, "Trip " + str(dialect))
+                missing = self.new_profile.update_bucket(9, "Nowhere")
+
+                self.assertTrue(isinstance(item, bucketlist.Item))
+                self.assertTrue(item.name == "Go to " + str(dialect))
+                self.assertTrue(item.done)
+                self.assertTrue(isinstance(bucket, bucketlist.Bucket))
+                self.assertTrue(bucket.name == "Trip " + str(dialect))
+                self.assertTrue(bucket.done_count == 1)
+                self.assertTrue(bucket.items[1] is item)
+                self.assertTrue(missing is None)
+
+                undone = self.new_profile.update_item(0, 1, done=False)
+                self.assertTrue(undone is item)
+                self.assertFalse(item.done)
+
     def test_delete_on_profile(self):
         deleted = self.new_profile.delete_asset(name="Drink alchol", item=True)
         self.assertTrue(deleted)
@@ -122,3 +238,144 @@ class TestProfile(BaseTestCase):
         self.assertTrue(deleted)
         query = bucketlist.Bucket.get_bucket(name="Travelling")
         self.assertFalse(query)
+
+    def test_delete_bucket_cascades_in_database(self):
+        bucket = self.new_profile.get_bucket(name="Travelling")
+        bucket_id = bucket.id
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(database.engine, "before_cursor_execute", record)
+        try:
+            self.assertTrue(self.new_profile.delete_asset(asset_id=0))
+        finally:
+            event.remove(database.engine, "before_cursor_execute", record)
+        # the items are neither loaded nor deleted one by one
+        self.assertFalse(any("items.name" in sql for sql in statements))
+        self.assertTrue(
+            len([sql for sql in statements if sql.startswith("DELETE")]) == 1)
+        self.assertTrue(
+            bucketlist.Item.query.filter_by(bucket_id=bucket_id).count() == 0)
+
+    def test_delete_large_bucket_is_purged(self):
+        self.app.config['PURGE_THRESHOLD'] = 1
+        self.app.config['PURGE_BATCH'] = 1
+        bucket_id = self.new_profile.get_bucket(name="Travelling").id
+        version = profile.Profile.current_version(self.new_profile.id)
+
+        self.assertTrue(self.new_profile.delete_asset(asset_id=0))
+        self.assertFalse(self.new_profile.get_bucket(bucket_id=0))
+        self.assertTrue(
+            profile.Profile.current_version(self.new_profile.id) > version)
+        self.assertFalse(bucketlist.Bucket.get_bucket(id=bucket_id))
+        self.assertTrue(
+            bucketlist.Item.query.filter_by(bucket_id=bucket_id).count() == 0)
+
+    def test_detached_bucket_items_are_hidden_and_purged(self):
+        # a bucket detached by a purge that did not finish
+        bucket_id = self.new_profile.get_bucket(name="Travelling").id
+        buckets = bucketlist.Bucket.__table__
+        database.session.execute(buckets.update().where(
+            buckets.c.id == bucket_id).values(profile_id=None))
+        database.session.commit()
+
+        self.assertFalse(self.new_profile.get_item(name="Go to Mombasa"))
+        self.assertTrue(
+            bucketlist.Item.get_taken_names(
+                ["Go to Mombasa"], self.new_profile.id) == set())
+        self.assertTrue(
+            self.new_profile.delete_asset(name="Go to Mombasa", item=True) is
+            None)
+
+        self.assertTrue(purge.purge_detached(batch=1) == (1, 2))
+        self.assertFalse(bucketlist.Bucket.get_bucket(id=bucket_id))
+        self.assertTrue(
+            bucketlist.Item.query.filter_by(bucket_id=bucket_id).count() == 0)
+        self.assertTrue(purge.purge_detached() == (0, 0))
+
+    def test_delete_profile_cascades_in_database(self):
+        profile_id = self.new_profile.id
+        self.assertTrue(self.new_profile.delete())
+        self.assertTrue(
+            bucketlist.Bucket.query.filter_by(profile_id=profile_id).count() ==
+            0)
+        self.assertTrue(
+            bucketlist.Item.query.filter_by(profile_id=profile_id).count() ==
+            0)
+
+
+class TestAssetIdAllocation(TestCase):
+    """Stress asset id allocation from many threads on a shared database."""
+
+    threads = 8
+    items_per_thread = 250
+
+    def setUp(self):
+        # in memory sqlite is private to each connection, use a file
+        self.directory = tempfile.mkdtemp()
+        self.app = new_app('testing')
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = (
+            'sqlite:///' + os.path.join(self.directory, 'stress.db'))
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        event.listen(database.engine, "connect", self.configure_sqlite)
+        database.drop_all()
+        database.create_all()
+
+        owner = user.User("stress", "Stress#12345", "stress@gmail.com")
+        self.profile = profile.Profile("@stress", owner)
+        self.profile.save()
+        self.profile.add_bucket("Stress")
+
+    def tearDown(self):
+        database.session.remove()
+        database.drop_all()
+        event.remove(database.engine, "connect", self.configure_sqlite)
+        self.app_context.pop()
+        shutil.rmtree(self.directory)
+
+    @staticmethod
+    def configure_sqlite(connection, record):
+        # wait on the write lock instead of failing, skip fsync for speed
+        cursor = connection.cursor()
+        cursor.execute("PRAGMA busy_timeout = 60000")
+        cursor.execute("PRAGMA synchronous = OFF")
+        cursor.close()
+
+    def create_items(self, thread, failures):
+        with self.app.app_context():
+            try:
+                person = profile.Profile.get_profile(handle="@stress")
+                for index in range(self.items_per_thread):
+                    name = "item {} {}".format(thread, index)
+                    if not person.add_item(name, buc_name="Stress"):
+                        failures.append(name)
+            finally:
+                database.session.remove()
+
+    def test_parallel_add_item_has_no_duplicate_ids(self):
+        failures = []
+        workers = [
+            threading.Thread(target=self.create_items, args=(n, failures))
+            for n in range(self.threads)
+        ]
+        start = timeit.default_timer()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = timeit.default_timer() - start
+
+        total = self.threads * self.items_per_thread
+        self.assertTrue(failures == [])
+        asset_ids = [
+            item.asset_id for item in bucketlist.Item.query.filter_by(
+                profile_id=self.profile.id)
+        ]
+        self.assertTrue(len(asset_ids) == total)
+        self.assertTrue(sorted(asset_ids) == list(range(total)))
+        self.assertTrue(
+            profile.Profile.get_profile("@stress").next_item_id == total)
+        self.assertTrue(total / elapsed > 50)
@@ -0,0 +1,28 @@
+from app.base import database
+from app.models import bucketlist
+from app.search import SQLiteSearch, search_backend, search_words
+from tests.base_test_setup import BaseTestCase
+
+
+class TestSearch(BaseTestCase):
+    def test_backend_from_config(self):
+        self.assertTrue(isinstance(search_backend(), SQLiteSearch))
+        self.assertTrue(search_backend() is search_backend())
+
+    def test_search_words_drop_syntax(self):
+        self.assertTrue(search_words('go "to* OR: mombasa') ==
+                        ["go", "to", "OR", "mombasa"])
+        self.assertTrue(search_words(None) == [])
+
+    def test_suggest_uses_index(self):
+        names = bucketlist.Bucket.query.filter_by(
+            profile_id=self.new_profile.id).with_entities(
+                bucketlist.Bucket.name)
+        names = search_backend().suggest(names, bucketlist.Bucket, "TRA")
+        self.assertTrue(names.all() == [("Travelling", )])
+
+        plan = database.session.execute(
+            "EXPLAIN QUERY PLAN " + str(names.statement.compile(
+                compile_kwargs={"literal_binds": True}))).fetchall()
+        self.assertTrue(
+            any("ix_buckets_suggest" in str(row) for row in plan))
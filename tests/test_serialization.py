@@ -0,0 +1,90 @@
+import json
+
+from app.models import bucketlist
+from app.serialization import (RawJSON, item_json, iter_bucket, iter_buckets,
+                               iter_export, iter_items, json_response)
+from tests.base_test_setup import BaseTestCase
+
+
+class TestSerialization(BaseTestCase):
+    def setUp(self):
+        BaseTestCase.setUp(self)
+        self.new_profile.add_item(
+            'Say "hi" \\ é', description=None, buc_id=0)
+        self.bucket = self.new_profile.get_bucket(bucket_id=0)
+        self.summary = bucketlist.Bucket.item_summaries([self.bucket.id],
+                                                        None)[self.bucket.id]
+
+    def test_bucket_matches_to_dict(self):
+        text = "".join(iter_bucket(self.bucket, self.summary))
+        expected = json.loads(json.dumps(self.bucket.to_dict(self.summary)))
+        self.assertTrue(json.loads(text) == expected)
+        self.assertTrue(len(json.loads(text)["items"]) == 3)
+
+    def test_item_matches_to_dict(self):
+        for item in self.summary["items"]:
+            self.assertTrue(json.loads(item_json(item)) == item.to_dict())
+
+    def test_bucket_fields(self):
+        fields = {"name", "item count"}
+        text = "".join(iter_bucket(self.bucket, self.summary, fields))
+        self.assertTrue(
+            json.loads(text) == {"name": "Travelling", "item count": 3})
+        text = "".join(iter_bucket(self.bucket, self.summary, {"items"}))
+        self.assertTrue(list(json.loads(text)) == ["items"])
+
+    def test_buckets_keyed_by_asset_id(self):
+        self.new_profile.add_bucket("Empty")
+        buckets = bucketlist.Bucket.query.filter_by(
+            profile_id=self.new_profile.id).all()
+        summaries = bucketlist.Bucket.item_summaries(
+            [bucket.id for bucket in buckets])
+        data = json.loads("".join(iter_buckets(buckets, summaries)))
+        self.assertTrue(sorted(data) == ["0", "1"])
+        self.assertTrue(data["1"]["items"] == {})
+        self.assertTrue(json.loads("".join(iter_buckets([]))) == {})
+
+        items = json.loads("".join(iter_items(self.summary["items"])))
+        self.assertTrue(sorted(items) == ["0", "1", "2"])
+
+    def test_json_response_embeds_raw_json(self):
+        values = {
+            "message": "found",
+            "list": [1, None, RawJSON("[true]")],
+            "items": RawJSON(iter_items(self.summary["items"]))
+        }
+        for stream in (False, True):
+            if stream:
+                values["items"] = RawJSON(iter_items(self.summary["items"]))
+            with self.app.test_request_context():
+                response = json_response(values, 201, stream=stream)
+                self.assertTrue(response.is_streamed == stream)
+                self.assertTrue(response.status_code == 201)
+                data = json.loads(response.get_data(as_text=True))
+            self.assertTrue(data["list"] == [1, None, [True]])
+            self.assertTrue(len(data["items"]) == 3)
+
+    def test_export_merges_buckets_and_items(self):
+        self.new_profile.add_bucket("Empty")
+        self.new_profile.add_bucket("Last")
+        self.new_profile.add_item("Run", buc_id=2)
+        buckets = bucketlist.Bucket.query.order_by(bucketlist.Bucket.id)
+        buckets = buckets.filter_by(profile_id=self.new_profile.id)
+        # items of other profiles' buckets are skipped
+        items = bucketlist.Item.query.order_by(bucketlist.Item.bucket_id,
+                                               bucketlist.Item.asset_id)
+
+        data = json.loads("".join(iter_export(buckets, items)))["buckets"]
+        self.assertTrue(sorted(data) == ["0", "1", "2"])
+        self.assertTrue(sorted(data["0"]["items"]) == ["0", "1", "2"])
+        self.assertTrue(data["1"]["items"] == {})
+        self.assertTrue(list(data["2"]["items"]) == ["3"])
+        self.assertTrue(data["2"]["name"] == "Last")
+
+        text = "".join(iter_export(buckets, items, ndjson=True))
+        lines = [json.loads(line) for line in text.splitlines()]
+        self.assertTrue(len(lines) == 7)
+        self.assertTrue(lines[0]["bucket"]["id"] == 0)
+        self.assertTrue(lines[1]["item"]["bucket id"] == 0)
+        self.assertTrue(lines[5]["bucket"]["id"] == 2)
+        self.assertTrue(lines[6]["item"]["name"] == "Run")
@@ -26,6 +26,35 @@ class TestUser(BaseTestCase):
         new_user.save()
         self.assertTrue(new_user in user.User.get_users())
 
+    def test_password_hashed_with_configured_method(self):
+        new_user = user.User("new_name", "user_password", "email@gmail.com")
+        method = self.app.config['PASSWORD_HASH_METHOD']
+        self.assertTrue(new_user.password.startswith(method + "$"))
+        self.assertFalse(new_user.password_needs_rehash())
+
+    def test_outdated_password_hash_is_upgraded(self):
+        self.app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1500'
+        self.assertTrue(self.new_user.password_needs_rehash())
+        old_hash = self.new_user.password
+
+        self.assertFalse(self.new_user.authenticate_password("wrong"))
+        self.assertTrue(self.new_user.password == old_hash)
+
+        self.assertTrue(
+            self.new_user.authenticate_password("Userpassword#2345"))
+        query = user.User.get_user(name="crimson")
+        self.assertTrue(query.password.startswith("pbkdf2:sha256:1500$"))
+        self.assertFalse(query.password_needs_rehash())
+        self.assertTrue(query.authenticate_password("Userpassword#2345"))
+
+    def test_get_taken(self):
+        taken = user.User.get_taken(name="crimson", email="new@gmail.com")
+        self.assertTrue(taken == [("crimson", "crimson@gmail.com")])
+        taken = user.User.get_taken(name="Turing", email="crimson@gmail.com")
+        self.assertTrue(len(taken) == 2)
+        taken = user.User.get_taken(name="nobody", email="new@gmail.com")
+        self.assertTrue(taken == [])
+
     def test_schema_catch_invlaid_email(self):
         schema = user.UserSchema()
         # email
@@ -0,0 +1,32 @@
+"""This module contains unit tests for shared validators."""
+
+import threading
+
+from app import validation
+from app.models import user
+from tests.base_test_setup import BaseTestCase
+
+
+class TestValidation(BaseTestCase):
+    def test_valid_name(self):
+        self.assertTrue(validation.valid_name("Go to Mombasa"))
+        self.assertTrue(validation.valid_name("new_name 2"))
+        self.assertFalse(validation.valid_name("   "))
+        self.assertFalse(validation.valid_name("bad#name"))
+
+    def test_is_username(self):
+        self.assertTrue(validation.is_username("crimson"))
+        self.assertTrue(validation.is_username("Friedrich Nietzscher"))
+        self.assertFalse(validation.is_username("crimson@gmail.com"))
+
+    def test_user_schema_is_cached_per_thread(self):
+        schema = validation.user_schema()
+        self.assertTrue(isinstance(schema, user.UserSchema))
+        self.assertTrue(validation.user_schema() is schema)
+
+        schemas = []
+        worker = threading.Thread(
+            target=lambda: schemas.append(validation.user_schema()))
+        worker.start()
+        worker.join()
+        self.assertTrue(schemas[0] is not schema)